@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""Multi-process contention harness for lockin.db.
+
+Runs a real engine (Engine.run) plus N client processes against a temporary
+seeded database, for each N in --clients, and reports how contention
+scales:
+
+- "database is locked" errors seen by clients and by the engine loop
+- command round-trip latency (queue_command until the engine marks it done)
+- engine tick overrun (how far each loop iteration runs past its 1s budget)
+
+Clients cycle through the roles that hit the database in practice: an
+attached terminal polling state 4x a second, a status bar polling once a
+second, someone running `lockin stats year`, and a terminal sending
+commands.
+
+    python benchmarks/contention.py                       # N = 1,2,4,8,16
+    python benchmarks/contention.py --clients 1,8,32 --duration 20 -o curve.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import sqlite3
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from lockin.clock import SystemClock
+from lockin.database import Database
+from lockin.devtools import seed_database
+from lockin.engine import Engine
+from lockin.status import read_status
+
+DEFAULT_CLIENTS = [1, 2, 4, 8, 16]
+ROLES = ["attach", "status", "stats", "commands"]
+
+# How often each role hits the database (seconds between operations)
+ROLE_INTERVALS = {"attach": 0.25, "status": 1.0, "stats": 2.0, "commands": 1.0}
+
+# Give up on a command that the engine hasn't processed after this long
+COMMAND_TIMEOUT = 30.0
+
+
+class RecordingClock(SystemClock):
+    """System clock that records how late each engine loop iteration runs.
+
+    Engine.run calls sleep() once per iteration (1s normally, 5s after an
+    error), so an iteration is due 1s after the previous one and overruns
+    by its own work time plus any sleep beyond that second. Once the
+    deadline passes, sleep() raises KeyboardInterrupt, which Engine.run
+    treats as a clean stop.
+    """
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.overruns: List[float] = []
+        self.backoffs = 0
+        self._awake_since = time.perf_counter()
+
+    def sleep(self, seconds: float):
+        work = time.perf_counter() - self._awake_since
+        self.overruns.append(work + max(0.0, seconds - 1))
+        if seconds > 1:
+            self.backoffs += 1
+        if time.time() + seconds > self.deadline:
+            raise KeyboardInterrupt
+        super().sleep(seconds)
+        self._awake_since = time.perf_counter()
+
+
+def is_lock_error(error: Exception) -> bool:
+    return isinstance(error, sqlite3.OperationalError) and "locked" in str(error)
+
+
+def run_engine(db_path: Path, deadline: float, results: "multiprocessing.Queue"):
+    """Engine process: the real run() loop, timed through its clock."""
+    report: Dict[str, Any] = {"role": "engine", "error": None}
+    try:
+        clock = RecordingClock(deadline)
+        engine = Engine(db_path, clock=clock, notifications=False)
+        engine.start_session("work", 1440)
+
+        # run() reports errors with print(); keep them to count lock errors
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            engine.run()
+
+        lines = output.getvalue().splitlines()
+        contention = engine.db.get_contention_metrics().values()
+        report.update(
+            {
+                "overruns": clock.overruns,
+                "backoffs": clock.backoffs,
+                "errors": sum(1 for line in lines if line.startswith("Engine error")),
+                # Iterations still locked after retries (they skip to the
+                # next tick rather than print an error)
+                "lock_errors": engine.busy_ticks,
+                "commits": engine.writer.commits,
+                "retries": sum(stats["retries"] for stats in contention),
+                "retry_wait": sum(stats["wait_seconds"] for stats in contention),
+            }
+        )
+    except BaseException:
+        report["error"] = traceback.format_exc()
+        raise
+    finally:
+        # Always report, so the parent never waits on a process that died
+        results.put(report)
+
+
+def run_client(
+    role: str, db_path: Path, deadline: float, results: "multiprocessing.Queue"
+):
+    """Client process: one role's access pattern until the deadline."""
+    report: Dict[str, Any] = {"role": role, "error": None}
+    try:
+        db = Database(db_path)
+        interval = ROLE_INTERVALS[role]
+        year_start = datetime(datetime.now().year, 1, 1)
+        year_end = datetime(year_start.year + 1, 1, 1)
+
+        state_version = -1
+        operations = 0
+        lock_errors = 0
+        other_errors = 0
+        latencies: List[float] = []
+
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                if role == "attach":
+                    # Like the attach loop: re-read the state only on change
+                    changed = db.poll_engine_state(state_version)
+                    if changed:
+                        state_version = changed[0]
+                elif role == "status":
+                    read_status(db_path)
+                elif role == "stats":
+                    # Uncached aggregate reads: this year by day, then all of
+                    # history (the longest read lockin makes)
+                    db.get_work_totals_by_day(year_start, year_end)
+                    db.get_period_summary(datetime(1970, 1, 2), year_end)
+                elif role == "commands":
+                    latency = send_command(db, deadline + COMMAND_TIMEOUT)
+                    if latency is not None:
+                        latencies.append(latency)
+                operations += 1
+            except Exception as e:
+                if is_lock_error(e):
+                    lock_errors += 1
+                else:
+                    other_errors += 1
+
+            elapsed = time.perf_counter() - started
+            time.sleep(max(0.0, interval - elapsed))
+
+        report.update(
+            {
+                "operations": operations,
+                "lock_errors": lock_errors,
+                "other_errors": other_errors,
+                "latencies": latencies,
+            }
+        )
+    except BaseException:
+        report["error"] = traceback.format_exc()
+        raise
+    finally:
+        results.put(report)
+
+
+def send_command(db: Database, give_up_at: float) -> Optional[float]:
+    """Queue a no-op command and wait until the engine has processed it."""
+    started = time.perf_counter()
+    # continue_session only acts in the decision window, so this is a no-op
+    # for the long-running session, but it still goes through the queue
+    with db.connection() as conn:
+        command_id = conn.execute(
+            "INSERT INTO commands (command, args, created_at) VALUES (?, NULL, ?)",
+            ("continue_session", time.time()),
+        ).lastrowid
+
+    while time.time() < give_up_at:
+        with db.connection() as conn:
+            row = conn.execute(
+                "SELECT processed FROM commands WHERE id = ?", (command_id,)
+            ).fetchone()
+        if row and row["processed"] == 1:
+            return time.perf_counter() - started
+        time.sleep(0.01)
+    return None
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def collect_reports(
+    processes: List[multiprocessing.Process],
+    results: "multiprocessing.Queue",
+    give_up_at: float,
+) -> List[Dict[str, Any]]:
+    """Gather one report per process, then join them all.
+
+    Reports are drained while the processes run (a child can't exit until
+    its queued report is read). Raises RuntimeError naming each process that
+    failed, hung or exited without a clean report.
+    """
+    reports: List[Dict[str, Any]] = []
+    while len(reports) < len(processes) and time.time() < give_up_at:
+        try:
+            reports.append(results.get(timeout=1))
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+    while len(reports) < len(processes):
+        try:
+            reports.append(results.get_nowait())
+        except queue.Empty:
+            break
+
+    problems = []
+    for process in processes:
+        process.join(timeout=max(0.0, give_up_at - time.time()))
+        if process.is_alive():
+            process.terminate()
+            process.join()
+            problems.append(f"{process.name} did not finish in time")
+        elif process.exitcode != 0:
+            problems.append(f"{process.name} exited with code {process.exitcode}")
+    problems += [f"{r['role']} failed:\n{r['error']}" for r in reports if r["error"]]
+    if len(reports) < len(processes):
+        problems.append(f"{len(processes) - len(reports)} process(es) sent no report")
+    if problems:
+        raise RuntimeError("\n".join(problems))
+    return reports
+
+
+def run_step(db_path: Path, clients: int, duration: float) -> Dict[str, Any]:
+    """Run the engine and `clients` clients together for `duration` seconds."""
+    results: "multiprocessing.Queue" = multiprocessing.Queue()
+    # Leave a moment for every process to start before the clock runs
+    deadline = time.time() + 2 + duration
+
+    processes = [
+        multiprocessing.Process(
+            name="engine",
+            target=run_engine,
+            args=(db_path, deadline, results),
+            daemon=True,
+        )
+    ]
+    for i in range(clients):
+        role = ROLES[i % len(ROLES)]
+        processes.append(
+            multiprocessing.Process(
+                name=f"{role}-{i}",
+                target=run_client,
+                args=(role, db_path, deadline, results),
+                daemon=True,
+            )
+        )
+    for process in processes:
+        process.start()
+
+    reports = collect_reports(processes, results, deadline + COMMAND_TIMEOUT + 30)
+
+    engine = next(r for r in reports if r["role"] == "engine")
+    client_reports = [r for r in reports if r["role"] != "engine"]
+    latencies = [lat for r in client_reports for lat in r.get("latencies", [])]
+    # The first iteration includes engine start-up; skip it
+    overruns = engine["overruns"][1:]
+
+    by_role: Dict[str, Dict[str, int]] = {}
+    for report in client_reports:
+        totals = by_role.setdefault(
+            report["role"], {"clients": 0, "operations": 0, "lock_errors": 0}
+        )
+        totals["clients"] += 1
+        totals["operations"] += report["operations"]
+        totals["lock_errors"] += report["lock_errors"]
+
+    return {
+        "clients": clients,
+        "client_lock_errors": sum(r["lock_errors"] for r in client_reports),
+        "client_other_errors": sum(r["other_errors"] for r in client_reports),
+        "engine_errors": engine["errors"],
+        "engine_lock_errors": engine["lock_errors"],
+        "engine_backoffs": engine["backoffs"],
+        "engine_commits": engine["commits"],
+        "engine_retries": engine["retries"],
+        "engine_retry_wait": engine["retry_wait"],
+        "commands": len(latencies),
+        "command_latency_p50": percentile(latencies, 50),
+        "command_latency_p95": percentile(latencies, 95),
+        "command_latency_max": max(latencies) if latencies else None,
+        "tick_overrun_p50": percentile(overruns, 50),
+        "tick_overrun_p99": percentile(overruns, 99),
+        "tick_overrun_max": max(overruns) if overruns else None,
+        "ticks": len(overruns),
+        "roles": by_role,
+    }
+
+
+def format_ms(seconds: Optional[float]) -> str:
+    return "—" if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def print_curve(steps: List[Dict[str, Any]]):
+    """Print the scaling curve as a table."""
+    print(
+        f"{'clients':>7} {'lock err':>8} {'engine err':>10} {'retries':>8} "
+        f"{'cmd p50':>8} {'cmd p95':>8} {'cmd max':>8} "
+        f"{'tick p50':>8} {'tick p99':>8} {'tick max':>8}"
+    )
+    for step in steps:
+        print(
+            f"{step['clients']:>7} {step['client_lock_errors']:>8} "
+            f"{step['engine_errors'] + step['engine_lock_errors']:>10} "
+            f"{step['engine_retries']:>8} "
+            f"{format_ms(step['command_latency_p50']):>8} "
+            f"{format_ms(step['command_latency_p95']):>8} "
+            f"{format_ms(step['command_latency_max']):>8} "
+            f"{format_ms(step['tick_overrun_p50']):>8} "
+            f"{format_ms(step['tick_overrun_p99']):>8} "
+            f"{format_ms(step['tick_overrun_max']):>8}"
+        )
+    print("(ms; tick overrun is how far past its 1s schedule each engine loop ran)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Lockin database contention harness")
+    parser.add_argument(
+        "--clients",
+        default=",".join(str(n) for n in DEFAULT_CLIENTS),
+        help="Comma-separated client counts (default: 1,2,4,8,16)",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10, help="Seconds per step (default: 10)"
+    )
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        default=100_000,
+        help="Sessions of seeded history (default: 100000)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="History RNG seed")
+    parser.add_argument("-o", "--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args(argv)
+
+    try:
+        client_counts = [int(n) for n in args.clients.split(",") if n]
+    except ValueError:
+        parser.error(f"invalid --clients: {args.clients}")
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "duration": args.duration,
+            "sessions": args.sessions,
+            "seed": args.seed,
+        },
+        "steps": [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = Path(workdir) / "contention.db"
+        seed_database(db_path, sessions=args.sessions, seed=args.seed)
+
+        for clients in client_counts:
+            print(f"{clients} client(s)...", file=sys.stderr)
+            try:
+                step = run_step(db_path, clients, args.duration)
+            except RuntimeError as e:
+                print(f"{clients} client(s) failed: {e}", file=sys.stderr)
+                return 1
+            results["steps"].append(step)
+            # Each step starts from an empty command queue
+            with Database(db_path).connection() as conn:
+                conn.execute("DELETE FROM commands")
+
+    print_curve(results["steps"])
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
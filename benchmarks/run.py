@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""Benchmarks for Lockin's hot paths.
+
+Seeds a synthetic history for each size (see ``lockin dev seed``), times the database, engine,
+render and stats paths against it, and writes the results as JSON.
+
+    python benchmarks/run.py                           # 10^3 .. 10^6 sessions
+    python benchmarks/run.py --sizes 1000,10000 -o results.json
+    python benchmarks/run.py --compare baseline.json   # exit 1 on regression
+
+Only the standard library (plus Lockin's own dependencies) is needed.
+"""
+
+import argparse
+import io
+import json
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from rich.console import Console
+
+from lockin import cli
+from lockin.clock import SimulatedClock
+from lockin.database import Database
+from lockin.devtools import seed_database
+from lockin.engine import Engine, SessionState, SessionType
+from lockin.persistence import PersistenceWriter
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Commands in one process_commands burst
+BURST_SIZE = 100
+
+
+def make_history(
+    db_path: Path, size: int, seed: int = 0, history_dir: Optional[Path] = None
+) -> Database:
+    """Create a database holding `size` seeded sessions ending today.
+
+    With history_dir, the seeded file is kept there and copied on later
+    runs (benchmarks write to their copy, never to the kept file).
+    """
+    if history_dir is None:
+        seed_database(db_path, sessions=size, seed=seed)
+        return Database(db_path)
+
+    history_dir.mkdir(parents=True, exist_ok=True)
+    kept = history_dir / f"history-{size}-seed{seed}-{date.today()}.db"
+    if not kept.exists():
+        seed_database(kept, sessions=size, seed=seed)
+    shutil.copyfile(kept, db_path)
+    return Database(db_path)
+
+
+def measure(
+    fn: Callable[[], Any],
+    setup: Optional[Callable[[], Any]] = None,
+    repeat: int = 7,
+    min_time: float = 0.2,
+) -> Dict[str, Any]:
+    """Time fn, returning per-call seconds (min/median) over `repeat` runs.
+
+    Without setup, each run loops fn enough times to last ~min_time so
+    fast calls aren't lost in timer noise. With setup, setup() runs
+    untimed before every single timed call.
+    """
+    if setup is None:
+        loops = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time / repeat or loops >= 1_000_000:
+                break
+            loops *= 10
+    else:
+        loops = 1
+
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "loops": loops,
+        "repeat": repeat,
+    }
+
+
+def running_state(now: float) -> Dict[str, Any]:
+    """Engine state for a work session 10 minutes into 25."""
+    return {
+        "session_state": SessionState.RUNNING,
+        "session_type": SessionType.WORK,
+        "start_time": now - 600,
+        "planned_end_time": now + 900,
+        "planned_duration_minutes": 25,
+        "decision_window_start": None,
+        "last_notification": None,
+    }
+
+
+def bench_database(db: Database) -> Dict[str, Callable[[], Any]]:
+    """Database CRUD and query benchmarks."""
+    now = time.time()
+    year_start = datetime(datetime.now().year, 1, 1)
+    year_end = datetime(year_start.year + 1, 1, 1)
+
+    def log_and_delete():
+        db.log_session("work", "completed", now - 1500, now, 25, 25)
+        db.delete_session(db.get_last_session()["id"])
+
+    def state_roundtrip():
+        db.set_engine_state(running_state(now))
+        db.get_engine_state()
+
+    seen_version = None
+
+    def poll_unchanged():
+        # What the attach loop does between engine writes
+        nonlocal seen_version
+        if seen_version is None:
+            seen_version = db.get_engine_state_version()
+        db.poll_engine_state(seen_version)
+
+    def command_roundtrip():
+        db.queue_command("continue_session")
+        for cmd in db.get_pending_commands():
+            db.mark_command_processed(cmd["id"])
+
+    return {
+        "db.log_and_delete_session": log_and_delete,
+        "db.get_recent_sessions": lambda: db.get_recent_sessions(10),
+        "db.get_session_at_position_1000": lambda: db.get_session_at_position(1000),
+        "db.get_sessions_by_date_range_year": lambda: db.get_sessions_by_date_range(
+            year_start, year_end
+        ),
+        "db.get_sessions_by_date_range_year_2col": lambda: (
+            db.get_sessions_by_date_range(
+                year_start, year_end, columns=("start_time", "actual_duration_minutes")
+            )
+        ),
+        "db.get_todays_stats": db.get_todays_stats,
+        "db.get_period_summary_year": lambda: db.get_period_summary(
+            year_start, year_end
+        ),
+        "db.get_focus_heatmap": db.get_focus_heatmap,
+        "db.engine_state_roundtrip": state_roundtrip,
+        "db.engine_state_update_one_field": lambda: db.update_engine_state(
+            {"last_notification": now}
+        ),
+        "db.poll_engine_state_unchanged": poll_unchanged,
+        "db.command_roundtrip": command_roundtrip,
+        "db.calculate_current_streak": db.calculate_current_streak,
+    }
+
+
+def bench_engine(db_path: Path) -> Dict[str, Dict[str, Any]]:
+    """Engine.tick, process_commands bursts and simulated-clock runs."""
+    engine = Engine(db_path)
+    results = {}
+
+    engine.state.update({"session_state": SessionState.IDLE, "session_type": None})
+    results["engine.tick_idle"] = measure(engine.tick)
+
+    engine.state.update(running_state(time.time()))
+    results["engine.tick_running"] = measure(engine.tick)
+
+    # A /metrics scrape: rendered from memory, whatever the history size
+    results["engine.render_metrics"] = measure(engine.render_metrics)
+
+    def queue_burst():
+        engine.state.update({"session_state": SessionState.IDLE, "session_type": None})
+        for _ in range(BURST_SIZE // 2):
+            engine.db.queue_command(
+                "start_session", {"session_type": "work", "duration_minutes": 25}
+            )
+            engine.db.queue_command("quit_session")
+
+    def commits_per_burst(run: Callable[[], Any]) -> int:
+        queue_burst()
+        before = engine.db.commits
+        run()
+        return engine.db.commits - before
+
+    burst = f"engine.process_commands_burst_{BURST_SIZE}"
+    results[burst] = measure(engine.process_commands, setup=queue_burst)
+    results[burst]["commits"] = commits_per_burst(engine.process_commands)
+
+    # The same burst as Engine.run handles it: one group commit on the
+    # writer thread, timed until it is durable
+    writer = PersistenceWriter(engine.db)
+    writer.start()
+    engine.store = writer
+
+    def group_committed_burst():
+        engine.process_commands()
+        writer.commit()
+        writer.wait()
+
+    results[burst + "_group_commit"] = measure(group_committed_burst, setup=queue_burst)
+    results[burst + "_group_commit"]["commits"] = commits_per_burst(
+        group_committed_burst
+    )
+
+    # What the loop itself spends on that burst: the commit happens on the
+    # writer thread while the engine sleeps, so only the hand-off is timed
+    def burst_handed_over():
+        engine.process_commands()
+        writer.commit()
+
+    def queue_burst_after_commit():
+        writer.wait()
+        queue_burst()
+
+    results[burst + "_tick_thread"] = measure(
+        burst_handed_over, setup=queue_burst_after_commit
+    )
+    writer.wait()
+    writer.close()
+    engine.store = engine.db
+    engine.db.clear_engine_state()
+
+    # The state machine on a simulated clock: one 25 minute session ticked
+    # every second, and a full day (8 sessions with breaks) fast-forwarded
+    sim_path = db_path.with_name(db_path.stem + "-sim.db")
+
+    def simulate(sessions: int, fast_forward: bool):
+        def run():
+            sim = Engine(sim_path, clock=SimulatedClock(), notifications=False)
+            for _ in range(sessions):
+                sim.start_session("work", 25)
+                sim.run_for(26 * 60, fast_forward=fast_forward)
+                sim.quit_session()
+                sim.start_session("break", 5)
+                sim.run_for(5 * 60, fast_forward=fast_forward)
+                sim.quit_session()
+
+        return run
+
+    results["engine.simulated_session_ticked"] = measure(simulate(1, False))
+    results["engine.simulated_day_fast_forward"] = measure(simulate(8, True))
+
+    # Ending a session: the logged row, rollups and idle state in one unit
+    # of work (one commit)
+    sim = Engine(sim_path, clock=SimulatedClock(), notifications=False)
+
+    def session_to_end():
+        sim.start_session("work", 25)
+        sim.clock.advance(30 * 60)
+
+    results["engine.quit_session_logged"] = measure(
+        sim.quit_session, setup=session_to_end
+    )
+    session_to_end()
+    before = sim.db.commits
+    sim.quit_session()
+    results["engine.quit_session_logged"]["commits"] = sim.db.commits - before
+    sim_path.unlink()
+    return results
+
+
+def bench_ui(db_path: Path) -> Dict[str, Dict[str, Any]]:
+    """Frame time of the running view and stats rendering."""
+    buffer = io.StringIO()
+    console = Console(file=buffer, width=100, color_system="truecolor")
+    cli.console = console
+    ui = cli.LockinUI(db_path)
+
+    def frame():
+        console.print(ui.make_running_renderable(running_state(time.time())))
+        buffer.seek(0)
+        buffer.truncate()
+
+    last_year = str(datetime.now().year - 1)
+
+    def stats(period, date_arg=None):
+        def run():
+            ui.show_stats(period, date_arg)
+            buffer.seek(0)
+            buffer.truncate()
+
+        return run
+
+    results = {"ui.running_frame": measure(frame)}
+    results["ui.show_stats_week"] = measure(stats("week"))
+    results["ui.show_stats_month"] = measure(stats("month"))
+    results["ui.show_stats_year"] = measure(stats("year"))  # open, never cached
+    # First call fills the cache; this measures later lookups
+    results["ui.show_stats_year_closed"] = measure(stats("year", last_year))
+
+    ui.db.clear_stats_cache()
+    results["ui.show_stats_year_closed_uncached"] = measure(
+        stats("year", last_year), setup=ui.db.clear_stats_cache
+    )
+    return results
+
+
+def run_size(
+    size: int, seed: int, workdir: Path, history_dir: Optional[Path] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Run every benchmark against a fresh history of `size` sessions."""
+    db_path = workdir / f"bench_{size}.db"
+    start = time.perf_counter()
+    db = make_history(db_path, size, seed, history_dir)
+    print(f"  history: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    results = {}
+    for name, fn in bench_database(db).items():
+        results[name] = measure(fn)
+    results.update(bench_engine(db_path))
+    results.update(bench_ui(db_path))
+
+    db_path.unlink()
+    return results
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], threshold: float
+) -> List[str]:
+    """Print a comparison table and return the keys that regressed."""
+    regressions = []
+    print(f"{'benchmark':58} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, current in sorted(results["results"].items()):
+        base = baseline["results"].get(key)
+        if not base:
+            print(f"{key:58} {'—':>10} {format_seconds(current['median']):>10}")
+            continue
+        change = current["median"] / base["median"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(
+            f"{key:58} {format_seconds(base['median']):>10} "
+            f"{format_seconds(current['median']):>10} {change:>+7.0%}{flag}"
+        )
+    return regressions
+
+
+def format_seconds(seconds: float) -> str:
+    """Human-friendly duration for the comparison table."""
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}µs"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run Lockin benchmarks")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(s) for s in DEFAULT_SIZES),
+        help="Comma-separated history sizes (default: 1000,10000,100000,1000000)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="History RNG seed")
+    parser.add_argument(
+        "--history-dir",
+        type=Path,
+        help="Keep seeded histories here and reuse them (they are dated, "
+        "so a new day reseeds)",
+    )
+    parser.add_argument("-o", "--output", type=Path, help="Write results JSON here")
+    parser.add_argument(
+        "--compare", type=Path, help="Baseline results JSON to compare against"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Median slowdown that counts as a regression (default: 0.25 = 25%%)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [int(s) for s in args.sizes.split(",") if s]
+    except ValueError:
+        parser.error(f"invalid --sizes: {args.sizes}")
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"size {size}", file=sys.stderr)
+            for name, timing in run_size(
+                size, args.seed, Path(workdir), args.history_dir
+            ).items():
+                results["results"][f"{name}[{size}]"] = timing
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    elif not args.compare:
+        print(output)
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
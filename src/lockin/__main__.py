@@ -1,16 +1,18 @@
 """Main entry point for Lockin CLI."""
 
 import argparse
-import subprocess
+import sys
 import time
 from pathlib import Path
 
-from .cli import LockinUI, console
 from .config import Config
+from .database import normalize_tags
 
 
 def is_engine_running(db) -> bool:
     """Check if engine is running (LaunchAgent or manual)."""
+    import subprocess  # kept off the import path of `lockin status`
+
     # Check LaunchAgent
     try:
         result = subprocess.run(
@@ -45,6 +47,31 @@ def get_db_path() -> Path:
 def main():
     """Main CLI entry point."""
     db_path = get_db_path()
+
+    # Status bars poll this every second: answer before Rich is imported,
+    # the schema is initialised or launchctl is consulted.
+    if sys.argv[1:2] == ["status"]:
+        from .status import main as status_main
+
+        sys.exit(status_main(sys.argv[2:], db_path))
+
+    if sys.argv[1:2] == ["export"]:
+        from .export import main as export_main
+
+        sys.exit(export_main(sys.argv[2:], db_path))
+
+    if sys.argv[1:2] == ["watch"]:
+        from .watch import main as watch_main
+
+        sys.exit(watch_main(sys.argv[2:], db_path))
+
+    if sys.argv[1:2] == ["dev"]:
+        from .devtools import main as dev_main
+
+        sys.exit(dev_main(sys.argv[2:], db_path))
+
+    from .cli import LockinUI, console
+
     ui = LockinUI(db_path)
 
     parser = argparse.ArgumentParser(
@@ -63,10 +90,22 @@ Examples:
   lockin stats week   # Stats for this week
   lockin stats month  # Stats for this month
   lockin stats year   # Stats for this year
+  lockin stats heatmap year  # Focus by hour and weekday (week/month/year/all)
+  lockin stats trend 12      # Rolling averages and weekly deltas (12 weeks)
+  lockin 30 --tag thesis     # Tagged work session (repeat --tag or use commas)
+  lockin stats month --tag thesis  # Stats for one tag
+  lockin stats week --by tag       # Focused time per tag
   lockin log          # Show 10 most recent sessions
   lockin log 5 --work # Show 5 most recent work sessions
   lockin delete 1     # Delete most recent session (with confirmation)
+  lockin delete 42 --id  # Delete session with ID 42 (ID column in log)
   lockin config       # Show configuration
+  lockin status       # One-line status for tmux/polybar/starship
+  lockin status --format json
+  lockin export > sessions.csv  # All sessions as CSV (or --format ndjson)
+  lockin export --from 2026-01-01 --work -o 2026.csv
+  lockin watch --json  # Stream changes as they happen (NDJSON)
+  lockin dev seed /tmp/big.db --sessions 100000  # Synthetic history for profiling
         """,
     )
 
@@ -93,15 +132,41 @@ Examples:
     parser.add_argument(
         "--work", action="store_true", help="Filter log to work sessions only"
     )
+    parser.add_argument(
+        "--id",
+        dest="by_id",
+        action="store_true",
+        help="Treat the delete argument as a session ID (ID column in log)",
+    )
     parser.add_argument(
         "--break",
         dest="break_only",
         action="store_true",
         help="Filter log to break sessions only",
     )
+    parser.add_argument(
+        "--tag",
+        action="append",
+        metavar="NAME",
+        help="Tag the session being started (repeatable, or comma-separated); "
+        "with stats, only that tag's sessions",
+    )
+    parser.add_argument(
+        "--by",
+        choices=["tag"],
+        help="With stats, break the period down per tag",
+    )
 
     args = parser.parse_args()
 
+    try:
+        tags = normalize_tags(args.tag or [])
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        return
+    tag_args = {"tags": tags} if tags else {}
+    tagged = f" tagged {', '.join(tags)}" if tags else ""
+
     # Check if engine is running
     state = ui.get_current_state()
     engine_running = is_engine_running(ui.db)
@@ -120,6 +185,18 @@ Examples:
     if (args.work or args.break_only) and args.duration != "log":
         console.print("[dim]--work/--break flags ignored (only apply to log)[/dim]")
 
+    # Warn if --id used with non-delete command
+    if args.by_id and args.duration != "delete":
+        console.print("[dim]--id flag ignored (only applies to delete)[/dim]")
+
+    # Warn if --tag/--by used where they don't apply
+    if tags and args.duration in ["log", "delete", "config", "quit", None]:
+        console.print(
+            "[dim]--tag ignored (applies to starting a session or stats)[/dim]"
+        )
+    if args.by and args.duration != "stats":
+        console.print("[dim]--by ignored (only applies to stats)[/dim]")
+
     # Parse command
 
     # No arguments - show dashboard or attach
@@ -133,12 +210,23 @@ Examples:
     # Stats command
     if args.duration == "stats":
         period = args.break_duration or "week"
+        if period in ["heatmap", "trend"] and (tags or args.by):
+            console.print(f"[dim]--tag/--by ignored (not supported by {period})[/dim]")
+        if period == "heatmap":
+            ui.show_heatmap(args.date)
+            return
+        if period == "trend":
+            ui.show_trend(args.date)
+            return
         if period not in ["week", "month", "year"]:
             console.print(f"[red]Invalid period: {period}[/red]")
-            console.print("Valid periods: week, month, year")
+            console.print("Valid periods: week, month, year, heatmap, trend")
+            return
+        if len(tags) > 1:
+            console.print("[red]Stats take one --tag at a time[/red]")
             return
 
-        ui.show_stats(period, args.date)
+        ui.show_stats(period, args.date, tag=tags[0] if tags else None, by=args.by)
         return
 
     # Log command
@@ -171,7 +259,7 @@ Examples:
     # Delete command
     if args.duration == "delete":
         if not args.break_duration:
-            console.print("[red]Usage: lockin delete <position>[/red]")
+            console.print("[red]Usage: lockin delete <position> | <id> --id[/red]")
             console.print(
                 "[dim]Position corresponds to # in 'lockin log' (1 = most recent)[/dim]"
             )
@@ -184,7 +272,7 @@ Examples:
             console.print("[dim]Position must be a number from 'lockin log'[/dim]")
             return
 
-        ui.delete_session(position)
+        ui.delete_session(position, by_id=args.by_id)
         return
 
     # Config command
@@ -303,9 +391,9 @@ Examples:
                 return
 
         ui.queue_command(
-            "start_session", session_type="break", duration_minutes=duration
+            "start_session", session_type="break", duration_minutes=duration, **tag_args
         )
-        console.print(f"[green]Started {duration}-minute break[/green]")
+        console.print(f"[green]Started {duration}-minute break{tagged}[/green]")
         if config.auto_attach:
             ui.attach_to_session(wait_for_session=True)
         else:
@@ -324,9 +412,9 @@ Examples:
             return
 
         ui.queue_command(
-            "start_session", session_type="work", duration_minutes=duration
+            "start_session", session_type="work", duration_minutes=duration, **tag_args
         )
-        console.print(f"[green]Started {duration}-minute work session[/green]")
+        console.print(f"[green]Started {duration}-minute work session{tagged}[/green]")
         if config.auto_attach:
             ui.attach_to_session(wait_for_session=True)
         else:
@@ -353,8 +441,10 @@ Examples:
         console.print("Quit it first with [cyan]q[/cyan] in the session view")
         return
 
-    ui.queue_command("start_session", session_type="work", duration_minutes=duration)
-    console.print(f"[green]Started {duration}-minute work session[/green]")
+    ui.queue_command(
+        "start_session", session_type="work", duration_minutes=duration, **tag_args
+    )
+    console.print(f"[green]Started {duration}-minute work session{tagged}[/green]")
     config = Config(ui.db)
     if config.auto_attach:
         ui.attach_to_session(wait_for_session=True)
@@ -0,0 +1,303 @@
+"""Local HTTP/JSON API served by the engine (``lockin config api_port N``).
+
+Runs on its own threads next to the engine loop and only talks to SQLite,
+like every other client: reads go through their own connections (WAL lets
+them run alongside the engine's writes) and commands go into the command
+queue. The engine's timer never waits on a request. The one exception is
+/metrics, which renders the engine's in-memory counters (see metrics.py).
+
+    GET  /state                   engine state and its version (ETag)
+    GET  /stats/today             today's totals and the current streak
+    GET  /sessions?from=&to=      sessions by local date (YYYY-MM-DD)
+    POST /commands                {"command": "quit_session", "args": {}}
+    GET  /metrics                 OpenMetrics text, from engine memory
+
+Connections are kept alive (HTTP/1.1). ``/state`` is tagged with the state
+version, so a poller sending ``If-None-Match`` gets a 304 from a single
+indexed lookup until the state actually changes; the other endpoints are
+tagged by content.
+
+The server only listens on 127.0.0.1. To keep web pages from driving it
+(via DNS rebinding or cross-site form posts), requests must carry a
+localhost Host header and commands must be sent as application/json.
+"""
+
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .clock import Clock
+from .database import Database
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+HOST = "127.0.0.1"
+LOCAL_HOSTS = ("127.0.0.1", "localhost")
+
+# Commands the API accepts, with the args each one requires
+COMMANDS = {
+    "start_session": ("session_type", "duration_minutes"),
+    "quit_session": (),
+    "continue_session": (),
+    "switch_break": ("break_type",),
+    "tag_session": ("tags",),
+}
+OPTIONAL_ARGS = {"start_session": ("tags",)}
+
+DEFAULT_SESSION_LIMIT = 1000
+MAX_SESSION_LIMIT = 10000
+MAX_BODY_BYTES = 64 * 1024
+POLL_INTERVAL = 0.05  # How long stop() may wait for the serving thread
+
+
+class ApiError(Exception):
+    """A request error reported to the client as {"error": message}."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def validate_command(body: Any) -> Tuple[str, Dict[str, Any]]:
+    """Check a POST /commands body; returns (command, args)."""
+    if not isinstance(body, dict):
+        raise ApiError(400, "Expected a JSON object")
+    command = body.get("command")
+    if command not in COMMANDS:
+        raise ApiError(400, f"command must be one of: {', '.join(COMMANDS)}")
+    args = body.get("args") or {}
+    if not isinstance(args, dict):
+        raise ApiError(400, "args must be an object")
+    missing = [name for name in COMMANDS[command] if name not in args]
+    if missing:
+        raise ApiError(400, f"{command} needs args: {', '.join(missing)}")
+
+    if command == "start_session":
+        if args["session_type"] not in ("work", "break"):
+            raise ApiError(400, "session_type must be work or break")
+        duration = args["duration_minutes"]
+        if not isinstance(duration, int) or isinstance(duration, bool):
+            raise ApiError(400, "duration_minutes must be an integer")
+        if not 0 < duration <= 1440:
+            raise ApiError(400, "duration_minutes must be between 1 and 1440")
+    elif command == "switch_break" and args["break_type"] not in ("short", "long"):
+        raise ApiError(400, "break_type must be short or long")
+    if "tags" in args:
+        tags = args["tags"]
+        if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+            raise ApiError(400, "tags must be a list of strings")
+    names = COMMANDS[command] + OPTIONAL_ARGS.get(command, ())
+    return command, {name: args[name] for name in names if name in args}
+
+
+def _parse_day(value: str, name: str) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise ApiError(400, f"{name} must be YYYY-MM-DD")
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Routes one connection's requests (the server sets .db)."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    # Headers and body are separate writes; don't let the second one sit
+    # behind the client's delayed ACK
+    disable_nagle_algorithm = True
+    server: "ApiServer"
+
+    def log_message(self, format: str, *args: Any):
+        pass  # The engine's output is for the engine
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str):
+        self.body_read = False
+        url = urlsplit(self.path)
+        routes = {
+            ("GET", "/state"): self._get_state,
+            ("GET", "/stats/today"): self._get_today,
+            ("GET", "/sessions"): self._get_sessions,
+            ("POST", "/commands"): self._post_command,
+            ("GET", "/metrics"): self._get_metrics,
+        }
+        try:
+            host = (self.headers.get("Host") or "").rsplit(":", 1)[0]
+            if host not in LOCAL_HOSTS:
+                raise ApiError(403, "Host must be 127.0.0.1 or localhost")
+            handler = routes.get((method, url.path))
+            if handler is None:
+                allowed = [m for m, path in routes if path == url.path]
+                if allowed:
+                    raise ApiError(405, f"Use {', '.join(allowed)}")
+                raise ApiError(404, f"No such endpoint: {url.path}")
+            handler(parse_qs(url.query))
+        except ApiError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _get_state(self, query: Dict[str, list]):
+        db = self.server.db
+        # The version alone decides whether the client's copy is current
+        etag = f'"state-{db.get_engine_state_version()}"'
+        if self._not_modified(etag):
+            return
+        changed = db.poll_engine_state(-1)
+        version, state = changed if changed else (0, None)
+        self._send_json(200, {"version": version, "state": state}, f'"state-{version}"')
+
+    def _get_today(self, query: Dict[str, list]):
+        db = self.server.db
+        body = {"today": db.get_todays_stats(), "streak": db.calculate_current_streak()}
+        self._send_tagged(body)
+
+    def _get_sessions(self, query: Dict[str, list]):
+        db = self.server.db
+        today = db.clock.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = _parse_day(query["from"][0], "from") if "from" in query else today
+        last = _parse_day(query["to"][0], "to") if "to" in query else start
+        session_type = query.get("type", [None])[0]
+        if session_type not in (None, "work", "break"):
+            raise ApiError(400, "type must be work or break")
+        try:
+            limit = int(query.get("limit", [DEFAULT_SESSION_LIMIT])[0])
+        except ValueError:
+            raise ApiError(400, "limit must be a number")
+        if not 0 < limit <= MAX_SESSION_LIMIT:
+            raise ApiError(400, f"limit must be between 1 and {MAX_SESSION_LIMIT}")
+
+        sessions = []
+        for session in db.iter_sessions(
+            start, last + timedelta(days=1), session_type=session_type
+        ):
+            if len(sessions) == limit:
+                break
+            sessions.append(session.to_dict())
+        self._send_tagged({"sessions": sessions})
+
+    def _post_command(self, query: Dict[str, list]):
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        if content_type != "application/json":
+            raise ApiError(415, "Send commands as application/json")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise ApiError(400, "Content-Length must be a non-negative integer")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "Request body too large")
+        data = self.rfile.read(length)
+        self.body_read = True
+        try:
+            body = json.loads(data or b"null")
+        except ValueError:
+            raise ApiError(400, "Invalid JSON")
+
+        command, args = validate_command(body)
+        command_id = self.server.db.queue_command(command, args or None)
+        self._send_json(202, {"id": command_id, "command": command, "args": args})
+
+    def _get_metrics(self, query: Dict[str, list]):
+        if self.server.metrics is None:
+            raise ApiError(404, "Metrics are served by the engine only")
+        payload = self.server.metrics().encode()
+        self._send(200, payload, METRICS_CONTENT_TYPE)
+
+    # Responses
+
+    def _close_if_body_unread(self):
+        """Close the connection after a response sent without reading the
+        request body, or its bytes would be parsed as the next request."""
+        has_body = self.headers.get("Content-Length", "0").strip() != "0"
+        if (has_body or "Transfer-Encoding" in self.headers) and not self.body_read:
+            self.send_header("Connection", "close")
+
+    def _not_modified(self, etag: str) -> bool:
+        if self.headers.get("If-None-Match") != etag:
+            return False
+        self.send_response(304)
+        self._close_if_body_unread()
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return True
+
+    def _send_tagged(self, body: Dict[str, Any]):
+        payload = json.dumps(body).encode()
+        etag = f'"{hashlib.sha1(payload).hexdigest()[:16]}"'
+        if not self._not_modified(etag):
+            self._send_json(200, body, etag, payload)
+
+    def _send_json(
+        self,
+        status: int,
+        body: Dict[str, Any],
+        etag: Optional[str] = None,
+        payload: Optional[bytes] = None,
+    ):
+        payload = payload if payload is not None else json.dumps(body).encode()
+        self._send(status, payload, "application/json", etag)
+
+    def _send(
+        self,
+        status: int,
+        payload: bytes,
+        content_type: str,
+        etag: Optional[str] = None,
+    ):
+        self.send_response(status)
+        self._close_if_body_unread()
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class ApiServer(ThreadingHTTPServer):
+    """The API on 127.0.0.1:port, served from background threads.
+
+    Port 0 picks a free port (see .port). `metrics` renders the
+    exposition for /metrics; the engine passes its own.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        db_path: Path,
+        port: int,
+        clock: Optional[Clock] = None,
+        metrics: Optional[Callable[[], str]] = None,
+    ):
+        self.db = Database(db_path, clock=clock)
+        self.metrics = metrics
+        super().__init__((HOST, port), ApiHandler)
+        self.port = self.server_address[1]
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.serve_forever,
+            args=(POLL_INTERVAL,),
+            name="lockin-api",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
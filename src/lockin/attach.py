@@ -0,0 +1,210 @@
+"""The attach view's event loop.
+
+:class:`AttachSession` runs the attached screen as concurrent asyncio
+tasks, so nothing waits on anything else:
+
+- **keys**: each key press is handled as soon as it arrives;
+- **state**: the engine state is polled (by version) every 0.25s;
+- **render**: the screen is redrawn every 0.25s, and at once after a key
+  press or a state change;
+- **commands**: each command is a round trip of its own task, through
+  :class:`~lockin.client.AsyncLockinClient`, which waits until the engine
+  has handled it. Commands that must happen in order (quit, then start a
+  break) are awaited in order inside one task, and the screen keeps
+  updating meanwhile.
+
+The terminal, Rich and the key source are set up by
+``LockinUI.attach_to_session`` (cli.py).
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, Optional, Set, Tuple
+
+from .client import AsyncLockinClient, CommandTimeout
+from .clock import Clock, SystemClock
+from .engine import SessionState, SessionType
+
+POLL_INTERVAL = 0.25  # Seconds between engine state checks
+RENDER_INTERVAL = 0.25  # Seconds between redraws (the timer on screen)
+
+ENDED_STATES = (SessionState.IDLE, SessionState.ENDED)
+DECIDED_STATES = (SessionState.AWAITING_DECISION, SessionState.RUNNING_BONUS)
+
+# (exit message, request): what to print, and what to prompt for afterwards
+AttachResult = Tuple[Optional[str], Optional[str]]
+
+
+def is_active(state: Optional[Dict[str, Any]]) -> bool:
+    return bool(state) and state["session_state"] not in ENDED_STATES
+
+
+def read_keys(fd: int, keys: "asyncio.Queue[str]"):
+    """Event loop reader: queue every key waiting on `fd`."""
+    for key in os.read(fd, 64).decode(errors="ignore"):
+        keys.put_nowait(key)
+
+
+class AttachSession:
+    """One attached screen, until the session ends or the user leaves.
+
+    `ui` is the LockinUI (for rendering and config), `live` a Rich Live
+    (or anything with update(renderable, refresh=...)), and `keys` a queue
+    fed with key presses.
+    """
+
+    def __init__(
+        self,
+        ui: Any,
+        client: AsyncLockinClient,
+        live: Any,
+        keys: "asyncio.Queue[str]",
+        clock: Optional[Clock] = None,
+    ):
+        self.ui = ui
+        self.client = client
+        self.live = live
+        self.keys = keys
+        self.clock = clock or SystemClock()
+        self.state: Dict[str, Any] = {}
+        self.pending = 0  # Command round trips in flight
+        self.redraw = asyncio.Event()
+        self._done: Optional["asyncio.Future[AttachResult]"] = None
+        self._tasks: Set["asyncio.Task[Any]"] = set()
+
+    async def run(self, state: Dict[str, Any]) -> AttachResult:
+        """Run until done; returns (exit message, request).
+
+        The request is something the caller prompts for outside the screen:
+        "custom_break" or "tag".
+        """
+        self.state = state
+        self._done = asyncio.get_running_loop().create_future()
+        for worker in (self._read_keys(), self._watch_state(), self._render()):
+            self._spawn(worker)
+        try:
+            return await self._done
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def finish(self, message: Optional[str] = None, request: Optional[str] = None):
+        if not self._done.done():
+            self._done.set_result((message, request))
+
+    def _spawn(self, coro) -> "asyncio.Task[Any]":
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # Workers
+
+    async def _read_keys(self):
+        while True:
+            self.handle_key(await self.keys.get())
+            self.redraw.set()
+
+    async def _watch_state(self):
+        while True:
+            state = await self.client.status()
+            if state != self.state:
+                self.state = state
+                self.redraw.set()
+            # A quit on its way to starting the next session isn't an end
+            if not is_active(state) and not self.pending:
+                self.finish("[yellow]Session ended[/yellow]")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _render(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if is_active(self.state):
+                self.live.update(
+                    self.ui.make_running_renderable(self.state), refresh=True
+                )
+            # Next frame on the timer, or sooner if something sets redraw
+            self.redraw.clear()
+            timer = loop.call_later(RENDER_INTERVAL, self.redraw.set)
+            try:
+                await self.redraw.wait()
+            finally:
+                timer.cancel()
+
+    # Keys and the commands they send
+
+    def handle_key(self, raw_key: str):
+        if not is_active(self.state):
+            return
+        key = raw_key.lower()
+        session_state = self.state["session_state"]
+        session_type = self.state["session_type"]
+
+        if key == "q":
+            self._command(self._quit(self.quit_message()))
+        elif key == "d":
+            self.finish("[dim]Detached. Session continues in background.[/dim]")
+        elif key == "t":
+            self.finish(request="tag")
+        elif key == "c" and session_state == SessionState.AWAITING_DECISION:
+            self._command(self.client.continue_session())
+        elif raw_key == "B" and session_state in DECIDED_STATES:
+            # Custom break: the caller prompts for it outside the screen
+            if session_type == SessionType.WORK:
+                self.finish(request="custom_break")
+        elif key == "b" and session_state in DECIDED_STATES:
+            if session_type == SessionType.WORK:
+                self._command(self._start_break())
+        elif key == "s" and session_type == SessionType.BREAK:
+            self._command(self.client.switch_break("short"))
+        elif key == "l" and session_type == SessionType.BREAK:
+            self._command(self.client.switch_break("long"))
+        elif key == "w" and session_type == SessionType.BREAK:
+            self._command(self._start_work())
+
+    def _command(self, coro):
+        self.pending += 1
+        self._spawn(self._round_trip(coro))
+
+    async def _round_trip(self, coro):
+        try:
+            await coro
+        except CommandTimeout as e:
+            self.finish(f"[red]{e}[/red]")
+        finally:
+            self.pending -= 1
+            self.redraw.set()
+
+    async def _quit(self, message: str):
+        await self.client.quit()
+        self.finish(message)
+
+    async def _start_break(self):
+        await self.client.quit()
+        # Recommended after the session just logged, which counts to the streak
+        duration = await asyncio.to_thread(self.ui.get_recommended_break_duration)
+        await self.client.start("break", duration)
+
+    async def _start_work(self):
+        duration = self.ui.config.work_default_minutes
+        await self.client.quit()
+        await self.client.start("work", duration)
+        if not self.ui.config.auto_attach:
+            self.finish(f"[green]Work session started ({duration}m)[/green]")
+
+    def quit_message(self) -> str:
+        """What quitting now will do to the session, for after the screen."""
+        session_state = self.state["session_state"]
+        elapsed_minutes = (self.clock.time() - self.state["start_time"]) / 60
+        if self.state["session_type"] == SessionType.WORK:
+            if session_state in DECIDED_STATES:
+                return "[green]Work session completed[/green]"
+            if elapsed_minutes < self.ui.config.min_work_minutes:
+                return "[yellow]Work session scrapped (not logged)[/yellow]"
+            return "[green]Work session ended early (logged)[/green]"
+        if session_state in DECIDED_STATES:
+            return "[green]Break completed[/green]"
+        if elapsed_minutes < self.ui.config.min_break_minutes:
+            return "[yellow]Break scrapped (not logged)[/yellow]"
+        return "[green]Break ended (logged)[/green]"
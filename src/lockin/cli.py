@@ -1,10 +1,11 @@
 """CLI client with Rich terminal UI for Lockin."""
 
+import asyncio
 import sys
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from rich.console import Console, Group
 from rich.live import Live
@@ -13,32 +14,17 @@ from rich.table import Table
 from rich.text import Text
 from rich import box
 
-from .database import Database
+from .attach import AttachSession, is_active, read_keys
+from .client import AsyncLockinClient, CommandTimeout, LockinClient
+from .database import Database, normalize_tags
 from .config import Config
 from .engine import SessionState, SessionType
+from .formatting import format_duration, format_time_remaining
 
 
 console = Console()
 
 
-def format_duration(minutes: float) -> str:
-    """Format duration in minutes to human readable."""
-    if minutes < 60:
-        return f"{int(minutes)}m"
-    hours = int(minutes // 60)
-    mins = int(minutes % 60)
-    if mins == 0:
-        return f"{hours}h"
-    return f"{hours}h {mins}m"
-
-
-def format_time_remaining(seconds: float) -> str:
-    """Format seconds remaining as MM:SS."""
-    minutes = int(seconds // 60)
-    secs = int(seconds % 60)
-    return f"{minutes:02d}:{secs:02d}"
-
-
 class LockinUI:
     """Terminal UI manager for Lockin."""
 
@@ -112,6 +98,11 @@ class LockinUI:
                 f"[bold cyan]LOCKIN[/bold cyan] — {type_display}", border_style="cyan"
             )
         )
+        if state.get("tags"):
+            tags = state["tags"].replace(",", ", ")
+            elements.append(
+                Text.from_markup(f"[dim]Tags:[/dim] [magenta]{tags}[/magenta]")
+            )
         elements.append(Text())  # Empty line
 
         # Time remaining
@@ -183,13 +174,13 @@ class LockinUI:
                     if elapsed_minutes < min_work_mins:
                         elements.append(
                             Text.from_markup(
-                                "[dim]\\[q] quit (scrap)   \\[d] detach[/dim]"
+                                "[dim]\\[q] quit (scrap)   \\[t] tag   \\[d] detach[/dim]"
                             )
                         )
                     else:
                         elements.append(
                             Text.from_markup(
-                                "[dim]\\[q] quit (end early)   \\[d] detach[/dim]"
+                                "[dim]\\[q] quit (end early)   \\[t] tag   \\[d] detach[/dim]"
                             )
                         )
                 else:  # Break
@@ -207,13 +198,13 @@ class LockinUI:
                     if elapsed_minutes < break_threshold:
                         elements.append(
                             Text.from_markup(
-                                f"[dim]\\[q] end (scrap){switch_opts}{work_opt}   \\[d] detach[/dim]"
+                                f"[dim]\\[q] end (scrap){switch_opts}{work_opt}   \\[t] tag   \\[d] detach[/dim]"
                             )
                         )
                     else:
                         elements.append(
                             Text.from_markup(
-                                f"[dim]\\[q] end{switch_opts}{work_opt}   \\[d] detach[/dim]"
+                                f"[dim]\\[q] end{switch_opts}{work_opt}   \\[t] tag   \\[d] detach[/dim]"
                             )
                         )
             elif session_state == SessionState.RUNNING_BONUS:
@@ -221,14 +212,14 @@ class LockinUI:
                     break_label = self.get_recommended_break_type()
                     elements.append(
                         Text.from_markup(
-                            f"[dim]\\[q] quit (end)   \\[b/B] break ({break_label}/custom)   \\[d] detach[/dim]"
+                            f"[dim]\\[q] quit (end)   \\[b/B] break ({break_label}/custom)   \\[t] tag   \\[d] detach[/dim]"
                         )
                     )
                 else:
                     work_mins = self.config.work_default_minutes
                     elements.append(
                         Text.from_markup(
-                            f"[dim]\\[q] end   \\[w] work ({work_mins}m)   \\[d] detach[/dim]"
+                            f"[dim]\\[q] end   \\[w] work ({work_mins}m)   \\[t] tag   \\[d] detach[/dim]"
                         )
                     )
             elements.append(Text())  # Extra newline before cursor
@@ -244,7 +235,7 @@ class LockinUI:
             break_label = self.get_recommended_break_type()
             elements.append(
                 Text.from_markup(
-                    f"[dim]\\[q] quit (end)   \\[b/B] break ({break_label}/custom)   \\[c] continue   \\[d] detach[/dim]"
+                    f"[dim]\\[q] quit (end)   \\[b/B] break ({break_label}/custom)   \\[c] continue   \\[t] tag   \\[d] detach[/dim]"
                 )
             )
 
@@ -260,7 +251,9 @@ class LockinUI:
             )
         else:
             elements.append(
-                Text.from_markup("[dim]\\[q] end break   \\[d] detach[/dim]")
+                Text.from_markup(
+                    "[dim]\\[q] end break   \\[t] tag   \\[d] detach[/dim]"
+                )
             )
 
         return elements
@@ -362,169 +355,76 @@ class LockinUI:
 
             tty.setcbreak(sys.stdin.fileno())
 
+    def _prompt_tags(self, old_settings, current: Optional[str]) -> Optional[List[str]]:
+        """Prompt for the session's tags. Returns the new tags ([] clears them) or None if cancelled."""
+        import termios
+
+        termios.tcsetattr(sys.stdin, termios.TCSADRAIN, old_settings)
+
+        try:
+            if current:
+                console.print(f"\n[dim]Tags:[/dim] {current.replace(',', ', ')}")
+            console.print(
+                "\n[cyan]Tags, comma-separated ('-' to clear, Enter to cancel):[/cyan] ",
+                end="",
+            )
+            user_input = input().strip()
+
+            if not user_input:
+                return None
+            if user_input == "-":
+                return []
+            try:
+                return normalize_tags([user_input])
+            except ValueError as e:
+                console.print(f"[red]{e}[/red]")
+                time.sleep(1)
+                return None
+        finally:
+            import tty
+
+            tty.setcbreak(sys.stdin.fileno())
+
     def attach_to_session(self, wait_for_session: bool = False):
         """Attach to running session with live updates.
 
-        Uses Rich Live with alternate screen for flicker-free rendering.
+        Uses Rich Live with alternate screen for flicker-free rendering;
+        keys, state updates, redraws and commands run as asyncio tasks
+        (see attach.py).
 
         Args:
             wait_for_session: If True, wait up to 3 seconds for session to start
         """
-        import select
         import termios
         import tty
 
-        # If waiting for session to start, poll until it's active
-        if wait_for_session:
-            for _ in range(30):  # Up to 3 seconds
-                state = self.get_current_state()
-                if state and state["session_state"] not in [
-                    SessionState.IDLE,
-                    SessionState.ENDED,
-                ]:
-                    break
-                time.sleep(0.1)
-            else:
-                console.print("[yellow]Session failed to start[/yellow]")
-                return
-
         # Set terminal to raw mode for immediate key detection
         old_settings = termios.tcgetattr(sys.stdin)
-        exit_message = None  # Message to show after exiting Live context
-        custom_break_requested = False  # Flag for custom break prompt
 
         try:
             tty.setcbreak(sys.stdin.fileno())
+            exit_message, request = asyncio.run(self._attach(wait_for_session))
 
-            # Get initial state for Live
-            state = self.get_current_state()
-            if not state or state["session_state"] in [
-                SessionState.IDLE,
-                SessionState.ENDED,
-            ]:
-                console.print("[yellow]Session ended[/yellow]")
+            # Prompts happen outside the Live context
+            if request == "tag":
+                state = self.get_current_state()
+                tags = self._prompt_tags(old_settings, state and state.get("tags"))
+                if tags is not None:
+                    with LockinClient(self.db.db_path) as client:
+                        result = client.tag(tags)
+                    if not result["ok"]:
+                        console.print(f"[red]{result['message']}[/red]")
+                        time.sleep(1)
+                tty.setcbreak(sys.stdin.fileno())
+                self.attach_to_session()
                 return
 
-            with Live(
-                self.make_running_renderable(state),
-                console=console,
-                screen=True,
-                refresh_per_second=4,
-            ) as live:
-                while True:
-                    state = self.get_current_state()
-
-                    if not state or state["session_state"] in [
-                        SessionState.IDLE,
-                        SessionState.ENDED,
-                    ]:
-                        exit_message = "[yellow]Session ended[/yellow]"
-                        break
-
-                    live.update(self.make_running_renderable(state))
-
-                    # Check for keyboard input (non-blocking)
-                    if select.select([sys.stdin], [], [], 0.25)[0]:
-                        raw_key = sys.stdin.read(1)
-                        key = raw_key.lower()
-
-                        session_state = state["session_state"]
-                        session_type = state["session_type"]
-
-                        if key == "q":
-                            self.queue_command("quit_session")
-                            time.sleep(0.5)  # Wait for processing
-                            # Determine exit message
-                            elapsed_minutes = (time.time() - state["start_time"]) / 60
-                            if session_type == SessionType.WORK:
-                                threshold = self.config.min_work_minutes
-                                if session_state in [
-                                    SessionState.AWAITING_DECISION,
-                                    SessionState.RUNNING_BONUS,
-                                ]:
-                                    exit_message = (
-                                        "[green]Work session completed[/green]"
-                                    )
-                                elif elapsed_minutes < threshold:
-                                    exit_message = "[yellow]Work session scrapped (not logged)[/yellow]"
-                                else:
-                                    exit_message = "[green]Work session ended early (logged)[/green]"
-                            else:  # Break
-                                threshold = self.config.min_break_minutes
-                                if session_state in [
-                                    SessionState.AWAITING_DECISION,
-                                    SessionState.RUNNING_BONUS,
-                                ]:
-                                    exit_message = "[green]Break completed[/green]"
-                                elif elapsed_minutes < threshold:
-                                    exit_message = (
-                                        "[yellow]Break scrapped (not logged)[/yellow]"
-                                    )
-                                else:
-                                    exit_message = "[green]Break ended (logged)[/green]"
-                            break
-                        elif key == "d":
-                            exit_message = (
-                                "[dim]Detached. Session continues in background.[/dim]"
-                            )
-                            break
-                        elif (
-                            key == "c"
-                            and session_state == SessionState.AWAITING_DECISION
-                        ):
-                            self.queue_command("continue_session")
-                        elif raw_key == "B" and session_state in [
-                            SessionState.AWAITING_DECISION,
-                            SessionState.RUNNING_BONUS,
-                        ]:
-                            # Custom break - need to exit Live for prompt
-                            if session_type == SessionType.WORK:
-                                custom_break_requested = True
-                                break
-                        elif key == "b" and session_state in [
-                            SessionState.AWAITING_DECISION,
-                            SessionState.RUNNING_BONUS,
-                        ]:
-                            # Start recommended break
-                            if session_type == SessionType.WORK:
-                                self.queue_command("quit_session")
-                                time.sleep(0.5)
-                                duration = self.get_recommended_break_duration()
-                                self.queue_command(
-                                    "start_session",
-                                    session_type="break",
-                                    duration_minutes=duration,
-                                )
-                        elif key == "s" and session_type == SessionType.BREAK:
-                            self.queue_command("switch_break", break_type="short")
-                        elif key == "l" and session_type == SessionType.BREAK:
-                            self.queue_command("switch_break", break_type="long")
-                        elif key == "w" and session_type == SessionType.BREAK:
-                            # End break and start work session
-                            self.queue_command("quit_session")
-                            time.sleep(0.5)
-                            duration = self.config.work_default_minutes
-                            self.queue_command(
-                                "start_session",
-                                session_type="work",
-                                duration_minutes=duration,
-                            )
-                            if not self.config.auto_attach:
-                                exit_message = (
-                                    f"[green]Work session started ({duration}m)[/green]"
-                                )
-                                break
-                            # Otherwise loop continues and picks up new session
-
-            # Handle custom break prompt outside Live context
-            if custom_break_requested:
+            if request == "custom_break":
                 duration = self._prompt_custom_break_duration(old_settings)
                 if duration:
-                    self.queue_command("quit_session")
-                    time.sleep(0.5)
-                    self.queue_command(
-                        "start_session", session_type="break", duration_minutes=duration
-                    )
+                    with LockinClient(self.db.db_path) as client:
+                        client.quit()
+                        client.start("break", duration)
                     # Re-attach to the new break session
                     tty.setcbreak(sys.stdin.fileno())
                     self.attach_to_session(wait_for_session=True)
@@ -538,13 +438,51 @@ class LockinUI:
             if exit_message:
                 console.print(exit_message)
 
+        except CommandTimeout as e:
+            console.print(f"[red]{e}[/red]")
         finally:
             termios.tcsetattr(sys.stdin, termios.TCSADRAIN, old_settings)
 
-    def show_stats(self, period: str, date_arg: Optional[str] = None):
-        """Display statistics for a period."""
-        console.clear()
-
+    async def _attach(
+        self, wait_for_session: bool
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Run the attached screen; returns (exit message, request)."""
+        async with AsyncLockinClient(self.db.db_path) as client:
+            state = await client.status()
+            # If waiting for session to start, poll until it's active
+            if wait_for_session:
+                for _ in range(30):  # Up to 3 seconds
+                    if is_active(state):
+                        break
+                    await asyncio.sleep(0.1)
+                    state = await client.status()
+                else:
+                    return "[yellow]Session failed to start[/yellow]", None
+            if not is_active(state):
+                return "[yellow]Session ended[/yellow]", None
+
+            loop = asyncio.get_running_loop()
+            keys: "asyncio.Queue[str]" = asyncio.Queue()
+            fd = sys.stdin.fileno()
+            loop.add_reader(fd, read_keys, fd, keys)
+            try:
+                with Live(
+                    self.make_running_renderable(state),
+                    console=console,
+                    screen=True,
+                    auto_refresh=False,  # AttachSession redraws
+                ) as live:
+                    return await AttachSession(self, client, live, keys).run(state)
+            finally:
+                loop.remove_reader(fd)
+
+    def _resolve_period(
+        self, period: str, date_arg: Optional[str] = None
+    ) -> Optional[tuple]:
+        """Resolve a stats period and optional date into (start, end, title).
+
+        Prints the problem and returns None if the date can't be parsed.
+        """
         # Parse date and determine range
         today = datetime.now()
 
@@ -559,7 +497,7 @@ class LockinUI:
                         console.print(
                             "[dim]Expected format: DDMMYY (e.g., 150124 for Jan 15, 2024)[/dim]"
                         )
-                        return
+                        return None
                 else:
                     ref_date = today
 
@@ -580,7 +518,7 @@ class LockinUI:
                         console.print(
                             "[dim]Expected format: DDMMYY (e.g., 150124 for Jan 15, 2024)[/dim]"
                         )
-                        return
+                        return None
                 else:
                     ref_date = today
 
@@ -603,7 +541,7 @@ class LockinUI:
                     except ValueError:
                         console.print(f"[red]Invalid year: {date_arg}[/red]")
                         console.print("[dim]Expected format: YYYY (e.g., 2024)[/dim]")
-                        return
+                        return None
                 else:
                     year = today.year
 
@@ -614,16 +552,40 @@ class LockinUI:
             else:
                 console.print("[red]Invalid period[/red]")
                 console.print("[dim]Valid periods: week, month, year[/dim]")
-                return
+                return None
 
         except Exception as e:
             console.print(f"[red]Error parsing date: {e}[/red]")
+            return None
+
+        return start_date, end_date, title
+
+    def show_stats(
+        self,
+        period: str,
+        date_arg: Optional[str] = None,
+        tag: Optional[str] = None,
+        by: Optional[str] = None,
+    ):
+        """Display statistics for a period, or one tag's, or per tag (by="tag")."""
+        console.clear()
+
+        resolved = self._resolve_period(period, date_arg)
+        if not resolved:
+            return
+        start_date, end_date, title = resolved
+
+        if by == "tag":
+            self._show_tag_totals(start_date, end_date, title)
             return
 
-        # Get sessions
-        sessions = self.db.get_sessions_by_date_range(start_date, end_date)
+        # Aggregated in SQLite; finished periods come straight from the cache
+        stats = self.db.get_period_stats(period, start_date, end_date, tag=tag)
+        summary = stats["summary"]
 
         # Header
+        if tag:
+            title = f"{title} [magenta]#{tag}[/magenta]"
         console.print(
             Panel.fit(
                 f"[bold cyan]LOCKIN[/bold cyan] — Stats: {title}", border_style="cyan"
@@ -631,30 +593,17 @@ class LockinUI:
         )
         console.print()
 
-        if not sessions:
-            console.print("[dim]No sessions in this period[/dim]")
+        if not summary["session_count"]:
+            tagged = f" tagged {tag}" if tag else ""
+            console.print(f"[dim]No sessions{tagged} in this period[/dim]")
             return
 
-        # Calculate statistics
-        total_work_completed = 0
-        total_work_abandoned = 0
-        total_break = 0
-
-        completed_sessions = 0
-        abandoned_sessions = 0
-
-        for session in sessions:
-            duration = session["actual_duration_minutes"] or 0
+        total_work_completed = summary["work_completed_minutes"]
+        total_work_abandoned = summary["work_abandoned_minutes"]
+        total_break = summary["break_minutes"]
 
-            if session["session_type"] == "work":
-                if session["state"] == "completed":
-                    total_work_completed += duration
-                    completed_sessions += 1
-                elif session["state"] == "abandoned":
-                    total_work_abandoned += duration
-                    abandoned_sessions += 1
-            elif session["session_type"] == "break":
-                total_break += duration
+        completed_sessions = summary["completed_sessions"]
+        abandoned_sessions = summary["abandoned_sessions"]
 
         # Summary table
         table = Table(show_header=True, box=box.ROUNDED, border_style="cyan")
@@ -685,7 +634,7 @@ class LockinUI:
             console.print("[bold]Daily breakdown:[/bold]")
             console.print()
 
-            # Group by day
+            # Every day of the week gets a row, even with no sessions
             daily_stats = {}
             current = start_date
 
@@ -694,19 +643,9 @@ class LockinUI:
                 daily_stats[day_key] = {"work": 0, "sessions": 0}
                 current += timedelta(days=1)
 
-            for session in sessions:
-                if (
-                    session["session_type"] == "work"
-                    and session["state"] == "completed"
-                ):
-                    day_key = datetime.fromtimestamp(session["start_time"]).strftime(
-                        "%Y-%m-%d"
-                    )
-                    if day_key in daily_stats:
-                        daily_stats[day_key]["work"] += session[
-                            "actual_duration_minutes"
-                        ]
-                        daily_stats[day_key]["sessions"] += 1
+            for day_key, totals in stats["buckets"].items():
+                if day_key in daily_stats:
+                    daily_stats[day_key] = totals
 
             # Display bar chart
             max_minutes = (
@@ -741,7 +680,7 @@ class LockinUI:
             console.print("[bold]Weekly breakdown:[/bold]")
             console.print()
 
-            # Group by week (Monday start)
+            # Every week touching the month gets a row (Monday start)
             weekly_stats = {}
             current = start_date
 
@@ -753,19 +692,9 @@ class LockinUI:
                     weekly_stats[week_key] = {"work": 0, "sessions": 0}
                 current += timedelta(days=1)
 
-            for session in sessions:
-                if (
-                    session["session_type"] == "work"
-                    and session["state"] == "completed"
-                ):
-                    session_date = datetime.fromtimestamp(session["start_time"])
-                    week_start = session_date - timedelta(days=session_date.weekday())
-                    week_key = week_start.strftime("%Y-%m-%d")
-                    if week_key in weekly_stats:
-                        weekly_stats[week_key]["work"] += session[
-                            "actual_duration_minutes"
-                        ]
-                        weekly_stats[week_key]["sessions"] += 1
+            for week_key, totals in stats["buckets"].items():
+                if week_key in weekly_stats:
+                    weekly_stats[week_key] = totals
 
             # Display bar chart
             max_minutes = (
@@ -797,6 +726,289 @@ class LockinUI:
                 else:
                     console.print(f"{week_label:12} [dim]—[/dim]")
 
+        elif period == "year":
+            # At most 366 aggregated rows, whatever the number of sessions
+            daily_stats = stats["buckets"]
+
+            console.print("[bold]Calendar:[/bold]")
+            console.print()
+            for line in self._make_year_calendar(start_date, end_date, daily_stats):
+                console.print(line)
+            console.print()
+
+            console.print("[bold]Monthly breakdown:[/bold]")
+            console.print()
+
+            monthly_stats = self._monthly_totals(start_date, end_date, daily_stats)
+
+            # Display bar chart
+            max_minutes = max(120, max(m["work"] for m in monthly_stats.values()))
+
+            for month_key in sorted(monthly_stats.keys()):
+                stats = monthly_stats[month_key]
+                month_label = datetime.strptime(month_key, "%Y-%m").strftime("%b")
+
+                minutes = stats["work"]
+                sessions = stats["sessions"]
+                bar = "█" * int((minutes / max_minutes) * 30)
+
+                if minutes > 0:
+                    console.print(
+                        f"{month_label:5} {format_duration(minutes):>8} ({sessions:>3} sessions)  [cyan]{bar}[/cyan]"
+                    )
+                else:
+                    console.print(f"{month_label:5} [dim]—[/dim]")
+
+    def _show_tag_totals(self, start_date: datetime, end_date: datetime, title: str):
+        """Focused time per tag over a period, from the per-tag daily rollup."""
+        console.print(
+            Panel.fit(
+                f"[bold cyan]LOCKIN[/bold cyan] — Stats by tag: {title}",
+                border_style="cyan",
+            )
+        )
+        console.print()
+
+        totals = self.db.get_tag_totals(start_date, end_date)
+        if not totals:
+            console.print("[dim]No tagged sessions in this period[/dim]")
+            return
+
+        focused = self.db.get_period_summary(start_date, end_date)
+        all_work = focused["work_completed_minutes"] + focused["work_abandoned_minutes"]
+
+        table = Table(show_header=True, box=box.ROUNDED, border_style="cyan")
+        table.add_column("Tag", style="magenta")
+        table.add_column("Focused", justify="right")
+        table.add_column("Sessions", justify="right")
+        table.add_column("Breaks", justify="right")
+        table.add_column("Share", justify="right", style="dim")
+        for row in totals:
+            share = row["work_minutes"] / all_work if all_work else 0
+            sessions = f"[green]{row['completed_sessions']}[/green]"
+            if row["abandoned_sessions"]:
+                sessions += f" [yellow]+{row['abandoned_sessions']}[/yellow]"
+            table.add_row(
+                row["tag"],
+                f"[green]{format_duration(row['work_minutes'])}[/green]",
+                sessions,
+                format_duration(row["break_minutes"]),
+                f"{share:.0%}",
+            )
+        console.print(table)
+        console.print(
+            "[dim]Share is of all focused time in the period; a session with "
+            "several tags counts toward each.[/dim]"
+        )
+
+    def _monthly_totals(
+        self, start_date: datetime, end_date: datetime, daily_stats: dict
+    ) -> dict:
+        """Sum per-day work totals into months; every month in range gets a row."""
+        monthly_stats = {}
+        current = start_date
+        while current < end_date:
+            monthly_stats[current.strftime("%Y-%m")] = {"work": 0, "sessions": 0}
+            current = (current + timedelta(days=32)).replace(day=1)
+
+        for day_key, totals in daily_stats.items():
+            month = monthly_stats.get(day_key[:7])
+            if month is not None:
+                month["work"] += totals["work"]
+                month["sessions"] += totals["sessions"]
+        return monthly_stats
+
+    def _make_year_calendar(
+        self, start_date: datetime, end_date: datetime, daily_stats: dict
+    ) -> list:
+        """Build a GitHub-style grid: one column per week, one row per weekday.
+
+        Each cell shades a day's completed focus relative to the busiest day.
+        """
+        shades = "░▒▓█"
+        max_minutes = max((d["work"] for d in daily_stats.values()), default=0)
+        first_monday = start_date - timedelta(days=start_date.weekday())
+        weeks = (end_date - first_monday).days // 7 + 1
+
+        # Month labels above the week in which each month starts
+        header = [" "] * (weeks + 3)
+        current = start_date
+        while current < end_date:
+            column = (current - first_monday).days // 7
+            label = current.strftime("%b")
+            if all(c == " " for c in header[column : column + 4]):
+                header[column : column + 3] = label
+            current = (current + timedelta(days=32)).replace(day=1)
+        lines = ["    " + "".join(header).rstrip()]
+
+        for weekday, day_name in enumerate(["Mon", "", "Wed", "", "Fri", "", "Sun"]):
+            cells = []
+            for week in range(weeks):
+                day = first_monday + timedelta(days=week * 7 + weekday)
+                if day < start_date or day >= end_date:
+                    cells.append(" ")
+                    continue
+                minutes = daily_stats.get(day.strftime("%Y-%m-%d"), {}).get("work", 0)
+                if minutes <= 0:
+                    cells.append("[dim]·[/dim]")
+                else:
+                    level = min(3, int(minutes / max_minutes * 4))
+                    cells.append(f"[green]{shades[level]}[/green]")
+            lines.append(f"{day_name:3} " + "".join(cells))
+
+        lines.append(f"    [dim]Less[/dim] [green]{shades}[/green] [dim]More[/dim]")
+        return lines
+
+    def show_heatmap(self, range_arg: Optional[str] = None):
+        """Display focused minutes by hour of day and weekday."""
+        console.clear()
+
+        range_arg = range_arg or "all"
+        if range_arg == "all":
+            start_date, end_date, title = None, None, "all time"
+        elif range_arg in ("week", "month", "year"):
+            resolved = self._resolve_period(range_arg)
+            if not resolved:
+                return
+            start_date, end_date, title = resolved
+        else:
+            console.print(f"[red]Invalid range: {range_arg}[/red]")
+            console.print("[dim]Valid ranges: week, month, year, all[/dim]")
+            return
+
+        heatmap = self.db.get_focus_heatmap(start_date, end_date)
+
+        console.print(
+            Panel.fit(
+                f"[bold cyan]LOCKIN[/bold cyan] — Focus heatmap: {title}",
+                border_style="cyan",
+            )
+        )
+        console.print()
+
+        if not heatmap:
+            console.print("[dim]No focused time in this period[/dim]")
+            return
+
+        # Shade each hour relative to the busiest one
+        shades = ["░░", "▒▒", "▓▓", "██"]
+        max_minutes = max(heatmap.values())
+        day_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+        console.print("    " + "".join(f"{hour:02d}    " for hour in range(0, 24, 3)))
+        for weekday, day_name in enumerate(day_names):
+            cells = []
+            for hour in range(24):
+                minutes = heatmap.get((weekday, hour), 0)
+                if minutes <= 0:
+                    cells.append("[dim]··[/dim]")
+                else:
+                    level = min(3, int(minutes / max_minutes * 4))
+                    cells.append(f"[green]{shades[level]}[/green]")
+            day_total = sum(heatmap.get((weekday, hour), 0) for hour in range(24))
+            console.print(
+                f"{day_name} {''.join(cells)} {format_duration(day_total):>7}"
+            )
+
+        console.print()
+        peak_weekday, peak_hour = max(heatmap, key=heatmap.get)
+        console.print(
+            f"[dim]Peak:[/dim] {day_names[peak_weekday]} "
+            f"{peak_hour:02d}:00–{(peak_hour + 1) % 24:02d}:00 "
+            f"({format_duration(max_minutes)})"
+        )
+        console.print(
+            f"[dim]Less[/dim] [green]{''.join(shades)}[/green] [dim]More[/dim]"
+        )
+
+    def show_trend(self, weeks_arg: Optional[str] = None):
+        """Display rolling averages and week-over-week trends."""
+        console.clear()
+
+        weeks = 8
+        if weeks_arg:
+            try:
+                weeks = int(weeks_arg)
+                if weeks < 1 or weeks > 520:
+                    raise ValueError("Weeks out of range")
+            except ValueError:
+                console.print(f"[red]Invalid number of weeks: {weeks_arg}[/red]")
+                console.print("[dim]Expected a number from 1 to 520[/dim]")
+                return
+
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow = today + timedelta(days=1)
+        this_monday = today - timedelta(days=today.weekday())
+        start_date = this_monday - timedelta(days=7 * (weeks - 1))
+
+        weekly = self.db.get_weekly_trend(start_date, this_monday + timedelta(days=7))
+        # One extra week of days so "previous 7 days" is available for today
+        daily = {
+            row["day"]: row
+            for row in self.db.get_daily_trend(
+                min(start_date, today - timedelta(days=7)), tomorrow
+            )
+        }
+
+        console.print(
+            Panel.fit(
+                f"[bold cyan]LOCKIN[/bold cyan] — Trends: last {weeks} week"
+                + ("s" if weeks != 1 else ""),
+                border_style="cyan",
+            )
+        )
+        console.print()
+
+        current = daily[today.strftime("%Y-%m-%d")]
+        previous = daily[(today - timedelta(days=7)).strftime("%Y-%m-%d")]
+        change = ""
+        if previous["avg_7d"] > 0:
+            pct = (current["avg_7d"] - previous["avg_7d"]) / previous["avg_7d"] * 100
+            color = "green" if pct >= 0 else "red"
+            change = f" [{color}]{pct:+.0f}%[/{color}] [dim]vs previous 7 days[/dim]"
+        console.print(
+            f"[bold]7-day average:[/bold] {format_duration(current['avg_7d'])}/day{change}"
+        )
+        console.print(
+            f"[bold]28-day average:[/bold] {format_duration(current['avg_28d'])}/day"
+        )
+        console.print()
+
+        table = Table(show_header=True, box=box.ROUNDED, border_style="cyan")
+        table.add_column("Week", style="bold")
+        table.add_column("Focused", justify="right")
+        table.add_column("vs prev", justify="right")
+        table.add_column("Done/Abandoned", justify="right")
+        table.add_column("Completion", justify="right")
+        table.add_column("7d avg", justify="right")
+        table.add_column("28d avg", justify="right")
+
+        for row in weekly:
+            week_dt = datetime.strptime(row["week"], "%Y-%m-%d")
+            week_end = min(week_dt + timedelta(days=6), today)
+            averages = daily[week_end.strftime("%Y-%m-%d")]
+
+            delta = row["delta"]
+            if not delta:
+                delta_str = "[dim]—[/dim]"
+            elif delta > 0:
+                delta_str = f"[green]+{format_duration(delta)}[/green]"
+            else:
+                delta_str = f"[red]-{format_duration(-delta)}[/red]"
+
+            ratio = row["completion_ratio"]
+            table.add_row(
+                week_dt.strftime("%b %d"),
+                format_duration(row["focused"]),
+                delta_str,
+                f"{row['completed']}/{row['abandoned']}",
+                f"{ratio:.0%}" if ratio is not None else "[dim]—[/dim]",
+                format_duration(averages["avg_7d"]),
+                format_duration(averages["avg_28d"]),
+            )
+
+        console.print(table)
+
     def show_config(self):
         """Display current configuration."""
         console.clear()
@@ -823,9 +1035,26 @@ class LockinUI:
         console.print("[dim]To change: lockin config <key> <value>[/dim]")
         console.print("[dim]To reset: lockin config reset[/dim]")
 
+    def _format_session_date(self, start_timestamp: float) -> str:
+        """Format a session start as 'today HH:MM', 'yesterday HH:MM' or a date."""
+        start_time = datetime.fromtimestamp(start_timestamp)
+        today = datetime.now().date()
+        if start_time.date() == today:
+            return f"today {start_time.strftime('%H:%M')}"
+        elif start_time.date() == today - timedelta(days=1):
+            return f"yesterday {start_time.strftime('%H:%M')}"
+        return start_time.strftime("%Y-%m-%d %H:%M")
+
     def show_log(self, limit: int = 10, session_type: Optional[str] = None):
-        """Display recent session log."""
-        sessions = self.db.get_recent_sessions(limit, session_type)
+        """Display recent session log.
+
+        Shows ``limit`` sessions at a time. In an interactive terminal the
+        user can keep paging back through history; each further page is
+        fetched lazily with a keyset query, so paging stays cheap however
+        far back it goes.
+        """
+        # One extra row tells us whether there is another page
+        sessions = self.db.get_sessions_page(limit + 1, session_type)
 
         if not sessions:
             filter_msg = f" {session_type}" if session_type else ""
@@ -842,71 +1071,98 @@ class LockinUI:
         )
         console.print()
 
-        # Table
-        table = Table(show_header=True, box=box.ROUNDED, border_style="cyan")
-        table.add_column("#", style="dim", justify="right")
-        table.add_column("Type", style="bold")
-        table.add_column("Duration", justify="right")
-        table.add_column("Status")
-        table.add_column("Date", style="dim")
-
-        for i, session in enumerate(sessions, 1):
-            session_type_str = session["session_type"].capitalize()
-            duration = int(session["actual_duration_minutes"])
-            state = session["state"]
-            start_time = datetime.fromtimestamp(session["start_time"])
-
-            # Color the status
-            if state == "completed":
-                status = "[green]completed[/green]"
-            elif state == "abandoned":
-                status = "[yellow]abandoned[/yellow]"
-            else:
-                status = f"[dim]{state}[/dim]"
-
-            # Format date
-            today = datetime.now().date()
-            if start_time.date() == today:
-                date_str = f"today {start_time.strftime('%H:%M')}"
-            elif start_time.date() == today - timedelta(days=1):
-                date_str = f"yesterday {start_time.strftime('%H:%M')}"
-            else:
-                date_str = start_time.strftime("%Y-%m-%d %H:%M")
+        interactive = sys.stdin.isatty() and sys.stdout.isatty()
+        position = 1
+
+        while True:
+            has_more = len(sessions) > limit
+            page = sessions[:limit]
+            tags = self.db.get_session_tags([session["id"] for session in page])
+
+            # Table
+            table = Table(show_header=True, box=box.ROUNDED, border_style="cyan")
+            table.add_column("#", style="dim", justify="right")
+            table.add_column("Type", style="bold")
+            table.add_column("Duration", justify="right")
+            table.add_column("Status")
+            table.add_column("Date", style="dim")
+            table.add_column("ID", style="dim", justify="right")
+            if tags:
+                table.add_column("Tags", style="magenta")
+
+            for i, session in enumerate(page, position):
+                session_type_str = session["session_type"].capitalize()
+                duration = int(session["actual_duration_minutes"])
+                state = session["state"]
+
+                # Color the status
+                if state == "completed":
+                    status = "[green]completed[/green]"
+                elif state == "abandoned":
+                    status = "[yellow]abandoned[/yellow]"
+                else:
+                    status = f"[dim]{state}[/dim]"
+
+                row = [
+                    str(i),
+                    session_type_str,
+                    f"{duration} min",
+                    status,
+                    self._format_session_date(session["start_time"]),
+                    str(session["id"]),
+                ]
+                if tags:
+                    row.append(", ".join(tags.get(session["id"], [])))
+                table.add_row(*row)
+
+            console.print(table)
+
+            if not (has_more and interactive):
+                return
 
-            table.add_row(str(i), session_type_str, f"{duration} min", status, date_str)
+            try:
+                response = input("Enter for more, q to quit: ").strip().lower()
+            except (KeyboardInterrupt, EOFError):
+                console.print()
+                return
+            if response == "q":
+                return
 
-        console.print(table)
+            position += len(page)
+            last = page[-1]
+            sessions = self.db.get_sessions_page(
+                limit + 1, session_type, before=(last["start_time"], last["id"])
+            )
 
-    def delete_session(self, position: int) -> bool:
+    def delete_session(self, position: int, by_id: bool = False) -> bool:
         """Delete a session by its position in the unfiltered log (1 = most recent).
 
+        With ``by_id`` the number is the stable session ID from the log's ID
+        column instead, which does not shift as sessions are deleted.
         Shows confirmation prompt. Returns True if deleted.
         """
-        # Get unfiltered sessions to find the one at this position
-        sessions = self.db.get_recent_sessions(limit=position)
-
-        if position < 1 or position > len(sessions):
-            console.print(f"[red]Invalid position: {position}[/red]")
-            console.print(
-                f"[dim]Use 'lockin log' to see valid positions (1-{len(sessions) if sessions else 'N'})[/dim]"
-            )
-            return False
-
-        session = sessions[position - 1]
+        if by_id:
+            session = self.db.get_session(position)
+            if not session:
+                console.print(f"[red]No session with ID {position}[/red]")
+                console.print("[dim]Use 'lockin log' to see session IDs[/dim]")
+                return False
+        else:
+            # Resolved by the database; only the one row is fetched
+            session = self.db.get_session_at_position(position)
+            if not session:
+                total = self.db.count_sessions()
+                console.print(f"[red]Invalid position: {position}[/red]")
+                console.print(
+                    f"[dim]Use 'lockin log' to see valid positions (1-{total if total else 'N'})[/dim]"
+                )
+                return False
 
         # Format session info for confirmation
         session_type = session["session_type"].capitalize()
         duration = int(session["actual_duration_minutes"])
         state = session["state"]
-        start_time = datetime.fromtimestamp(session["start_time"])
-
-        today = datetime.now().date()
-        if start_time.date() == today:
-            date_str = f"today {start_time.strftime('%H:%M')}"
-        elif start_time.date() == today - timedelta(days=1):
-            date_str = f"yesterday {start_time.strftime('%H:%M')}"
-        else:
-            date_str = start_time.strftime("%Y-%m-%d %H:%M")
+        date_str = self._format_session_date(session["start_time"])
 
         # Show what will be deleted
         console.print("[bold]Delete this session?[/bold]")
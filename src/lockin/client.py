@@ -0,0 +1,271 @@
+"""Python client for controlling Lockin from other programs.
+
+    from lockin.client import LockinClient
+
+    with LockinClient() as lockin:
+        result = lockin.start("work", 50)   # {"id": 7, "ok": True, "message": ...}
+        lockin.status()["session_state"]    # "running"
+        lockin.quit()
+
+A client talks to the engine the way the CLI does, through the database,
+but over one kept-open connection: a call costs a query or two rather
+than a process start and a fresh connection. Commands are queued and then
+waited on until the engine has handled them, and return what the engine
+said. The engine handles commands once a second, so expect up to a second
+per command.
+
+:class:`AsyncLockinClient` has the same methods as coroutines. Its
+queries run on one worker thread (which owns the connection) and waiting
+for the engine never blocks the event loop.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import Config
+from .database import ENGINE_STATE_FIELDS, Database, normalize_tags
+
+DEFAULT_TIMEOUT = 5.0  # Seconds to wait for the engine to handle a command
+POLL_INTERVAL = 0.05  # Seconds between checks for a command's result
+
+
+def default_db_path() -> Path:
+    """The database the CLI and engine use."""
+    return Path.home() / ".lockin" / "lockin.db"
+
+
+class CommandTimeout(TimeoutError):
+    """The engine didn't handle a command in time (is it running?)."""
+
+    def __init__(self, command: str, command_id: int, timeout: float, withdrawn: bool):
+        if withdrawn:
+            outcome = "it was withdrawn"
+        else:
+            outcome = "it was already claimed and will still run"
+        super().__init__(
+            f"Engine did not handle {command} within {timeout:g}s ({outcome}); "
+            "is the engine running?"
+        )
+        self.command = command
+        self.command_id = command_id
+        self.withdrawn = withdrawn
+
+
+class LockinClient:
+    """Synchronous Lockin client over one database connection.
+
+    Use from one thread at a time (the connection belongs to the thread
+    that first uses it); close() it, or use it as a context manager.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        self.db = Database(db_path or default_db_path(), keep_open=True)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._config: Optional[Config] = None
+        self._state: Tuple[int, Optional[Dict[str, Any]]] = (-1, None)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self) -> "LockinClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Commands
+
+    def start(
+        self,
+        session_type: str = "work",
+        duration_minutes: Optional[int] = None,
+        tags: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Start a session; the duration defaults to the configured one.
+
+        Raises ValueError for invalid tags, before anything is queued.
+        """
+        return self._send(*self._start_args(session_type, duration_minutes, tags))
+
+    def quit(self) -> Dict[str, Any]:
+        """End the current session (logging it if it ran long enough)."""
+        return self._send("quit_session")
+
+    def continue_session(self) -> Dict[str, Any]:
+        """Continue into bonus time from the decision window."""
+        return self._send("continue_session")
+
+    def switch_break(self, break_type: str) -> Dict[str, Any]:
+        """Switch the running break to "short" or "long"."""
+        return self._send("switch_break", {"break_type": break_type})
+
+    def tag(self, tags: List[str]) -> Dict[str, Any]:
+        """Replace the running session's tags (an empty list clears them).
+
+        Raises ValueError for invalid tags, before anything is queued.
+        """
+        return self._send("tag_session", {"tags": normalize_tags(tags)})
+
+    # Queries
+
+    def status(self) -> Dict[str, Any]:
+        """The engine's current state (session_state "idle" when none).
+
+        Re-read only when the engine's state version has moved.
+        """
+        version, state = self._state
+        changed = self.db.poll_engine_state(version)
+        if changed:
+            self._state = version, state = changed
+        if state is None:
+            return {**dict.fromkeys(ENGINE_STATE_FIELDS), "session_state": "idle"}
+        return dict(state)
+
+    def stats(self) -> Dict[str, Any]:
+        """Today's totals and the current streak."""
+        return {
+            "today": self.db.get_todays_stats(),
+            "streak": self.db.calculate_current_streak(),
+        }
+
+    # Plumbing shared with AsyncLockinClient
+
+    def _start_args(
+        self,
+        session_type: str,
+        duration_minutes: Optional[int],
+        tags: Optional[List[str]] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        if duration_minutes is None:
+            if self._config is None:
+                self._config = Config(self.db)
+            if session_type == "work":
+                duration_minutes = self._config.work_default_minutes
+            else:
+                duration_minutes = self._config.short_break_minutes
+        args: Dict[str, Any] = {
+            "session_type": session_type,
+            "duration_minutes": int(duration_minutes),
+        }
+        tags = normalize_tags(tags or [])
+        if tags:
+            args["tags"] = tags
+        return "start_session", args
+
+    def _send(self, command: str, args: Optional[Dict[str, Any]] = None):
+        command_id = self.db.queue_command(command, args)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            result = self._result(command_id)
+            if result is not None:
+                return result
+            if time.monotonic() >= deadline:
+                return self._give_up(command, command_id)
+            time.sleep(self.poll_interval)
+
+    def _result(self, command_id: int) -> Optional[Dict[str, Any]]:
+        results = self.db.get_command_results([command_id])
+        if command_id not in results:
+            return None
+        # Handled by an engine too old to record results
+        result = results[command_id] or {"ok": True, "message": None}
+        return {"id": command_id, **result}
+
+    def _give_up(self, command: str, command_id: int) -> Dict[str, Any]:
+        """Withdraw a command that timed out, unless it has run meanwhile."""
+        if self.db.cancel_command(command_id):
+            raise CommandTimeout(command, command_id, self.timeout, withdrawn=True)
+        result = self._result(command_id)
+        if result is None:
+            raise CommandTimeout(command, command_id, self.timeout, withdrawn=False)
+        return result
+
+
+class AsyncLockinClient:
+    """asyncio Lockin client; the same methods as LockinClient, awaited."""
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        # One worker thread owns the connection, so calls never interleave
+        # on it; waiting between polls happens on the event loop
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="lockin-client")
+        self._client: Optional[LockinClient] = None
+        self._db_path = db_path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, fn, args)
+
+    def _call(self, fn: Callable[..., Any], args: tuple) -> Any:
+        # On the worker thread, where the client and its connection live
+        if self._client is None:
+            self._client = LockinClient(self._db_path, self.timeout, self.poll_interval)
+        return fn(self._client, *args)
+
+    async def close(self):
+        if self._client is not None:
+            await self._run(LockinClient.close)
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> "AsyncLockinClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(
+        self,
+        session_type: str = "work",
+        duration_minutes: Optional[int] = None,
+        tags: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        args = await self._run(
+            LockinClient._start_args, session_type, duration_minutes, tags
+        )
+        return await self._send(*args)
+
+    async def quit(self) -> Dict[str, Any]:
+        return await self._send("quit_session")
+
+    async def continue_session(self) -> Dict[str, Any]:
+        return await self._send("continue_session")
+
+    async def switch_break(self, break_type: str) -> Dict[str, Any]:
+        return await self._send("switch_break", {"break_type": break_type})
+
+    async def tag(self, tags: List[str]) -> Dict[str, Any]:
+        return await self._send("tag_session", {"tags": normalize_tags(tags)})
+
+    async def status(self) -> Dict[str, Any]:
+        return await self._run(LockinClient.status)
+
+    async def stats(self) -> Dict[str, Any]:
+        return await self._run(LockinClient.stats)
+
+    async def _send(self, command: str, args: Optional[Dict[str, Any]] = None):
+        command_id = await self._run(
+            lambda client: client.db.queue_command(command, args)
+        )
+        deadline = time.monotonic() + self.timeout
+        while True:
+            result = await self._run(LockinClient._result, command_id)
+            if result is not None:
+                return result
+            if time.monotonic() >= deadline:
+                return await self._run(LockinClient._give_up, command, command_id)
+            await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,65 @@
+"""Clocks for the engine and database.
+
+Everything that asks "what time is it?" goes through a clock so the state
+machine can be driven faster than real time: :class:`SimulatedClock` makes
+``sleep`` advance the clock instead of blocking, so days of sessions run in
+milliseconds in tests and experiments.
+"""
+
+import abc
+import time
+from datetime import datetime
+from typing import Optional
+
+
+class Clock(abc.ABC):
+    """Interface shared by the clocks below."""
+
+    @abc.abstractmethod
+    def time(self) -> float:
+        """Current Unix timestamp."""
+
+    def now(self) -> datetime:
+        """Current local datetime."""
+        return datetime.fromtimestamp(self.time())
+
+    @abc.abstractmethod
+    def sleep(self, seconds: float):
+        """Wait for `seconds` to pass."""
+
+
+class SystemClock(Clock):
+    """Wall-clock time (the default)."""
+
+    def time(self) -> float:
+        """Current Unix timestamp."""
+        return time.time()
+
+    def now(self) -> datetime:
+        """Current local datetime."""
+        return datetime.now()
+
+    def sleep(self, seconds: float):
+        """Block for `seconds`."""
+        time.sleep(seconds)
+
+
+class SimulatedClock(Clock):
+    """Clock that only moves when told to; sleep() advances it instantly."""
+
+    def __init__(self, start: Optional[float] = None):
+        self._now = time.time() if start is None else start
+
+    def time(self) -> float:
+        """Current simulated Unix timestamp."""
+        return self._now
+
+    def sleep(self, seconds: float):
+        """Advance by `seconds` without blocking."""
+        self.advance(seconds)
+
+    def advance(self, seconds: float):
+        """Move the clock forward by `seconds`."""
+        if seconds < 0:
+            raise ValueError("Cannot move a clock backwards")
+        self._now += seconds
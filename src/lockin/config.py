@@ -1,6 +1,7 @@
 """Configuration management for Lockin."""
 
-from typing import Any, Dict
+from pathlib import Path
+from typing import Any, Dict, Optional
 from .database import Database
 
 
@@ -16,6 +17,10 @@ DEFAULT_CONFIG = {
     "work_overtime_enabled": True,  # Enter overtime when work session ends
     "work_overtime_max_minutes": 60,  # Max work overtime before auto-end (0 = unlimited)
     "break_overtime_contributes": False,  # Whether break overtime counts toward logged time
+    "api_port": 0,  # Engine's local HTTP API port on 127.0.0.1 (0 = off)
+    "metrics_textfile": "",  # File the engine keeps OpenMetrics in ("" = off)
+    "hook_workers": 2,  # Hooks the engine runs at once
+    "hook_timeout_seconds": 10,  # Hooks still running after this are stopped
 }
 
 
@@ -66,9 +71,11 @@ class Config:
         elif isinstance(default_value, (int, float)):
             try:
                 num_value = float(value)
-                # work_overtime_max_minutes allows 0 (meaning unlimited)
+                # work_overtime_max_minutes allows 0 (meaning unlimited),
+                # api_port allows 0 (meaning off)
                 if num_value < 0 or (
-                    num_value == 0 and key != "work_overtime_max_minutes"
+                    num_value == 0
+                    and key not in ("work_overtime_max_minutes", "api_port")
                 ):
                     raise ValueError(f"{key} must be positive")
 
@@ -79,8 +86,17 @@ class Config:
                 elif key.endswith("_every"):
                     if num_value > 100:
                         raise ValueError(f"{key} cannot exceed 100")
-
-                if key.endswith("_every"):
+                elif key.endswith("_port"):
+                    if num_value > 65535:
+                        raise ValueError(f"{key} cannot exceed 65535")
+                elif key.endswith("_workers"):
+                    if num_value > 16:
+                        raise ValueError(f"{key} cannot exceed 16")
+                elif key.endswith("_seconds"):
+                    if num_value > 3600:
+                        raise ValueError(f"{key} cannot exceed 3600 seconds")
+
+                if key.endswith(("_every", "_port", "_workers")):
                     value = int(num_value)
                 else:
                     value = num_value
@@ -93,7 +109,15 @@ class Config:
                     raise
                 raise ValueError(f"Invalid value for {key}: {value}")
 
-        self.db.set_config(key, value)
+        # Paths are stored absolute: the engine doesn't run in the user's cwd
+        elif isinstance(default_value, str):
+            value = str(value)
+            if value.lower() in ("", "off", "none"):
+                value = ""
+            else:
+                value = str(Path(value).expanduser().resolve())
+
+        self.db.set_config(key, value, record_event=True)
 
     def get_all(self) -> Dict[str, Any]:
         """Get all config values (merged with defaults)."""
@@ -149,3 +173,20 @@ class Config:
     @property
     def break_overtime_contributes(self) -> bool:
         return bool(self.get("break_overtime_contributes"))
+
+    @property
+    def api_port(self) -> int:
+        return int(self.get("api_port"))
+
+    @property
+    def metrics_textfile(self) -> Optional[Path]:
+        value = self.get("metrics_textfile")
+        return Path(value) if value else None
+
+    @property
+    def hook_workers(self) -> int:
+        return int(self.get("hook_workers"))
+
+    @property
+    def hook_timeout_seconds(self) -> float:
+        return float(self.get("hook_timeout_seconds"))
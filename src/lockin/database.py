@@ -1,39 +1,534 @@
 """Database layer for Lockin - SQLite persistence."""
 
+import functools
 import json
+import random
+import re
 import sqlite3
+import threading
 import time
+from collections import defaultdict
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .clock import Clock, SystemClock
+
+
+# Bumped whenever _migrate() gains a step for existing databases
+SCHEMA_VERSION = 4
+
+# How long a connection waits on a locked database before SQLITE_BUSY, and
+# how often writes are then retried (with jittered exponential backoff from
+# RETRY_BASE_DELAY). The CLI can afford to wait; the engine passes much
+# smaller values so contention never stalls its timer.
+DEFAULT_BUSY_TIMEOUT = 5.0
+DEFAULT_MAX_RETRIES = 2
+RETRY_BASE_DELAY = 0.001
+
+# Rows fetched per round trip by Database.iter_sessions()
+DEFAULT_BATCH_SIZE = 1000
+
+# Shared queries and reducers. These are module-level so the Rich-free status
+# line (see status.py) can reuse them without constructing a Database, which
+# would run schema initialisation on every poll.
+
+TODAYS_STATS_SQL = """
+    SELECT
+        session_type,
+        state,
+        SUM(actual_duration_minutes) as total_minutes,
+        COUNT(*) as count
+    FROM sessions
+    WHERE start_time >= ?
+    GROUP BY session_type, state
+"""
+
+STREAK_END_TIMES_SQL = """
+    SELECT end_time
+    FROM sessions
+    WHERE session_type = 'work'
+      AND state = 'completed'
+      AND start_time >= ?
+    ORDER BY end_time ASC
+"""
+
+
+# Engine state fields, stored as typed columns of the single engine_state
+# row. Every write bumps its version, so clients can tell whether anything
+# changed without reading (or parsing) the state itself.
+ENGINE_STATE_FIELDS = (
+    "session_state",
+    "session_type",
+    "start_time",
+    "planned_end_time",
+    "planned_duration_minutes",
+    "decision_window_start",
+    "last_notification",
+    "tags",  # The running session's tags, comma-separated
+)
+
+ENGINE_STATE_SQL = f"""
+    SELECT version, {", ".join(ENGINE_STATE_FIELDS)}
+    FROM engine_state
+    WHERE id = 1
+"""
+
+
+def engine_state_from_row(row) -> Optional[Dict[str, Any]]:
+    """Turn (version, *ENGINE_STATE_FIELDS) into a state dict, None if empty."""
+    if row is None or row[1] is None:
+        return None
+    return dict(zip(ENGINE_STATE_FIELDS, row[1:]))
+
+
+# Writes Database.write_batch() can group into one transaction
+BATCH_WRITES = (
+    "log_session",
+    "update_engine_state",
+    "mark_commands_processed",
+    "log_event",
+    "prune_events",
+)
+
+EVENT_RETENTION_DAYS = 30  # The engine prunes older events at midnight
+
+# Change feed event types (the events table; see `lockin watch`)
+EVENT_TYPES = (
+    "session_started",
+    "decision_window",
+    "bonus_started",
+    "break_switched",
+    "session_logged",  # data: the session row (state completed/abandoned/...)
+    "session_discarded",  # Ended too short to log
+    "session_deleted",
+    "session_tagged",
+    "config_changed",
+)
+
+
+# Local calendar keys computed inside SQLite. The 'localtime' modifier goes
+# through the C library's localtime(), exactly like datetime.fromtimestamp(),
+# so buckets match Python's across DST changes. 'weekday 0' moves forward to
+# Sunday (or stays on it), and '-6 days' lands on that week's Monday.
+LOCAL_DAY_SQL = "date(start_time, 'unixepoch', 'localtime')"
+LOCAL_WEEK_SQL = "date(start_time, 'unixepoch', 'localtime', 'weekday 0', '-6 days')"
+# The same keys for tag_days, which is already bucketed by local day
+TAG_DAY_SQL = "day"
+TAG_WEEK_SQL = "date(day, 'weekday 0', '-6 days')"
+
+# Tag names: lowercase letters, digits and _.-/ (so no commas or spaces)
+TAG_PATTERN = re.compile(r"[a-z0-9][a-z0-9_./-]{0,39}")
+
+
+def normalize_tags(tags: Iterable[str]) -> List[str]:
+    """Lowercase, split on commas and dedupe tags; ValueError if one is invalid."""
+    if isinstance(tags, str):
+        raise ValueError("Tags must be a list of strings, not a string")
+    names: List[str] = []
+    for value in tags:
+        if not isinstance(value, str):
+            raise ValueError(f"Invalid tag {value!r}: tags must be strings")
+        for name in value.split(","):
+            name = name.strip().lower()
+            if not name:
+                continue
+            if not TAG_PATTERN.fullmatch(name):
+                raise ValueError(
+                    f"Invalid tag {name!r}: use up to 40 letters, digits and _.-/"
+                )
+            if name not in names:
+                names.append(name)
+    return names
+
+
+# Columns of the sessions table, in table order
+SESSION_COLUMNS = (
+    "id",
+    "session_type",
+    "state",
+    "start_time",
+    "end_time",
+    "planned_duration_minutes",
+    "actual_duration_minutes",
+    "overtime_minutes",
+    "created_at",
+)
+
+
+class SessionRecord:
+    """One sessions row, stored in slots rather than a per-row dict.
+
+    Reads like the dicts the session queries used to return
+    (``record["state"]``, ``.get()``, ``.keys()``, ``dict(record)``) and also
+    as attributes (``record.state``). When a query selected only some
+    columns, the others are absent rather than None.
+    """
+
+    __slots__ = SESSION_COLUMNS + ("_columns",)
+
+    def __init__(self, columns: tuple, values):
+        self._columns = columns
+        for column, value in zip(columns, values):
+            setattr(self, column, value)
+
+    def __getitem__(self, column: str) -> Any:
+        if column not in self._columns:
+            raise KeyError(column)
+        return getattr(self, column)
+
+    def __contains__(self, column: object) -> bool:
+        return column in self._columns
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (SessionRecord, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{c}={getattr(self, c)!r}" for c in self._columns)
+        return f"SessionRecord({fields})"
+
+    def keys(self) -> tuple:
+        return self._columns
+
+    def values(self) -> List[Any]:
+        return [getattr(self, column) for column in self._columns]
+
+    def items(self) -> List[tuple]:
+        return [(column, getattr(self, column)) for column in self._columns]
+
+    def get(self, column: str, default: Any = None) -> Any:
+        if column not in self._columns:
+            return default
+        return getattr(self, column)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {column: getattr(self, column) for column in self._columns}
+
+
+def session_columns(columns: Optional[tuple] = None) -> tuple:
+    """Validate a column selection (None means all) for the session queries.
+
+    Column names are interpolated into SQL, so anything outside the table's
+    columns is rejected here.
+    """
+    if columns is None:
+        return SESSION_COLUMNS
+    columns = tuple(columns)
+    unknown = [c for c in columns if c not in SESSION_COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Unknown session columns: {', '.join(unknown) or '(none)'}")
+    return columns
+
+
+def today_start_timestamp(now: Optional[float] = None) -> float:
+    """Unix timestamp of local midnight today (or of the day containing now)."""
+    current = datetime.now() if now is None else datetime.fromtimestamp(now)
+    today_start = current.replace(hour=0, minute=0, second=0, microsecond=0)
+    return today_start.timestamp()
+
+
+def summarize_todays_stats(rows) -> Dict[str, Any]:
+    """Fold (session_type, state, total_minutes, count) rows into today's stats."""
+    stats = {
+        "work_completed": 0,
+        "work_abandoned": 0,
+        "break_completed": 0,
+        "total_work_minutes": 0,
+        "total_break_minutes": 0,
+        "session_count": 0,
+    }
+
+    for session_type, state, minutes, count in rows:
+        minutes = minutes or 0
+
+        if session_type == "work":
+            stats["total_work_minutes"] += minutes
+            if state == "completed":
+                stats["work_completed"] += count
+                stats["session_count"] += count
+            elif state == "abandoned":
+                stats["work_abandoned"] += count
+        elif session_type == "break":
+            stats["total_break_minutes"] += minutes
+            if state == "completed":
+                stats["break_completed"] += count
+
+    return stats
+
+
+def streak_from_end_times(end_times: List[float], now: float) -> int:
+    """Count the current streak from ascending end times of completed work.
+
+    Consecutive sessions belong to the same streak while they end less than
+    60 minutes apart, and the streak expires 60 minutes after the last one.
+    """
+    if not end_times:
+        return 0
+
+    # Check if most recent session was more than 60 minutes ago
+    # If so, the streak has expired
+    minutes_since_last = (now - end_times[-1]) / 60
+    if minutes_since_last >= 60:
+        return 0
+
+    streak = 1
+    for i in range(1, len(end_times)):
+        gap_minutes = (end_times[i] - end_times[i - 1]) / 60
+
+        # Streak continues if gap < 60 minutes
+        if gap_minutes < 60:
+            streak += 1
+        else:
+            # Reset streak, start counting from this session
+            streak = 1
+
+    return streak
+
+
+def split_by_local_hour(
+    start_time: float, end_time: Optional[float], minutes: float
+) -> List[tuple]:
+    """Apportion a session's minutes across the local clock hours it spans.
+
+    Returns (hour_start, weekday, hour, minutes) tuples where hour_start is
+    the epoch of the local hour's start and weekday is 0 for Monday. Minutes
+    are spread in proportion to wall time, so the pieces always sum to the
+    logged duration (e.g. capped breaks or an end_time-less row).
+    """
+    if not minutes:
+        return []
+    if end_time is None or end_time <= start_time:
+        end_time = start_time + minutes * 60
+
+    scale = minutes / (end_time - start_time)
+    pieces = []
+    current = start_time
+    while current < end_time:
+        local = datetime.fromtimestamp(current)
+        into_hour = local.minute * 60 + local.second + local.microsecond / 1e6
+        hour_start = round(current - into_hour)
+        piece_end = min(hour_start + 3600, end_time)
+        pieces.append(
+            (hour_start, local.weekday(), local.hour, (piece_end - current) * scale)
+        )
+        current = piece_end
+    return pieces
+
+
+def is_busy_error(error: Exception) -> bool:
+    """Whether an exception is SQLite reporting a locked/busy database."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+def retry_on_busy(method):
+    """Retry a write method whose transaction hit SQLITE_BUSY.
+
+    The whole method is re-run, so each attempt is a fresh transaction
+    (connection() rolls back the failed one). Retries, time spent waiting
+    and give-ups are counted per method in Database.contention; calls and
+    total time (retries included) in Database.timings. Both are updated
+    under Database.stats_lock, since the engine, its writer thread and API
+    scrapes share them.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    result = method(self, *args, **kwargs)
+                except sqlite3.OperationalError as e:
+                    if not is_busy_error(e):
+                        raise
+                    if attempt >= self.max_retries:
+                        with self.stats_lock:
+                            stats = self.contention[method.__name__]
+                            stats["failures"] += 1
+                            stats["wait_seconds"] += time.perf_counter() - started
+                        raise
+                    attempt += 1
+                    with self.stats_lock:
+                        self.contention[method.__name__]["retries"] += 1
+                    # Real sleep even on a simulated clock: the lock is real
+                    delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+                    time.sleep(delay * random.uniform(0.5, 1.5))
+                    continue
+                if attempt:
+                    with self.stats_lock:
+                        self.contention[method.__name__]["wait_seconds"] += (
+                            time.perf_counter() - started
+                        )
+                return result
+        finally:
+            with self.stats_lock:
+                timing = self.timings[method.__name__]
+                timing["calls"] += 1
+                timing["seconds"] += time.perf_counter() - started
+
+    return wrapper
+
+
+class UnitOfWork:
+    """Writes collected for one atomic commit (see Database.unit_of_work).
+
+    Has the same write methods as Database, so code that writes through
+    either doesn't need to know which it has. Arguments are copied when
+    the write is made, not when it is committed.
+    """
+
+    def __init__(self):
+        self.writes: List[tuple] = []
+
+    def log_session(
+        self,
+        session_type: str,
+        state: str,
+        start_time: float,
+        end_time: float,
+        planned_duration_minutes: int,
+        actual_duration_minutes: float,
+        bonus_minutes: float = 0,
+        tags: Sequence[str] = (),
+    ):
+        self.writes.append(
+            (
+                "log_session",
+                (
+                    session_type,
+                    state,
+                    start_time,
+                    end_time,
+                    planned_duration_minutes,
+                    actual_duration_minutes,
+                    bonus_minutes,
+                    tuple(tags),
+                ),
+            )
+        )
+
+    def set_engine_state(self, state: Dict[str, Any]):
+        fields = {field: state.get(field) for field in ENGINE_STATE_FIELDS}
+        self.writes.append(("update_engine_state", (fields,)))
+
+    def update_engine_state(self, fields: Dict[str, Any]):
+        self.writes.append(("update_engine_state", (dict(fields),)))
+
+    def mark_command_processed(self, command_id: int):
+        self.mark_commands_processed([command_id])
+
+    def mark_commands_processed(
+        self,
+        command_ids: List[int],
+        results: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ):
+        self.writes.append(
+            (
+                "mark_commands_processed",
+                (list(command_ids), list(results) if results else None),
+            )
+        )
+
+    def log_event(self, event_type: str, data: Optional[Dict[str, Any]] = None):
+        self.writes.append(("log_event", (event_type, dict(data or {}))))
+
+    def prune_events(self, before: float):
+        self.writes.append(("prune_events", (before,)))
 
 
 class Database:
     """SQLite database manager for Lockin."""
 
-    def __init__(self, db_path: Path):
+    def __init__(
+        self,
+        db_path: Path,
+        clock: Optional[Clock] = None,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        keep_open: bool = False,
+    ):
         self.db_path = db_path
+        self.clock = clock or SystemClock()
+        self.busy_timeout = busy_timeout
+        self.max_retries = max_retries
+        # Per write method: retries, seconds lost to contention, give-ups
+        self.contention: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"retries": 0, "wait_seconds": 0.0, "failures": 0}
+        )
+        # Per write method: calls and seconds spent in them
+        self.timings: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"calls": 0, "seconds": 0.0}
+        )
+        # Guards contention and timings; read them through the getters
+        self.stats_lock = threading.Lock()
+        # Transactions committed with writes in them (each one a WAL append,
+        # and an fsync once synchronous=NORMAL checkpoints)
+        self.commits = 0
+        # One connection reused by every call (until close()), for
+        # long-lived callers making many small queries; it belongs to the
+        # thread that first uses it
+        self.keep_open = keep_open
+        self._conn: Optional[sqlite3.Connection] = None
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._init_db()
 
     @contextmanager
     def connection(self):
         """Context manager for database connections."""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
+        if self.keep_open:
+            if self._conn is None:
+                self._conn = self._connect()
+            conn = self._conn
+        else:
+            conn = self._connect()
         try:
             yield conn
-            conn.commit()
+            if conn.in_transaction:
+                conn.commit()
+                self.commits += 1
         except Exception:
             conn.rollback()
             raise
         finally:
-            conn.close()
+            if not self.keep_open:
+                conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=self.busy_timeout)
+        conn.row_factory = sqlite3.Row
+        # Safe with WAL (a crash can only lose the latest commits, never
+        # corrupt), and commits skip an fsync, so write locks are brief
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def close(self):
+        """Close the kept-open connection, if any (keep_open)."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
     def _init_db(self):
         """Initialize database schema."""
         with self.connection() as conn:
+            # Write-ahead logging lets readers (stats, status bars, attached
+            # terminals) run alongside the engine's writes instead of
+            # blocking them. The mode is stored in the database file.
+            conn.execute("PRAGMA journal_mode = WAL")
             conn.executescript("""
                 CREATE TABLE IF NOT EXISTS sessions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -53,9 +548,18 @@ class Database:
                     updated_at REAL
                 );
 
+                -- Single row; session_state is NULL when no state is saved
                 CREATE TABLE IF NOT EXISTS engine_state (
                     id INTEGER PRIMARY KEY CHECK (id = 1),
-                    current_state TEXT,  -- JSON serialized state
+                    session_state TEXT,
+                    session_type TEXT,
+                    start_time REAL,
+                    planned_end_time REAL,
+                    planned_duration_minutes INTEGER,
+                    decision_window_start REAL,
+                    last_notification REAL,
+                    tags TEXT,
+                    version INTEGER NOT NULL DEFAULT 0,  -- bumped by every write
                     updated_at REAL
                 );
 
@@ -64,19 +568,162 @@ class Database:
                     command TEXT NOT NULL,
                     args TEXT,  -- JSON
                     created_at REAL,
-                    processed INTEGER DEFAULT 0
+                    processed INTEGER DEFAULT 0,  -- 0 pending, 2 claimed, 1 done
+                    result TEXT  -- JSON {"ok", "message"}, once done
+                );
+
+                -- Change feed, appended in the same transaction as each
+                -- change. AUTOINCREMENT: IDs only grow, even after pruning,
+                -- so a consumer's last ID is a cursor it can resume from.
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    type TEXT NOT NULL,
+                    data TEXT NOT NULL,  -- JSON
+                    created_at REAL NOT NULL
                 );
                 
                 CREATE INDEX IF NOT EXISTS idx_sessions_start_time 
                     ON sessions(start_time);
-                CREATE INDEX IF NOT EXISTS idx_sessions_type_state 
-                    ON sessions(session_type, state);
+                -- Covering index for per-(type, state) range aggregates;
+                -- supersedes the old (session_type, state) index.
+                DROP INDEX IF EXISTS idx_sessions_type_state;
+                CREATE INDEX IF NOT EXISTS idx_sessions_type_state_start
+                    ON sessions(session_type, state, start_time,
+                                actual_duration_minutes);
+                -- Newest-first log pages filtered by type
+                CREATE INDEX IF NOT EXISTS idx_sessions_type_start
+                    ON sessions(session_type, start_time);
                 CREATE INDEX IF NOT EXISTS idx_commands_processed 
                     ON commands(processed, created_at);
+
+                -- Rollup of focused (work) minutes per local clock hour,
+                -- maintained by log_session/delete_session
+                CREATE TABLE IF NOT EXISTS focus_hours (
+                    hour_start INTEGER PRIMARY KEY,  -- epoch of local hour start
+                    weekday INTEGER NOT NULL,  -- 0 = Monday
+                    hour INTEGER NOT NULL,  -- 0-23, local
+                    work_minutes REAL NOT NULL DEFAULT 0
+                );
+
+                -- Tags (projects) and the sessions they're on. No foreign
+                -- keys: delete_session removes a session's links itself.
+                CREATE TABLE IF NOT EXISTS tags (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE  -- normalize_tags() form
+                );
+                CREATE TABLE IF NOT EXISTS session_tags (
+                    session_id INTEGER NOT NULL,
+                    tag_id INTEGER NOT NULL,
+                    PRIMARY KEY (session_id, tag_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_session_tags_tag
+                    ON session_tags(tag_id, session_id);
+
+                -- Rollup of tagged sessions per tag and local day (of
+                -- start_time), maintained by log_session/delete_session:
+                -- per-tag stats read days, not sessions
+                CREATE TABLE IF NOT EXISTS tag_days (
+                    tag_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,  -- YYYY-MM-DD
+                    session_type TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    minutes REAL NOT NULL DEFAULT 0,
+                    sessions INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (tag_id, day, session_type, state)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_tag_days_day ON tag_days(day);
+
+                -- Finished stats for closed periods, dropped by
+                -- log_session/delete_session when a session lands in range
+                CREATE TABLE IF NOT EXISTS stats_cache (
+                    period TEXT NOT NULL,  -- 'week', 'month' or 'year'; 'week:<tag>' for one tag
+                    range_start REAL NOT NULL,
+                    range_end REAL NOT NULL,
+                    payload TEXT NOT NULL,  -- JSON
+                    created_at REAL,
+                    PRIMARY KEY (period, range_start, range_end)
+                );
             """)
+            self._migrate(conn)
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Bring derived data up to SCHEMA_VERSION (tracked in user_version)."""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+        if version < 1:
+            # focus_hours is new: backfill it from existing history
+            self._rebuild_focus_hours(conn)
+
+        if version < 2:
+            self._migrate_engine_state(conn)
+
+        if version < 3:
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(commands)")}
+            if "result" not in existing:
+                conn.execute("ALTER TABLE commands ADD COLUMN result TEXT")
+
+        if version < 4:
+            existing = {
+                row[1] for row in conn.execute("PRAGMA table_info(engine_state)")
+            }
+            if "tags" not in existing:
+                conn.execute("ALTER TABLE engine_state ADD COLUMN tags TEXT")
+
+        if version < SCHEMA_VERSION:
+            # Only when creating or upgrading: on an up-to-date file, opening
+            # a Database stays read-only and never waits on the write lock
+            conn.execute("INSERT OR IGNORE INTO engine_state (id) VALUES (1)")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _migrate_engine_state(self, conn: sqlite3.Connection):
+        """Move engine_state from its JSON blob to typed columns.
+
+        The old current_state column is kept (SQLite before 3.35 can't drop
+        columns) but emptied, so nothing reads a stale copy.
+        """
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(engine_state)")}
+        if "current_state" not in existing:
+            return
+
+        types = {
+            "session_state": "TEXT",
+            "session_type": "TEXT",
+            "start_time": "REAL",
+            "planned_end_time": "REAL",
+            "planned_duration_minutes": "INTEGER",
+            "decision_window_start": "REAL",
+            "last_notification": "REAL",
+            "tags": "TEXT",
+        }
+        for field in ENGINE_STATE_FIELDS:
+            if field not in existing:
+                conn.execute(
+                    f"ALTER TABLE engine_state ADD COLUMN {field} {types[field]}"
+                )
+        if "version" not in existing:
+            conn.execute(
+                "ALTER TABLE engine_state ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+            )
+
+        row = conn.execute(
+            "SELECT current_state FROM engine_state WHERE id = 1"
+        ).fetchone()
+        if row and row["current_state"]:
+            state = json.loads(row["current_state"])
+            conn.execute(
+                f"""
+                UPDATE engine_state SET
+                    {", ".join(f"{field} = ?" for field in ENGINE_STATE_FIELDS)},
+                    current_state = NULL,
+                    version = version + 1
+                WHERE id = 1
+            """,
+                [state.get(field) for field in ENGINE_STATE_FIELDS],
+            )
 
     # Session methods
 
+    @retry_on_busy
     def log_session(
         self,
         session_type: str,
@@ -86,180 +733,870 @@ class Database:
         planned_duration_minutes: int,
         actual_duration_minutes: float,
         bonus_minutes: float = 0,
+        tags: Sequence[str] = (),
     ):
-        """Log a completed/abandoned session."""
+        """Log a completed/abandoned session (with its tags, if any)."""
         with self.connection() as conn:
-            conn.execute(
-                """
-                INSERT INTO sessions (
-                    session_type, state, start_time, end_time,
-                    planned_duration_minutes, actual_duration_minutes,
-                    overtime_minutes, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-                (
-                    session_type,
-                    state,
-                    start_time,
-                    end_time,
-                    planned_duration_minutes,
-                    actual_duration_minutes,
-                    bonus_minutes,
-                    time.time(),
-                ),
-            )  # Pass bonus_minutes to overtime_minutes field for DB compatibility
+            self._log_session(
+                conn,
+                session_type,
+                state,
+                start_time,
+                end_time,
+                planned_duration_minutes,
+                actual_duration_minutes,
+                bonus_minutes,
+                tags,
+            )
+
+    def _log_session(
+        self,
+        conn: sqlite3.Connection,
+        session_type: str,
+        state: str,
+        start_time: float,
+        end_time: float,
+        planned_duration_minutes: int,
+        actual_duration_minutes: float,
+        bonus_minutes: float = 0,
+        tags: Sequence[str] = (),
+    ):
+        """Insert a session and update its rollups on an open connection."""
+        if session_type == "work":
+            self._add_focus_hours(conn, start_time, end_time, actual_duration_minutes)
+        self._invalidate_stats_cache(conn, start_time)
+        cursor = conn.execute(
+            """
+            INSERT INTO sessions (
+                session_type, state, start_time, end_time,
+                planned_duration_minutes, actual_duration_minutes,
+                overtime_minutes, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+            (
+                session_type,
+                state,
+                start_time,
+                end_time,
+                planned_duration_minutes,
+                actual_duration_minutes,
+                bonus_minutes,
+                self.clock.time(),
+            ),
+        )  # Pass bonus_minutes to overtime_minutes field for DB compatibility
+        if tags:
+            tag_ids = self._tag_ids(conn, tags)
+            conn.executemany(
+                "INSERT INTO session_tags (session_id, tag_id) VALUES (?, ?)",
+                [(cursor.lastrowid, tag_id) for tag_id in tag_ids],
+            )
+            self._add_tag_days(
+                conn, tag_ids, session_type, state, start_time, actual_duration_minutes
+            )
+        self._log_event(
+            conn,
+            "session_logged",
+            {
+                "id": cursor.lastrowid,
+                "session_type": session_type,
+                "state": state,
+                "start_time": start_time,
+                "end_time": end_time,
+                "planned_duration_minutes": planned_duration_minutes,
+                "actual_duration_minutes": actual_duration_minutes,
+                "overtime_minutes": bonus_minutes,
+                "tags": list(tags),
+            },
+        )
+
+    def _select_sessions(
+        self, columns: Optional[tuple], query: str, params: tuple = ()
+    ) -> List[SessionRecord]:
+        """Run a sessions query, building a SessionRecord per row.
+
+        `query` is the SQL after the column list (``FROM sessions ...``).
+        Rows come back as plain tuples (no sqlite3.Row in between) and only
+        the selected columns are read.
+        """
+        columns = session_columns(columns)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(f"SELECT {', '.join(columns)} {query}", params)
+            return [SessionRecord(columns, row) for row in cursor]
 
     def get_sessions_by_date_range(
-        self, start_date: datetime, end_date: datetime
-    ) -> List[Dict[str, Any]]:
-        """Get all sessions within a date range."""
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        columns: Optional[tuple] = None,
+    ) -> List[SessionRecord]:
+        """Get all sessions within a date range (optionally only some columns)."""
+        return list(self.iter_sessions(start_date, end_date, columns))
+
+    def iter_sessions(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        columns: Optional[tuple] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        session_type: Optional[str] = None,
+    ) -> Iterator[SessionRecord]:
+        """Yield sessions in a date range (default: all history), oldest first.
+
+        The cursor stays open while the caller iterates and rows are fetched
+        `batch_size` at a time, so memory stays flat however long the range
+        is. The connection is held until the generator is exhausted or
+        closed; with WAL this never blocks the engine's writes.
+        """
+        columns = session_columns(columns)
+        conditions = ["start_time >= ?", "start_time < ?"]
+        params: List[Any] = [
+            start_date.timestamp() if start_date else float("-inf"),
+            end_date.timestamp() if end_date else float("inf"),
+        ]
+        if session_type:
+            conditions.append("session_type = ?")
+            params.append(session_type)
+
         with self.connection() as conn:
-            cursor = conn.execute(
-                """
-                SELECT * FROM sessions
-                WHERE start_time >= ? AND start_time < ?
-                ORDER BY start_time ASC
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(
+                f"""
+                SELECT {", ".join(columns)} FROM sessions
+                WHERE {" AND ".join(conditions)}
+                ORDER BY start_time ASC, id ASC
             """,
-                (start_date.timestamp(), end_date.timestamp()),
+                params,
             )
-            return [dict(row) for row in cursor.fetchall()]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield SessionRecord(columns, row)
 
-    def get_last_session(self) -> Optional[Dict[str, Any]]:
+    def get_last_session(
+        self, columns: Optional[tuple] = None
+    ) -> Optional[SessionRecord]:
         """Get the most recent session."""
-        with self.connection() as conn:
-            cursor = conn.execute("""
-                SELECT * FROM sessions
-                ORDER BY start_time DESC
-                LIMIT 1
-            """)
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        sessions = self._select_sessions(
+            columns,
+            """
+            FROM sessions
+            ORDER BY start_time DESC, id DESC
+            LIMIT 1
+        """,
+        )
+        return sessions[0] if sessions else None
 
     def get_recent_sessions(
-        self, limit: int = 10, session_type: Optional[str] = None
-    ) -> List[Dict[str, Any]]:
+        self,
+        limit: int = 10,
+        session_type: Optional[str] = None,
+        columns: Optional[tuple] = None,
+    ) -> List[SessionRecord]:
         """Get the N most recent sessions, optionally filtered by type."""
+        return self.get_sessions_page(limit, session_type, columns=columns)
+
+    def get_sessions_page(
+        self,
+        limit: int = 10,
+        session_type: Optional[str] = None,
+        before: Optional[tuple] = None,
+        columns: Optional[tuple] = None,
+    ) -> List[SessionRecord]:
+        """Get one page of sessions, newest first.
+
+        Pages are keyed on (start_time, id) rather than OFFSET: pass the
+        (start_time, id) of the last session of the previous page as
+        ``before`` to continue, and each page costs one index seek no matter
+        how deep into history it is.
+        """
+        conditions = []
+        params: List[Any] = []
+        if session_type:
+            conditions.append("session_type = ?")
+            params.append(session_type)
+        if before:
+            conditions.append("(start_time, id) < (?, ?)")
+            params.extend(before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        return self._select_sessions(
+            columns,
+            f"""
+            FROM sessions
+            {where}
+            ORDER BY start_time DESC, id DESC
+            LIMIT ?
+        """,
+            (*params, limit),
+        )
+
+    def get_session_at_position(
+        self, position: int, columns: Optional[tuple] = None
+    ) -> Optional[SessionRecord]:
+        """Get the session at a 1-based position in the unfiltered log.
+
+        The position is resolved inside SQLite by walking the start_time
+        index, so only the one matching row is ever materialised.
+        """
+        if position < 1:
+            return None
+        sessions = self._select_sessions(
+            columns,
+            """
+            FROM sessions
+            ORDER BY start_time DESC, id DESC
+            LIMIT 1 OFFSET ?
+        """,
+            (position - 1,),
+        )
+        return sessions[0] if sessions else None
+
+    def get_session(
+        self, session_id: int, columns: Optional[tuple] = None
+    ) -> Optional[SessionRecord]:
+        """Get a session by its database ID."""
+        sessions = self._select_sessions(
+            columns, "FROM sessions WHERE id = ?", (session_id,)
+        )
+        return sessions[0] if sessions else None
+
+    def count_sessions(self) -> int:
+        """Count all logged sessions."""
         with self.connection() as conn:
-            if session_type:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM sessions
-                    WHERE session_type = ?
-                    ORDER BY start_time DESC
-                    LIMIT ?
-                """,
-                    (session_type, limit),
-                )
-            else:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM sessions
-                    ORDER BY start_time DESC
-                    LIMIT ?
-                """,
-                    (limit,),
-                )
-            return [dict(row) for row in cursor.fetchall()]
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
 
+    @retry_on_busy
     def delete_session(self, session_id: int) -> bool:
         """Delete a session by its database ID. Returns True if deleted."""
         with self.connection() as conn:
+            row = conn.execute(
+                """
+                SELECT session_type, state, start_time, end_time,
+                       actual_duration_minutes
+                FROM sessions WHERE id = ?
+            """,
+                (session_id,),
+            ).fetchone()
+            if row and row["session_type"] == "work":
+                self._add_focus_hours(
+                    conn,
+                    row["start_time"],
+                    row["end_time"],
+                    -(row["actual_duration_minutes"] or 0),
+                )
+
+            if row:
+                self._invalidate_stats_cache(conn, row["start_time"])
+                tags = self._session_tags(conn, [session_id]).get(session_id, [])
+                if tags:
+                    self._add_tag_days(
+                        conn,
+                        [tag_id for tag_id, _ in tags],
+                        row["session_type"],
+                        row["state"],
+                        row["start_time"],
+                        -(row["actual_duration_minutes"] or 0),
+                        sessions=-1,
+                    )
+                    conn.execute(
+                        "DELETE FROM session_tags WHERE session_id = ?", (session_id,)
+                    )
+                self._log_event(
+                    conn,
+                    "session_deleted",
+                    {"id": session_id, **row, "tags": [name for _, name in tags]},
+                )
+
             cursor = conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
             return cursor.rowcount > 0
 
     def get_todays_stats(self) -> Dict[str, Any]:
         """Get today's session statistics."""
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-
         with self.connection() as conn:
             cursor = conn.execute(
+                TODAYS_STATS_SQL, (today_start_timestamp(self.clock.time()),)
+            )
+            return summarize_todays_stats(cursor.fetchall())
+
+    def calculate_current_streak(self) -> int:
+        """Calculate current streak of completed work sessions."""
+        with self.connection() as conn:
+            now = self.clock.time()
+            cursor = conn.execute(STREAK_END_TIMES_SQL, (today_start_timestamp(now),))
+            end_times = [row["end_time"] for row in cursor.fetchall()]
+            return streak_from_end_times(end_times, now)
+
+    # Tags
+
+    def _tag_ids(self, conn: sqlite3.Connection, names: Sequence[str]) -> List[int]:
+        """IDs of tags by name (normalize_tags() form), creating missing ones."""
+        conn.executemany(
+            "INSERT OR IGNORE INTO tags (name) VALUES (?)", [(n,) for n in names]
+        )
+        placeholders = ", ".join("?" * len(names))
+        return [
+            row[0]
+            for row in conn.execute(
+                f"SELECT id FROM tags WHERE name IN ({placeholders})", list(names)
+            )
+        ]
+
+    def _add_tag_days(
+        self,
+        conn: sqlite3.Connection,
+        tag_ids: Sequence[int],
+        session_type: str,
+        state: str,
+        start_time: float,
+        minutes: float,
+        sessions: int = 1,
+    ):
+        """Add a session (or with negative values, remove it) to tag_days."""
+        day = datetime.fromtimestamp(start_time).strftime("%Y-%m-%d")
+        rows = [(tag_id, day, session_type, state) for tag_id in tag_ids]
+        conn.executemany(
+            """
+            INSERT INTO tag_days (tag_id, day, session_type, state, minutes, sessions)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (tag_id, day, session_type, state) DO UPDATE SET
+                minutes = minutes + excluded.minutes,
+                sessions = sessions + excluded.sessions
+        """,
+            [(*key, minutes or 0, sessions) for key in rows],
+        )
+        if sessions < 0:
+            conn.executemany(
                 """
-                SELECT 
-                    session_type,
-                    state,
-                    SUM(actual_duration_minutes) as total_minutes,
-                    COUNT(*) as count
-                FROM sessions
-                WHERE start_time >= ?
-                GROUP BY session_type, state
+                DELETE FROM tag_days
+                WHERE tag_id = ? AND day = ? AND session_type = ? AND state = ?
+                  AND sessions <= 0
             """,
-                (today_start.timestamp(),),
+                rows,
             )
 
-            results = cursor.fetchall()
+    def _session_tags(
+        self, conn: sqlite3.Connection, session_ids: Sequence[int]
+    ) -> Dict[int, List[tuple]]:
+        """(tag ID, name) pairs of each session that has tags, by session ID."""
+        placeholders = ", ".join("?" * len(session_ids))
+        tags: Dict[int, List[tuple]] = {}
+        for row in conn.execute(
+            f"""
+            SELECT st.session_id, t.id, t.name
+            FROM session_tags st JOIN tags t ON t.id = st.tag_id
+            WHERE st.session_id IN ({placeholders})
+            ORDER BY t.name
+        """,
+            list(session_ids),
+        ):
+            tags.setdefault(row[0], []).append((row[1], row[2]))
+        return tags
+
+    def get_session_tags(self, session_ids: Sequence[int]) -> Dict[int, List[str]]:
+        """Tag names of each session that has tags, by session ID."""
+        if not session_ids:
+            return {}
+        with self.connection() as conn:
+            tags = self._session_tags(conn, session_ids)
+        return {sid: [name for _, name in pairs] for sid, pairs in tags.items()}
+
+    def get_tag_totals(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """Per-tag totals for a date range (default: all time), most focus first.
 
-            stats = {
-                "work_completed": 0,
-                "work_abandoned": 0,
-                "break_completed": 0,
-                "total_work_minutes": 0,
-                "total_break_minutes": 0,
-                "session_count": 0,
+        Read from the tag_days rollup, so the cost depends on the number of
+        tagged days in range, not sessions. A session with several tags
+        counts toward each of them.
+        """
+        start_day = start_date.strftime("%Y-%m-%d") if start_date else ""
+        end_day = end_date.strftime("%Y-%m-%d") if end_date else "9999"
+        with self.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT
+                    t.name AS tag,
+                    SUM(CASE WHEN d.session_type = 'work'
+                        THEN d.minutes ELSE 0 END) AS work_minutes,
+                    SUM(CASE WHEN d.session_type = 'work' AND d.state = 'completed'
+                        THEN d.sessions ELSE 0 END) AS completed_sessions,
+                    SUM(CASE WHEN d.session_type = 'work' AND d.state = 'abandoned'
+                        THEN d.sessions ELSE 0 END) AS abandoned_sessions,
+                    SUM(CASE WHEN d.session_type = 'break'
+                        THEN d.minutes ELSE 0 END) AS break_minutes
+                FROM tag_days d JOIN tags t ON t.id = d.tag_id
+                WHERE d.day >= ? AND d.day < ?
+                GROUP BY d.tag_id
+                ORDER BY work_minutes DESC, tag
+            """,
+                (start_day, end_day),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    # Aggregate stats methods
+
+    def get_period_summary(
+        self, start_date: datetime, end_date: datetime
+    ) -> Dict[str, Any]:
+        """Get summed durations and counts for sessions in a date range."""
+        with self.connection() as conn:
+            return self._period_summary(conn, start_date, end_date)
+
+    def _period_summary(
+        self, conn: sqlite3.Connection, start_date: datetime, end_date: datetime
+    ) -> Dict[str, Any]:
+        """Sum a date range on an open connection.
+
+        The explicit type/state lists let SQLite walk the covering
+        (session_type, state, start_time, ...) index one group at a time,
+        so no temporary sort is needed however many sessions are in range.
+        """
+        cursor = conn.execute(
+            """
+            SELECT
+                session_type,
+                state,
+                SUM(actual_duration_minutes) as total_minutes,
+                COUNT(*) as count
+            FROM sessions
+            WHERE session_type IN ('work', 'break')
+              AND state IN ('completed', 'abandoned', 'ended_early')
+              AND start_time >= ? AND start_time < ?
+            GROUP BY session_type, state
+        """,
+            (start_date.timestamp(), end_date.timestamp()),
+        )
+        return self._fold_period_summary(cursor.fetchall())
+
+    def _tag_period_summary(
+        self,
+        conn: sqlite3.Connection,
+        tag: str,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> Dict[str, Any]:
+        """_period_summary() for one tag's sessions, from the tag_days rollup."""
+        cursor = conn.execute(
+            """
+            SELECT
+                d.session_type,
+                d.state,
+                SUM(d.minutes) as total_minutes,
+                SUM(d.sessions) as count
+            FROM tag_days d JOIN tags t ON t.id = d.tag_id
+            WHERE t.name = ? AND d.day >= ? AND d.day < ?
+            GROUP BY d.session_type, d.state
+        """,
+            (tag, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")),
+        )
+        return self._fold_period_summary(cursor.fetchall())
+
+    def _fold_period_summary(self, rows: List[sqlite3.Row]) -> Dict[str, Any]:
+        """Fold (session_type, state, total_minutes, count) rows into a summary."""
+        summary = {
+            "work_completed_minutes": 0,
+            "work_abandoned_minutes": 0,
+            "break_minutes": 0,
+            "completed_sessions": 0,
+            "abandoned_sessions": 0,
+            "session_count": 0,
+        }
+
+        for row in rows:
+            minutes = row["total_minutes"] or 0
+            summary["session_count"] += row["count"]
+
+            if row["session_type"] == "work":
+                if row["state"] == "completed":
+                    summary["work_completed_minutes"] += minutes
+                    summary["completed_sessions"] += row["count"]
+                elif row["state"] == "abandoned":
+                    summary["work_abandoned_minutes"] += minutes
+                    summary["abandoned_sessions"] += row["count"]
+            elif row["session_type"] == "break":
+                summary["break_minutes"] += minutes
+
+        return summary
+
+    def get_work_totals_by_day(
+        self, start_date: datetime, end_date: datetime
+    ) -> Dict[str, Dict[str, Any]]:
+        """Completed work minutes and session counts keyed by local YYYY-MM-DD."""
+        with self.connection() as conn:
+            return self._work_totals(conn, LOCAL_DAY_SQL, start_date, end_date)
+
+    def get_work_totals_by_week(
+        self, start_date: datetime, end_date: datetime
+    ) -> Dict[str, Dict[str, Any]]:
+        """Completed work totals keyed by the local Monday (YYYY-MM-DD) of each week."""
+        with self.connection() as conn:
+            return self._work_totals(conn, LOCAL_WEEK_SQL, start_date, end_date)
+
+    def _work_totals(
+        self,
+        conn: sqlite3.Connection,
+        bucket_sql: str,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Group completed work sessions in a range by a computed bucket key."""
+        cursor = conn.execute(
+            f"""
+            SELECT
+                {bucket_sql} as bucket,
+                SUM(actual_duration_minutes) as work,
+                COUNT(*) as sessions
+            FROM sessions
+            WHERE start_time >= ? AND start_time < ?
+              AND session_type = 'work' AND state = 'completed'
+            GROUP BY bucket
+            ORDER BY bucket
+        """,
+            (start_date.timestamp(), end_date.timestamp()),
+        )
+        return {
+            row["bucket"]: {"work": row["work"] or 0, "sessions": row["sessions"]}
+            for row in cursor.fetchall()
+        }
+
+    def _tag_work_totals(
+        self,
+        conn: sqlite3.Connection,
+        tag: str,
+        bucket_sql: str,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> Dict[str, Dict[str, Any]]:
+        """_work_totals() for one tag's sessions, from the tag_days rollup."""
+        cursor = conn.execute(
+            f"""
+            SELECT
+                {bucket_sql} as bucket,
+                SUM(minutes) as work,
+                SUM(sessions) as sessions
+            FROM tag_days
+            WHERE tag_id = (SELECT id FROM tags WHERE name = ?)
+              AND day >= ? AND day < ?
+              AND session_type = 'work' AND state = 'completed'
+            GROUP BY bucket
+            ORDER BY bucket
+        """,
+            (tag, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")),
+        )
+        return {
+            row["bucket"]: {"work": row["work"] or 0, "sessions": row["sessions"]}
+            for row in cursor.fetchall()
+        }
+
+    def get_period_stats(
+        self,
+        period: str,
+        start_date: datetime,
+        end_date: datetime,
+        tag: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Summary plus work-total buckets for a stats period.
+
+        Returns {"summary": ..., "buckets": ...}; buckets are per local week
+        for a month and per local day otherwise. With `tag`, only that tag's
+        sessions count, read from the tag_days rollup. Periods that have
+        already ended are served from stats_cache (keyed by period and tag)
+        and computed at most once; the current, still-open period is always
+        recomputed.
+        """
+        range_start = start_date.timestamp()
+        range_end = end_date.timestamp()
+
+        def compute(conn: sqlite3.Connection) -> Dict[str, Any]:
+            if tag is not None:
+                bucket_sql = TAG_WEEK_SQL if period == "month" else TAG_DAY_SQL
+                return {
+                    "summary": self._tag_period_summary(
+                        conn, tag, start_date, end_date
+                    ),
+                    "buckets": self._tag_work_totals(
+                        conn, tag, bucket_sql, start_date, end_date
+                    ),
+                }
+            bucket_sql = LOCAL_WEEK_SQL if period == "month" else LOCAL_DAY_SQL
+            return {
+                "summary": self._period_summary(conn, start_date, end_date),
+                "buckets": self._work_totals(conn, bucket_sql, start_date, end_date),
             }
 
-            for row in results:
-                session_type = row["session_type"]
-                state = row["state"]
-                minutes = row["total_minutes"] or 0
-                count = row["count"]
-
-                if session_type == "work":
-                    stats["total_work_minutes"] += minutes
-                    if state == "completed":
-                        stats["work_completed"] += count
-                        stats["session_count"] += count
-                    elif state == "abandoned":
-                        stats["work_abandoned"] += count
-                elif session_type == "break":
-                    stats["total_break_minutes"] += minutes
-                    if state == "completed":
-                        stats["break_completed"] += count
+        if range_end > self.clock.time():
+            with self.connection() as conn:
+                return compute(conn)
+
+        # Tagged entries cover the same range, so the same sessions drop them
+        cache_key = period if tag is None else f"{period}:{tag}"
+
+        with self.connection() as conn:
+            row = conn.execute(
+                """
+                SELECT payload FROM stats_cache
+                WHERE period = ? AND range_start = ? AND range_end = ?
+            """,
+                (cache_key, range_start, range_end),
+            ).fetchone()
+            if row:
+                return json.loads(row["payload"])
 
+            # Compute and store inside one transaction so a session logged
+            # meanwhile can't be missed: if the database changed under our
+            # read, the write fails and the result just goes uncached.
+            conn.execute("BEGIN")
+            stats = compute(conn)
+            try:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO stats_cache
+                        (period, range_start, range_end, payload, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """,
+                    (
+                        cache_key,
+                        range_start,
+                        range_end,
+                        json.dumps(stats),
+                        self.clock.time(),
+                    ),
+                )
+            except sqlite3.OperationalError:
+                conn.rollback()
             return stats
 
-    def calculate_current_streak(self) -> int:
-        """Calculate current streak of completed work sessions."""
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    def _invalidate_stats_cache(self, conn: sqlite3.Connection, start_time: float):
+        """Drop cached stats for every period containing start_time."""
+        conn.execute(
+            """
+            DELETE FROM stats_cache
+            WHERE range_start <= ? AND range_end > ?
+        """,
+            (start_time, start_time),
+        )
 
+    @retry_on_busy
+    def clear_stats_cache(self):
+        """Drop all cached period stats."""
+        with self.connection() as conn:
+            conn.execute("DELETE FROM stats_cache")
+
+    def get_daily_trend(
+        self, start_date: datetime, end_date: datetime
+    ) -> List[Dict[str, Any]]:
+        """Per-day focused minutes with rolling 7- and 28-day averages.
+
+        Focused time is all logged work (completed and abandoned). Every day
+        in [start_date, end_date) gets a row, and the averages are computed
+        by window functions over a gap-free calendar so idle days count as
+        zero. The 27 days before start_date are read only to warm up the
+        windows, so the cost depends on the range, not on total history.
+        """
+        warmup_date = start_date - timedelta(days=27)
         with self.connection() as conn:
             cursor = conn.execute(
-                """
-                SELECT end_time
-                FROM sessions
-                WHERE session_type = 'work' 
-                  AND state = 'completed'
-                  AND start_time >= ?
-                ORDER BY end_time ASC
+                f"""
+                WITH RECURSIVE days(day) AS (
+                    SELECT :warmup_day
+                    UNION ALL
+                    SELECT date(day, '+1 day') FROM days
+                    WHERE date(day, '+1 day') < :end_day
+                ),
+                totals AS (
+                    SELECT
+                        {LOCAL_DAY_SQL} as day,
+                        SUM(actual_duration_minutes) as focused,
+                        SUM(state = 'completed') as completed,
+                        SUM(state = 'abandoned') as abandoned
+                    FROM sessions
+                    WHERE session_type = 'work'
+                      AND state IN ('completed', 'abandoned')
+                      AND start_time >= :warmup_ts AND start_time < :end_ts
+                    GROUP BY day
+                ),
+                series AS (
+                    SELECT
+                        days.day,
+                        COALESCE(totals.focused, 0) as focused,
+                        COALESCE(totals.completed, 0) as completed,
+                        COALESCE(totals.abandoned, 0) as abandoned,
+                        AVG(COALESCE(totals.focused, 0)) OVER (
+                            ORDER BY days.day
+                            ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+                        ) as avg_7d,
+                        AVG(COALESCE(totals.focused, 0)) OVER (
+                            ORDER BY days.day
+                            ROWS BETWEEN 27 PRECEDING AND CURRENT ROW
+                        ) as avg_28d
+                    FROM days LEFT JOIN totals ON totals.day = days.day
+                )
+                SELECT * FROM series WHERE day >= :start_day ORDER BY day
             """,
-                (today_start.timestamp(),),
+                {
+                    "warmup_day": warmup_date.strftime("%Y-%m-%d"),
+                    "start_day": start_date.strftime("%Y-%m-%d"),
+                    "end_day": end_date.strftime("%Y-%m-%d"),
+                    "warmup_ts": warmup_date.timestamp(),
+                    "end_ts": end_date.timestamp(),
+                },
             )
+            return [dict(row) for row in cursor.fetchall()]
 
-            sessions = cursor.fetchall()
+    def get_weekly_trend(
+        self, start_date: datetime, end_date: datetime
+    ) -> List[Dict[str, Any]]:
+        """Per-week (Monday start) focus with week-over-week deltas.
 
-            if not sessions:
-                return 0
+        start_date should be a Monday. Each row carries focused minutes, the
+        change from the previous week (via LAG, so the first week compares
+        against the week before the range) and the completion ratio of
+        completed vs abandoned work sessions (None for weeks without work).
+        """
+        warmup_date = start_date - timedelta(days=7)
+        with self.connection() as conn:
+            cursor = conn.execute(
+                f"""
+                WITH RECURSIVE weeks(week) AS (
+                    SELECT :warmup_day
+                    UNION ALL
+                    SELECT date(week, '+7 days') FROM weeks
+                    WHERE date(week, '+7 days') < :end_day
+                ),
+                totals AS (
+                    SELECT
+                        {LOCAL_WEEK_SQL} as week,
+                        SUM(actual_duration_minutes) as focused,
+                        SUM(state = 'completed') as completed,
+                        SUM(state = 'abandoned') as abandoned
+                    FROM sessions
+                    WHERE session_type = 'work'
+                      AND state IN ('completed', 'abandoned')
+                      AND start_time >= :warmup_ts AND start_time < :end_ts
+                    GROUP BY week
+                ),
+                series AS (
+                    SELECT
+                        weeks.week,
+                        COALESCE(totals.focused, 0) as focused,
+                        COALESCE(totals.completed, 0) as completed,
+                        COALESCE(totals.abandoned, 0) as abandoned,
+                        COALESCE(totals.focused, 0) - LAG(
+                            COALESCE(totals.focused, 0)
+                        ) OVER (ORDER BY weeks.week) as delta,
+                        CAST(totals.completed AS REAL)
+                            / NULLIF(totals.completed + totals.abandoned, 0)
+                            as completion_ratio
+                    FROM weeks LEFT JOIN totals ON totals.week = weeks.week
+                )
+                SELECT * FROM series WHERE week >= :start_day ORDER BY week
+            """,
+                {
+                    "warmup_day": warmup_date.strftime("%Y-%m-%d"),
+                    "start_day": start_date.strftime("%Y-%m-%d"),
+                    "end_day": end_date.strftime("%Y-%m-%d"),
+                    "warmup_ts": warmup_date.timestamp(),
+                    "end_ts": end_date.timestamp(),
+                },
+            )
+            return [dict(row) for row in cursor.fetchall()]
 
-            # Check if most recent session was more than 60 minutes ago
-            # If so, the streak has expired
-            most_recent_end = sessions[-1]["end_time"]
-            minutes_since_last = (time.time() - most_recent_end) / 60
-            if minutes_since_last >= 60:
-                return 0
+    # Hourly focus rollup
 
-            streak = 1
-            for i in range(1, len(sessions)):
-                prev_end = sessions[i - 1]["end_time"]
-                curr_end = sessions[i]["end_time"]
-                gap_minutes = (curr_end - prev_end) / 60
-
-                # Streak continues if gap < 60 minutes
-                if gap_minutes < 60:
-                    streak += 1
+    def _add_focus_hours(
+        self,
+        conn: sqlite3.Connection,
+        start_time: float,
+        end_time: Optional[float],
+        minutes: float,
+    ):
+        """Add (or with negative minutes, remove) a work session's hours."""
+        conn.executemany(
+            """
+            INSERT INTO focus_hours (hour_start, weekday, hour, work_minutes)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(hour_start) DO UPDATE SET
+                work_minutes = work_minutes + excluded.work_minutes
+        """,
+            split_by_local_hour(start_time, end_time, minutes),
+        )
+
+    def _rebuild_focus_hours(self, conn: sqlite3.Connection):
+        """Recompute the focus_hours rollup from the sessions table."""
+        conn.execute("DELETE FROM focus_hours")
+        totals = {}
+        cursor = conn.execute("""
+            SELECT start_time, end_time, actual_duration_minutes
+            FROM sessions WHERE session_type = 'work'
+        """)
+        for start_time, end_time, minutes in cursor:
+            for hour_start, weekday, hour, piece in split_by_local_hour(
+                start_time, end_time, minutes
+            ):
+                if hour_start in totals:
+                    totals[hour_start][2] += piece
                 else:
-                    # Reset streak, start counting from this session
-                    streak = 1
+                    totals[hour_start] = [weekday, hour, piece]
+        conn.executemany(
+            """
+            INSERT INTO focus_hours (hour_start, weekday, hour, work_minutes)
+            VALUES (?, ?, ?, ?)
+        """,
+            [(key, *value) for key, value in totals.items()],
+        )
+
+    @retry_on_busy
+    def rebuild_focus_hours(self):
+        """Recompute the hourly rollup, e.g. after bulk-importing sessions."""
+        with self.connection() as conn:
+            self._rebuild_focus_hours(conn)
 
-            return streak
+    def get_focus_heatmap(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> Dict[tuple, float]:
+        """Focused minutes keyed by (weekday, hour), weekday 0 = Monday.
+
+        Reads the hourly rollup, so the cost depends on the number of
+        distinct hours in range rather than on the number of sessions.
+        """
+        start = start_date.timestamp() if start_date else float("-inf")
+        end = end_date.timestamp() if end_date else float("inf")
+        with self.connection() as conn:
+            cursor = conn.execute(
+                """
+                SELECT weekday, hour, SUM(work_minutes) as minutes
+                FROM focus_hours
+                WHERE hour_start >= ? AND hour_start < ?
+                GROUP BY weekday, hour
+            """,
+                (start, end),
+            )
+            return {
+                (row["weekday"], row["hour"]): row["minutes"]
+                for row in cursor.fetchall()
+                if row["minutes"] > 1e-9
+            }
+
+    # Contention metrics
+
+    def get_contention_metrics(self) -> Dict[str, Dict[str, float]]:
+        """Retry/wait/failure counters for write methods that hit contention."""
+        with self.stats_lock:
+            return {method: dict(stats) for method, stats in self.contention.items()}
+
+    def get_timing_metrics(self) -> Dict[str, Dict[str, float]]:
+        """Calls and seconds per write method (a copy, safe from any thread)."""
+        with self.stats_lock:
+            return {method: dict(stats) for method, stats in self.timings.items()}
 
     # Config methods
 
@@ -275,9 +1612,12 @@ class Database:
                     return row["value"]
             return default
 
-    def set_config(self, key: str, value: Any):
-        """Set a config value."""
+    @retry_on_busy
+    def set_config(self, key: str, value: Any, record_event: bool = False):
+        """Set a config value (recording a config_changed event if asked)."""
         with self.connection() as conn:
+            if record_event:
+                self._log_event(conn, "config_changed", {"key": key, "value": value})
             conn.execute(
                 """
                 INSERT INTO config (key, value, updated_at)
@@ -289,7 +1629,7 @@ class Database:
                 (
                     key,
                     json.dumps(value) if not isinstance(value, str) else value,
-                    time.time(),
+                    self.clock.time(),
                 ),
             )
 
@@ -305,53 +1645,127 @@ class Database:
                     config[row["key"]] = row["value"]
             return config
 
+    @retry_on_busy
     def reset_config(self):
         """Clear all config (will be repopulated with defaults)."""
         with self.connection() as conn:
+            self._log_event(conn, "config_changed", {"reset": True})
             conn.execute("DELETE FROM config")
 
     # Engine state methods
 
     def get_engine_state(self) -> Optional[Dict[str, Any]]:
-        """Get current engine state."""
+        """Get current engine state, or None if none is saved."""
         with self.connection() as conn:
-            cursor = conn.execute("SELECT current_state FROM engine_state WHERE id = 1")
-            row = cursor.fetchone()
-            if row and row["current_state"]:
-                return json.loads(row["current_state"])
-            return None
+            return engine_state_from_row(conn.execute(ENGINE_STATE_SQL).fetchone())
+
+    def get_engine_state_version(self) -> int:
+        """Version of the engine state; it changes whenever the state does."""
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT version FROM engine_state WHERE id = 1"
+            ).fetchone()
+            return row[0] if row else 0
+
+    def poll_engine_state(self, version: int) -> Optional[tuple]:
+        """(version, state) if the state changed since `version`, else None.
+
+        The version check happens in the query, so when nothing changed no
+        row is read at all. Pass -1 to always get the current state.
+        """
+        with self.connection() as conn:
+            row = conn.execute(
+                ENGINE_STATE_SQL + " AND version != ?", (version,)
+            ).fetchone()
+            if row is None:
+                return None
+            return row[0], engine_state_from_row(row)
 
     def set_engine_state(self, state: Dict[str, Any]):
-        """Set engine state."""
+        """Replace the engine state (fields missing from `state` are cleared)."""
+        self.update_engine_state(
+            {field: state.get(field) for field in ENGINE_STATE_FIELDS}
+        )
+
+    @retry_on_busy
+    def update_engine_state(self, fields: Dict[str, Any]):
+        """Write only the given state fields and bump the version."""
         with self.connection() as conn:
-            conn.execute(
-                """
-                INSERT INTO engine_state (id, current_state, updated_at)
-                VALUES (1, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET
-                    current_state = excluded.current_state,
-                    updated_at = excluded.updated_at
-            """,
-                (json.dumps(state), time.time()),
-            )
+            self._update_engine_state(conn, fields)
 
+    def _update_engine_state(self, conn: sqlite3.Connection, fields: Dict[str, Any]):
+        """update_engine_state() on an open connection."""
+        unknown = [field for field in fields if field not in ENGINE_STATE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown engine state fields: {', '.join(unknown)}")
+        if not fields:
+            return
+        columns = list(fields)
+        conn.execute(
+            f"""
+            INSERT INTO engine_state (id, {", ".join(columns)}, updated_at, version)
+            VALUES (1, {", ".join("?" for _ in columns)}, ?, 1)
+            ON CONFLICT(id) DO UPDATE SET
+                {", ".join(f"{c} = excluded.{c}" for c in columns)},
+                updated_at = excluded.updated_at,
+                version = engine_state.version + 1
+        """,
+            (*fields.values(), self.clock.time()),
+        )
+
+    @retry_on_busy
     def clear_engine_state(self):
-        """Clear engine state."""
+        """Clear engine state (the version still moves forward)."""
+        with self.connection() as conn:
+            conn.execute(f"""
+                UPDATE engine_state SET
+                    {", ".join(f"{field} = NULL" for field in ENGINE_STATE_FIELDS)},
+                    updated_at = NULL,
+                    version = version + 1
+                WHERE id = 1
+            """)
+
+    # Batched writes
+
+    @contextmanager
+    def unit_of_work(self):
+        """Collect writes made through the yielded UnitOfWork; commit together.
+
+        On leaving the block every write commits in one transaction (the
+        session row, its rollups, engine state and command status alike).
+        If the block raises, none of them are written.
+        """
+        uow = UnitOfWork()
+        yield uow
+        self.write_batch(uow.writes)
+
+    @retry_on_busy
+    def write_batch(self, writes: List[tuple]):
+        """Apply (method, args) writes in order, all in one transaction.
+
+        `method` names one of BATCH_WRITES. Either every write commits or
+        none does.
+        """
         with self.connection() as conn:
-            conn.execute("DELETE FROM engine_state WHERE id = 1")
+            for method, args in writes:
+                if method not in BATCH_WRITES:
+                    raise ValueError(f"Not a batchable write: {method}")
+                getattr(self, f"_{method}")(conn, *args)
 
     # Command queue methods
 
-    def queue_command(self, command: str, args: Optional[Dict[str, Any]] = None):
-        """Queue a command for the engine."""
+    @retry_on_busy
+    def queue_command(self, command: str, args: Optional[Dict[str, Any]] = None) -> int:
+        """Queue a command for the engine. Returns the command's ID."""
         with self.connection() as conn:
-            conn.execute(
+            cursor = conn.execute(
                 """
                 INSERT INTO commands (command, args, created_at)
                 VALUES (?, ?, ?)
             """,
-                (command, json.dumps(args) if args else None, time.time()),
+                (command, json.dumps(args) if args else None, self.clock.time()),
             )
+            return cursor.lastrowid
 
     def get_pending_commands(self) -> List[Dict[str, Any]]:
         """Get all unprocessed commands."""
@@ -364,16 +1778,179 @@ class Database:
             """)
             return [dict(row) for row in cursor.fetchall()]
 
+    @retry_on_busy
+    def claim_commands(self) -> List[Dict[str, Any]]:
+        """Claim every pending command for processing, oldest first.
+
+        One UPDATE moves them from pending (0) to claimed (2) and returns
+        them, so no other reader picks them up again. Finish them with
+        mark_commands_processed(); release_claimed_commands() puts back any
+        left claimed by an engine that died. When nothing is pending this
+        is a read and commits nothing.
+        """
+        with self.connection() as conn:
+            if not conn.execute(
+                "SELECT 1 FROM commands WHERE processed = 0 LIMIT 1"
+            ).fetchone():
+                return []
+            if sqlite3.sqlite_version_info >= (3, 35):
+                rows = conn.execute("""
+                    UPDATE commands SET processed = 2
+                    WHERE processed = 0
+                    RETURNING id, command, args, created_at
+                """).fetchall()
+            else:
+                # No RETURNING: read and claim inside one write transaction
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute("""
+                    SELECT id, command, args, created_at
+                    FROM commands WHERE processed = 0
+                """).fetchall()
+                conn.executemany(
+                    "UPDATE commands SET processed = 2 WHERE id = ?",
+                    [(row["id"],) for row in rows],
+                )
+            commands = [dict(row) for row in rows]
+            commands.sort(key=lambda cmd: (cmd["created_at"], cmd["id"]))
+            return commands
+
     def mark_command_processed(self, command_id: int):
         """Mark a command as processed."""
+        self.mark_commands_processed([command_id])
+
+    @retry_on_busy
+    def mark_commands_processed(
+        self,
+        command_ids: List[int],
+        results: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ):
+        """Mark commands as processed, in one transaction.
+
+        `results` (one per command) is what each command did, for clients
+        waiting on them (see get_command_results()).
+        """
         with self.connection() as conn:
-            conn.execute(
-                "UPDATE commands SET processed = 1 WHERE id = ?", (command_id,)
+            self._mark_commands_processed(conn, command_ids, results)
+
+    def _mark_commands_processed(
+        self,
+        conn: sqlite3.Connection,
+        command_ids: List[int],
+        results: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ):
+        results = results or [None] * len(command_ids)
+        conn.executemany(
+            "UPDATE commands SET processed = 1, result = ? WHERE id = ?",
+            [
+                (json.dumps(result) if result is not None else None, command_id)
+                for command_id, result in zip(command_ids, results)
+            ],
+        )
+
+    def get_command_results(
+        self, command_ids: List[int]
+    ) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Results of the given commands that have been processed, by ID."""
+        if not command_ids:
+            return {}
+        placeholders = ", ".join("?" * len(command_ids))
+        with self.connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT id, result FROM commands
+                WHERE id IN ({placeholders}) AND processed = 1
+            """,
+                list(command_ids),
+            ).fetchall()
+        return {
+            row["id"]: json.loads(row["result"]) if row["result"] else None
+            for row in rows
+        }
+
+    @retry_on_busy
+    def cancel_command(self, command_id: int) -> bool:
+        """Withdraw a command the engine hasn't claimed yet; True if withdrawn."""
+        with self.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM commands WHERE id = ? AND processed = 0", (command_id,)
+            )
+            return cursor.rowcount > 0
+
+    @retry_on_busy
+    def release_claimed_commands(self) -> int:
+        """Return claimed but unfinished commands to pending; returns how many."""
+        with self.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE commands SET processed = 0 WHERE processed = 2"
             )
+            return cursor.rowcount
+
+    # Change feed
+
+    @retry_on_busy
+    def log_event(self, event_type: str, data: Optional[Dict[str, Any]] = None):
+        """Append an event to the change feed."""
+        with self.connection() as conn:
+            self._log_event(conn, event_type, data)
+
+    def _log_event(
+        self,
+        conn: sqlite3.Connection,
+        event_type: str,
+        data: Optional[Dict[str, Any]] = None,
+    ):
+        conn.execute(
+            "INSERT INTO events (type, data, created_at) VALUES (?, ?, ?)",
+            (event_type, json.dumps(data or {}), self.clock.time()),
+        )
+
+    def get_events(self, after_id: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Events with IDs above `after_id`, oldest first."""
+        with self.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, type, data, created_at FROM events
+                WHERE id > ? ORDER BY id LIMIT ?
+            """,
+                (after_id, limit),
+            ).fetchall()
+        return [
+            {
+                "id": row["id"],
+                "type": row["type"],
+                "time": row["created_at"],
+                "data": json.loads(row["data"]),
+            }
+            for row in rows
+        ]
+
+    def get_event_range(self) -> tuple:
+        """(first, last) event IDs still held; first > last when none are.
+
+        `last` is the last ID ever handed out, so it stays put when pruning
+        empties the table.
+        """
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'events'"
+            ).fetchone()
+            last = row["seq"] if row else 0
+            first = conn.execute("SELECT MIN(id) FROM events").fetchone()[0]
+        return (first if first is not None else last + 1), last
+
+    @retry_on_busy
+    def prune_events(self, before: float):
+        """Delete events created before the `before` timestamp."""
+        with self.connection() as conn:
+            self._prune_events(conn, before)
+
+    def _prune_events(self, conn: sqlite3.Connection, before: float):
+        conn.execute("DELETE FROM events WHERE created_at < ?", (before,))
 
+    @retry_on_busy
     def cleanup_old_commands(self, days: int = 7):
         """Delete processed commands older than specified days."""
-        cutoff = (datetime.now() - timedelta(days=days)).timestamp()
+        cutoff = (self.clock.now() - timedelta(days=days)).timestamp()
         with self.connection() as conn:
             conn.execute(
                 """
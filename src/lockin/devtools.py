@@ -0,0 +1,337 @@
+"""Developer tools: ``lockin dev seed`` synthetic history generator.
+
+Seeded databases are for profiling and load testing the stats and log
+paths. Every day is generated from its own RNG keyed on (seed, date), so a
+given seed always produces the same sessions for the same dates, however
+long the history is.
+"""
+
+import argparse
+import bisect
+import functools
+import itertools
+import random
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .database import Database, split_by_local_hour
+
+DEFAULT_DAYS = 3 * 365
+
+# Mean work sessions on a working day
+DEFAULT_PACE = 6.0
+
+# --sessions never reaches back further than this; beyond it the daily
+# pace is raised instead (sessions then run back-to-back, and very high
+# paces overlap into the next day, which is fine for load testing)
+MAX_DAYS = 30 * 365
+
+WORK_DURATIONS = [25, 30, 45, 50, 60, 90]
+WORK_WEIGHTS = [40, 15, 15, 10, 15, 5]
+# For drawing like rng.choices(WORK_DURATIONS, WORK_WEIGHTS) (the same
+# draws and results) without rebuilding the sums on every call
+WORK_CUM_WEIGHTS = list(itertools.accumulate(WORK_WEIGHTS))
+SHORT_BREAK = 5
+LONG_BREAK = 15
+LONG_BREAK_EVERY = 4
+
+ABANDON_RATE = 0.12
+BONUS_RATE = 0.25
+BREAK_ENDED_EARLY_RATE = 0.2
+# Chance of a long pause (lunch, meetings) after a break; ends the streak
+STREAK_GAP_RATE = 0.15
+VACATION_WEEK_RATE = 0.05
+
+# Page cache while loading and indexing (KiB); sorting for the index
+# builds spills to temp files below this
+LOAD_CACHE_KIB = 256 * 1024
+
+# Rows as inserted into sessions: (session_type, state, start_time, end_time,
+# planned_duration_minutes, actual_duration_minutes, overtime_minutes,
+# created_at)
+SessionRow = Tuple[str, str, float, float, int, float, float, float]
+
+
+def _rng(seed: int, day: date, stream: int = 0) -> random.Random:
+    """RNG for one (seed, date, stream); integer seeding is the cheap path."""
+    return random.Random((seed << 24 | stream << 22 | day.toordinal()) & (2**63 - 1))
+
+
+@functools.lru_cache(maxsize=64)
+def _vacation_week(seed: int, monday: date) -> bool:
+    return _rng(seed, monday, stream=1).random() < VACATION_WEEK_RATE
+
+
+def _work_sessions_planned(
+    seed: int, day: date, rng: random.Random, pace: float
+) -> int:
+    """Decide how many work sessions happen on a day (first draws of rng)."""
+    if _vacation_week(seed, day - timedelta(days=day.weekday())):
+        return 0
+
+    work_prob = 0.9 if day.weekday() < 5 else 0.3
+    if rng.random() >= work_prob:
+        return 0
+    return max(1, round(rng.gauss(pace, pace * 0.35)))
+
+
+def generate_day(seed: int, day: date, pace: float = DEFAULT_PACE) -> List[SessionRow]:
+    """Generate one day's sessions: work/break cycles from the morning on."""
+    rng = _rng(seed, day)
+    work_count = _work_sessions_planned(seed, day, rng, pace)
+    if not work_count:
+        return []
+
+    midnight = datetime.combine(day, datetime.min.time()).timestamp()
+    clock = midnight + 3600 * min(13, max(6, rng.gauss(8.75, 0.75)))
+    streak = 0
+    rows = []
+
+    for i in range(work_count):
+        planned = WORK_DURATIONS[
+            bisect.bisect(WORK_CUM_WEIGHTS, rng.random() * WORK_CUM_WEIGHTS[-1])
+        ]
+        if rng.random() < ABANDON_RATE:
+            state = "abandoned"
+            actual = rng.uniform(5, planned)
+            bonus = 0.0
+            streak = 0
+        else:
+            state = "completed"
+            bonus = rng.uniform(1, 20) if rng.random() < BONUS_RATE else 0.0
+            actual = planned + bonus
+            streak += 1
+        end = clock + actual * 60
+        rows.append(("work", state, clock, end, planned, actual, bonus, end))
+        clock = end + rng.uniform(0, 60)
+
+        # Every work session but the day's last is followed by a break
+        if i == work_count - 1:
+            break
+        planned = (
+            LONG_BREAK if streak and streak % LONG_BREAK_EVERY == 0 else SHORT_BREAK
+        )
+        if rng.random() < BREAK_ENDED_EARLY_RATE:
+            state, actual = "ended_early", rng.uniform(2, planned)
+        else:
+            state, actual = "completed", float(planned)
+        end = clock + actual * 60
+        rows.append(("break", state, clock, end, planned, actual, 0.0, end))
+        clock = end + rng.uniform(0, 300)
+
+        if rng.random() < STREAK_GAP_RATE:
+            clock += rng.uniform(60, 150) * 60
+            streak = 0
+
+    return rows
+
+
+def _count_day(seed: int, day: date, pace: float, now: float, exact: bool) -> int:
+    """Sessions generate_day() would keep for a day.
+
+    Only the day-level draws are needed unless the day is recent enough
+    (`exact`) for some of its sessions to end after now.
+    """
+    if exact:
+        return sum(1 for row in generate_day(seed, day, pace) if row[3] <= now)
+    work_count = _work_sessions_planned(seed, day, _rng(seed, day), pace)
+    return 2 * work_count - 1 if work_count else 0
+
+
+def generate_history(
+    seed: int,
+    first_day: date,
+    last_day: date,
+    pace: float = DEFAULT_PACE,
+    now: Optional[float] = None,
+    skip: int = 0,
+) -> Iterator[SessionRow]:
+    """Yield sessions day by day, dropping any that end after now.
+
+    The first `skip` sessions are dropped, so a history can be trimmed to
+    an exact size without changing the remaining days.
+    """
+    now = time.time() if now is None else now
+    day = first_day
+    while day <= last_day:
+        for row in generate_day(seed, day, pace):
+            if row[3] > now:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            yield row
+        day += timedelta(days=1)
+
+
+def add_focus_hours(
+    rows: Iterator[SessionRow], totals: Dict[float, list]
+) -> Iterator[SessionRow]:
+    """Pass rows through, summing work minutes per local hour into `totals`.
+
+    Builds the focus_hours rollup while the rows stream into the database,
+    instead of reading every session back to rebuild it afterwards.
+    """
+    for row in rows:
+        if row[0] == "work":
+            for hour_start, weekday, hour, piece in split_by_local_hour(
+                row[2], row[3], row[5]
+            ):
+                if hour_start in totals:
+                    totals[hour_start][2] += piece
+                else:
+                    totals[hour_start] = [weekday, hour, piece]
+        yield row
+
+
+def plan_sessions(
+    sessions: int, seed: int, today: date, now: float
+) -> Tuple[date, float, int]:
+    """Find (first_day, pace, skip) so history ends today with exactly `sessions`.
+
+    Walks back from today counting sessions per day; if MAX_DAYS isn't
+    enough at the current pace, raises the pace and tries again.
+    """
+    # Start from a pace expected to fit in MAX_DAYS so one walk usually does
+    working_days = (1 - VACATION_WEEK_RATE) * (5 * 0.9 + 2 * 0.3) / 7
+    needed = (sessions / (MAX_DAYS * working_days) + 1) / 2
+    pace = max(DEFAULT_PACE, needed * 1.05)
+    while True:
+        # Days this recent may spill past now (a day of work at high pace
+        # can run longer than 24 hours)
+        recent_days = 1 + int(pace * 2 * 60 * 60 / 86400)
+        total = _count_day(seed, today, pace, now, exact=True)
+        day = today
+        while total < sessions and (today - day).days < MAX_DAYS:
+            day -= timedelta(days=1)
+            exact = (today - day).days <= recent_days
+            total += _count_day(seed, day, pace, now, exact)
+        if total >= sessions:
+            return day, pace, total - sessions
+        pace *= 1.1 * sessions / total if total else 2
+
+
+def seed_database(
+    db_path: Path,
+    days: Optional[int] = None,
+    sessions: Optional[int] = None,
+    seed: int = 0,
+) -> int:
+    """Write a synthetic history ending now into db_path. Returns rows written.
+
+    With `sessions`, exactly that many sessions are generated (going back as
+    far as needed); otherwise `days` of history (default three years).
+    """
+    now = time.time()
+    today = datetime.fromtimestamp(now).date()
+
+    if sessions is not None:
+        first_day, pace, skip = plan_sessions(sessions, seed, today, now)
+    else:
+        first_day = today - timedelta(days=(days or DEFAULT_DAYS) - 1)
+        pace, skip = DEFAULT_PACE, 0
+
+    hours: Dict[float, list] = {}
+    rows = add_focus_hours(
+        generate_history(seed, first_day, today, pace, now, skip), hours
+    )
+
+    db = Database(db_path)
+    with db.connection() as conn:
+        # A throwaway file being bulk-loaded: no durability until the end,
+        # and pages go straight to the file instead of through the WAL
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA journal_mode = MEMORY")
+        conn.execute(f"PRAGMA cache_size = -{LOAD_CACHE_KIB}")
+        # Building indexes once afterwards beats maintaining them per row
+        indexes = conn.execute("""
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND tbl_name = 'sessions' AND sql IS NOT NULL
+        """).fetchall()
+        conn.execute("BEGIN")
+        for row in indexes:
+            conn.execute(f"DROP INDEX {row['name']}")
+        before = conn.total_changes
+        conn.executemany(
+            """
+            INSERT INTO sessions (
+                session_type, state, start_time, end_time,
+                planned_duration_minutes, actual_duration_minutes,
+                overtime_minutes, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+            rows,
+        )
+        written = conn.total_changes - before
+        conn.executemany(
+            """
+            INSERT INTO focus_hours (hour_start, weekday, hour, work_minutes)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(hour_start) DO UPDATE SET
+                work_minutes = work_minutes + excluded.work_minutes
+        """,
+            [(key, *value) for key, value in hours.items()],
+        )
+        for row in indexes:
+            conn.execute(row["sql"])
+        conn.commit()
+        conn.execute("PRAGMA journal_mode = WAL")
+
+    db.clear_stats_cache()
+    return written
+
+
+def main(argv: List[str], db_path: Path) -> int:
+    """Entry point for ``lockin dev``."""
+    parser = argparse.ArgumentParser(
+        prog="lockin dev", description="Developer tools (not for your real data)"
+    )
+    subparsers = parser.add_subparsers(dest="tool", required=True)
+
+    seed_parser = subparsers.add_parser(
+        "seed", help="Generate a synthetic session history into a new database"
+    )
+    seed_parser.add_argument("path", type=Path, help="Database file to create")
+    size = seed_parser.add_mutually_exclusive_group()
+    size.add_argument(
+        "--days",
+        type=int,
+        help=f"Days of history ending today (default: {DEFAULT_DAYS})",
+    )
+    size.add_argument(
+        "--sessions", type=int, help="Exact number of sessions to generate"
+    )
+    seed_parser.add_argument(
+        "--seed", type=int, default=0, help="RNG seed (default: 0)"
+    )
+    seed_parser.add_argument(
+        "--force", action="store_true", help="Replace the file if it exists"
+    )
+    args = parser.parse_args(argv)
+
+    path = args.path.expanduser()
+    if path.resolve() == db_path.resolve():
+        print(f"Refusing to seed your real database ({db_path})")
+        return 2
+    if (args.days is not None and args.days < 1) or (
+        args.sessions is not None and args.sessions < 1
+    ):
+        print("--days and --sessions must be positive")
+        return 2
+    if path.exists():
+        if not args.force:
+            print(f"{path} already exists (use --force to replace it)")
+            return 2
+        path.unlink()
+
+    start = time.perf_counter()
+    written = seed_database(path, args.days, args.sessions, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"Seeded {written:,} sessions into {path} in {elapsed:.1f}s "
+        f"({written / elapsed:,.0f} sessions/s)"
+    )
+    return 0
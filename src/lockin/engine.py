@@ -1,16 +1,36 @@
 """Background engine for Lockin - persistent state manager and timer."""
 
-import time
 import json
+import math
+import sqlite3
 import subprocess
-from datetime import datetime
+import time
+from contextlib import contextmanager
 from enum import Enum
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 
-from .database import Database
+from .api import ApiServer
+from .clock import Clock, SystemClock
+from .database import (
+    EVENT_RETENTION_DAYS,
+    Database,
+    is_busy_error,
+    normalize_tags,
+    streak_from_end_times,
+)
+from .hooks import HookRunner
+from .metrics import EngineMetrics, write_textfile
+from .persistence import BatchFailed, PersistenceWriter
 from .config import Config
 
+# The engine must keep time: it waits at most a few milliseconds on a locked
+# database, retries briefly, and otherwise tries again on the next tick
+ENGINE_BUSY_TIMEOUT = 0.005
+ENGINE_MAX_RETRIES = 3
+
+METRICS_TEXTFILE_INTERVAL = 15  # Seconds between rewrites of metrics_textfile
+
 
 class SessionState(str, Enum):
     """Session states."""
@@ -32,11 +52,44 @@ class SessionType(str, Enum):
 class Engine:
     """Background engine managing session state and timing."""
 
-    def __init__(self, db_path: Path):
-        self.db = Database(db_path)
+    def __init__(
+        self,
+        db_path: Path,
+        clock: Optional[Clock] = None,
+        notifications: bool = True,
+    ):
+        self.clock = clock or SystemClock()
+        self.notifications = notifications
+        self.db = Database(
+            db_path,
+            clock=self.clock,
+            busy_timeout=ENGINE_BUSY_TIMEOUT,
+            max_retries=ENGINE_MAX_RETRIES,
+        )
+        # Where writes go: the database directly, or while run() is going,
+        # a PersistenceWriter that group-commits each loop iteration
+        self.store: Any = self.db
+        self.writer: Optional[PersistenceWriter] = None
+        self.in_transition = False
+        self.logged_sessions: List[tuple] = []  # Logged in the open transition
+        self.emitted_events: List[tuple] = []  # Events of the open transition
+        self.hooks: Optional[HookRunner] = None  # Set up by run()
+        # Claimed commands not yet finished (retried first on the next call)
+        self.claimed_commands: List[Dict[str, Any]] = []
+        # The writer dropped a batch: memory is ahead of the database
+        self.resync = False
+        self.coalesced_commands = 0  # Duplicates skipped by process_commands
         self.config = Config(self.db)
         self.state = self._load_state()
-        self.last_midnight_check = datetime.now().date()
+        self.state_dirty = False  # In-memory state not yet persisted
+        self.saved_state: Optional[Dict[str, Any]] = None  # Last state written
+        self.busy_ticks = 0  # Loop iterations cut short by lock contention
+        self.last_midnight_check = self.clock.now().date()
+        self.metrics = EngineMetrics()
+        self.metrics.load_day(self.db, self.clock.time())
+        self.metrics_written_at: Optional[float] = None
+        # Commands a previous engine claimed but never finished
+        self.db.release_claimed_commands()
 
     def _load_state(self) -> Dict[str, Any]:
         """Load state from database or initialize fresh."""
@@ -51,6 +104,7 @@ class Engine:
             "planned_duration_minutes": None,
             "decision_window_start": None,
             "last_notification": None,
+            "tags": None,
         }
 
         if not saved_state:
@@ -97,33 +151,138 @@ class Engine:
             return default_state
 
     def _save_state(self):
-        """Persist current state to database."""
-        self.db.set_engine_state(self.state)
+        """Persist current state to database.
+
+        The first save writes every field; after that only the fields that
+        changed since the last successful save are written. If the write
+        fails (e.g. the database stays locked), the state is left marked
+        dirty and tick() saves it again.
+        """
+        self.state_dirty = True
+        if self.saved_state is None:
+            self.store.set_engine_state(self.state)
+        else:
+            self.store.update_engine_state(
+                {
+                    field: value
+                    for field, value in self.state.items()
+                    if self.saved_state.get(field) != value
+                }
+            )
+        self.saved_state = dict(self.state)
+        self.state_dirty = False
+
+    @contextmanager
+    def transition(self):
+        """Make every write inside the block a single atomic commit.
+
+        Nested blocks join the outermost one. If the block raises or its
+        commit fails, nothing is written and the in-memory state is put
+        back as it was, so memory and database never disagree.
+        """
+        if self.in_transition:
+            yield
+            return
+
+        store = self.store
+        state, saved_state, dirty = (
+            dict(self.state),
+            self.saved_state,
+            self.state_dirty,
+        )
+        self.in_transition = True
+        try:
+            with store.unit_of_work() as uow:
+                self.store = uow
+                try:
+                    yield
+                finally:
+                    self.store = store
+        except BaseException:
+            self.state.clear()
+            self.state.update(state)
+            self.saved_state, self.state_dirty = saved_state, dirty
+            raise
+        finally:
+            self.in_transition = False
+            logged, self.logged_sessions = self.logged_sessions, []
+            events, self.emitted_events = self.emitted_events, []
+
+        if not logged and not events:
+            return
+        # Only sessions that were committed count in the metrics, and only
+        # committed changes run hooks. Under run() the block has only queued
+        # its writes, so that waits until the writer thread commits them.
+        if isinstance(store, PersistenceWriter):
+            store.after_commit(lambda: self._committed(logged, events))
+        else:
+            self._committed(logged, events)
+
+    def _committed(self, logged: List[tuple], events: List[tuple]):
+        """Count a committed transition's sessions and run its hooks."""
+        for session in logged:
+            self.metrics.session_logged(*session)
+        if self.hooks:
+            self._dispatch_hooks(events)
+
+    def _emit(self, event_type: str, data: Dict[str, Any]):
+        """Write a change feed event with the open transition's writes."""
+        self.store.log_event(event_type, data)
+        self.emitted_events.append((event_type, data))
+
+    def _dispatch_hooks(self, events: List[tuple]):
+        """Queue the hooks for committed events (they run on the hook pool)."""
+        now = self.clock.time()
+        for event_type, data in events:
+            self.hooks.dispatch(event_type, data, now)
+            if event_type == "session_logged" and data["state"] == "completed":
+                self.hooks.dispatch("session_completed", data, now)
+                if data["session_type"] == SessionType.WORK:
+                    streak = streak_from_end_times(self.metrics.work_end_times, now)
+                    if streak and streak % self.config.long_break_every == 0:
+                        self.hooks.dispatch("streak_milestone", {"streak": streak}, now)
+            elif (
+                event_type == "bonus_started"
+                and data["session_type"] == SessionType.BREAK
+                and data["auto"]
+            ):
+                self.hooks.dispatch("break_over", data, now)
 
     def _send_notification(self, title: str, message: str):
-        """Send macOS notification."""
+        """Send macOS notification (on the hook pool when run() has one)."""
+        if not self.notifications:
+            return
+        argv = [
+            "osascript",
+            "-e",
+            f'display notification "{message}" with title "{title}"',
+        ]
+        if self.hooks:
+            self.hooks.submit("notification", self.hooks.run_command, argv)
+            self.state["last_notification"] = self.clock.time()
+            return
         try:
-            subprocess.run(
-                [
-                    "osascript",
-                    "-e",
-                    f'display notification "{message}" with title "{title}"',
-                ],
-                check=False,
-                capture_output=True,
-            )
-            self.state["last_notification"] = time.time()
+            subprocess.run(argv, check=False, capture_output=True)
+            self.state["last_notification"] = self.clock.time()
         except Exception:
             pass  # Notifications are non-critical
 
     def _check_midnight_reset(self):
         """Check if midnight has passed and reset streak if needed."""
-        current_date = datetime.now().date()
+        current_date = self.clock.now().date()
         if current_date > self.last_midnight_check:
             self.last_midnight_check = current_date
-
-    def start_session(self, session_type: str, duration_minutes: int):
-        """Start a new work or break session."""
+            self.metrics.load_day(self.db, self.clock.time())
+            retention = EVENT_RETENTION_DAYS * 24 * 60 * 60
+            self.store.prune_events(self.clock.time() - retention)
+
+    def start_session(
+        self,
+        session_type: str,
+        duration_minutes: int,
+        tags: Optional[List[str]] = None,
+    ):
+        """Start a new work or break session, optionally tagged."""
         if self.state["session_state"] not in [SessionState.IDLE, SessionState.ENDED]:
             return False, "Session already in progress"
 
@@ -137,22 +296,38 @@ class Engine:
         if session_type not in [SessionType.WORK, SessionType.BREAK]:
             return False, f"Invalid session type: {session_type}"
 
-        now = time.time()
-        planned_end = now + (duration_minutes * 60)
+        try:
+            tag_names = normalize_tags(tags or [])
+        except ValueError as e:
+            return False, str(e)
 
-        self.state.update(
-            {
-                "session_state": SessionState.RUNNING,
-                "session_type": session_type,
-                "start_time": now,
-                "planned_end_time": planned_end,
-                "planned_duration_minutes": duration_minutes,
-                "decision_window_start": None,
-                "last_notification": None,
-            }
-        )
+        now = self.clock.time()
+        planned_end = now + (duration_minutes * 60)
 
-        self._save_state()
+        with self.transition():
+            self.state.update(
+                {
+                    "session_state": SessionState.RUNNING,
+                    "session_type": session_type,
+                    "start_time": now,
+                    "planned_end_time": planned_end,
+                    "planned_duration_minutes": duration_minutes,
+                    "decision_window_start": None,
+                    "last_notification": None,
+                    "tags": ",".join(tag_names) or None,
+                }
+            )
+            self._save_state()
+            self._emit(
+                "session_started",
+                {
+                    "session_type": session_type,
+                    "start_time": now,
+                    "planned_end_time": planned_end,
+                    "planned_duration_minutes": duration_minutes,
+                    "tags": tag_names,
+                },
+            )
         return True, f"Started {session_type} session for {duration_minutes} minutes"
 
     def quit_session(self):
@@ -160,12 +335,13 @@ class Engine:
         if self.state["session_state"] == SessionState.IDLE:
             return False, "No active session"
 
-        now = time.time()
+        now = self.clock.time()
         start_time = self.state["start_time"]
         planned_duration = self.state["planned_duration_minutes"]
         actual_duration_minutes = (now - start_time) / 60
         session_type = self.state["session_type"]
         current_state = self.state["session_state"]
+        tags = self.state["tags"].split(",") if self.state["tags"] else []
 
         # Determine if session should be logged
         should_log = False
@@ -209,31 +385,66 @@ class Engine:
                 should_log = True
                 log_state = "ended_early"
 
-        # Log if appropriate
-        if should_log:
-            self.db.log_session(
-                session_type=session_type,
-                state=log_state,
-                start_time=start_time,
-                end_time=now,
-                planned_duration_minutes=planned_duration,
-                actual_duration_minutes=actual_duration_minutes,
-                bonus_minutes=bonus_minutes,
-            )
+        # The logged session and the idle state commit together: a crash
+        # in between would otherwise lose the session or log it twice
+        with self.transition():
+            # Log if appropriate
+            if should_log:
+                self.store.log_session(
+                    session_type=session_type,
+                    state=log_state,
+                    start_time=start_time,
+                    end_time=now,
+                    planned_duration_minutes=planned_duration,
+                    actual_duration_minutes=actual_duration_minutes,
+                    bonus_minutes=bonus_minutes,
+                    tags=tags,
+                )
 
-        # Reset to idle
-        self.state.update(
-            {
-                "session_state": SessionState.IDLE,
-                "session_type": None,
-                "start_time": None,
-                "planned_end_time": None,
-                "planned_duration_minutes": None,
-                "decision_window_start": None,
-            }
-        )
+            # Reset to idle
+            self.state.update(
+                {
+                    "session_state": SessionState.IDLE,
+                    "session_type": None,
+                    "start_time": None,
+                    "planned_end_time": None,
+                    "planned_duration_minutes": None,
+                    "decision_window_start": None,
+                    "tags": None,
+                }
+            )
 
-        self._save_state()
+            self._save_state()
+            if should_log:
+                self.logged_sessions.append(
+                    (session_type, log_state, start_time, now, actual_duration_minutes)
+                )
+                # Its session_logged event is written with the row
+                self.emitted_events.append(
+                    (
+                        "session_logged",
+                        {
+                            "session_type": session_type,
+                            "state": log_state,
+                            "start_time": start_time,
+                            "end_time": now,
+                            "planned_duration_minutes": planned_duration,
+                            "actual_duration_minutes": actual_duration_minutes,
+                            "overtime_minutes": bonus_minutes,
+                            "tags": tags,
+                        },
+                    )
+                )
+            else:
+                self._emit(
+                    "session_discarded",
+                    {
+                        "session_type": session_type,
+                        "start_time": start_time,
+                        "end_time": now,
+                        "actual_duration_minutes": actual_duration_minutes,
+                    },
+                )
         return True, "Session ended"
 
     def continue_session(self):
@@ -241,10 +452,33 @@ class Engine:
         if self.state["session_state"] != SessionState.AWAITING_DECISION:
             return False, "Not in decision window"
 
-        self.state["session_state"] = SessionState.RUNNING_BONUS
-        self._save_state()
+        self._start_bonus(auto=False)
         return True, "Continuing session"
 
+    def tag_session(self, tags: List[str]) -> tuple[bool, str]:
+        """Set the active session's tags (replacing any it had).
+
+        Tags are logged with the session when it ends; an empty list
+        clears them.
+        """
+        if self.state["session_state"] in [SessionState.IDLE, SessionState.ENDED]:
+            return False, "No active session"
+        try:
+            tag_names = normalize_tags(tags)
+        except ValueError as e:
+            return False, str(e)
+
+        with self.transition():
+            self.state["tags"] = ",".join(tag_names) or None
+            self._save_state()
+            self._emit(
+                "session_tagged",
+                {"session_type": self.state["session_type"], "tags": tag_names},
+            )
+        if not tag_names:
+            return True, "Tags cleared"
+        return True, f"Tagged {', '.join(tag_names)}"
+
     def switch_break_type(self, break_type: str) -> tuple[bool, str]:
         """Switch between short and long break."""
         if self.state["session_type"] != SessionType.BREAK:
@@ -256,7 +490,7 @@ class Engine:
         ]:
             return False, "Break not running"
 
-        now = time.time()
+        now = self.clock.time()
         elapsed_minutes = (now - self.state["start_time"]) / 60
 
         # Check switching rules
@@ -277,12 +511,32 @@ class Engine:
             return False, "Invalid break type"
 
         # Update planned end time
-        self.state["planned_end_time"] = self.state["start_time"] + (new_duration * 60)
-        self.state["planned_duration_minutes"] = new_duration
-        self._save_state()
+        with self.transition():
+            planned_end = self.state["start_time"] + (new_duration * 60)
+            self.state["planned_end_time"] = planned_end
+            self.state["planned_duration_minutes"] = new_duration
+            self._save_state()
+            self._emit(
+                "break_switched",
+                {
+                    "break_type": break_type,
+                    "planned_end_time": planned_end,
+                    "planned_duration_minutes": new_duration,
+                },
+            )
 
         return True, f"Switched to {break_type} break"
 
+    def _start_bonus(self, auto: bool):
+        """Move into bonus time (`auto`: the engine did it, not the user)."""
+        with self.transition():
+            self.state["session_state"] = SessionState.RUNNING_BONUS
+            self._save_state()
+            self._emit(
+                "bonus_started",
+                {"session_type": self.state["session_type"], "auto": auto},
+            )
+
     def get_recommended_break_type(self) -> str:
         """Get recommended break type based on streak."""
         streak = self.db.calculate_current_streak()
@@ -294,11 +548,13 @@ class Engine:
 
     def tick(self):
         """Main engine tick - called periodically to check timers."""
+        if self.state_dirty:
+            self._save_state()
         self._check_midnight_reset()
         self.config = Config(self.db)  # Reload config
 
         if self.state["session_state"] == SessionState.RUNNING:
-            now = time.time()
+            now = self.clock.time()
 
             # Check if planned time reached
             if now >= self.state["planned_end_time"]:
@@ -312,26 +568,34 @@ class Engine:
                 if session_type == SessionType.BREAK:
                     # Breaks skip decision window, go straight to overtime
                     # User must manually quit
-                    self.state["session_state"] = SessionState.RUNNING_BONUS
-                    self._save_state()
+                    self._start_bonus(auto=True)
                 elif not self.config.work_overtime_enabled:
                     # Work session with overtime disabled - end immediately
                     self.quit_session()
                 else:
                     # Work session - enter decision window
-                    self.state["session_state"] = SessionState.AWAITING_DECISION
-                    self.state["decision_window_start"] = now
-                    self._save_state()
+                    window = self.config.work_decision_minutes * 60
+                    with self.transition():
+                        self.state["session_state"] = SessionState.AWAITING_DECISION
+                        self.state["decision_window_start"] = now
+                        self._save_state()
+                        self._emit(
+                            "decision_window",
+                            {
+                                "session_type": session_type,
+                                "decision_window_start": now,
+                                "decision_window_end": now + window,
+                            },
+                        )
 
         elif self.state["session_state"] == SessionState.AWAITING_DECISION:
-            now = time.time()
+            now = self.clock.time()
             decision_window = self.config.work_decision_minutes * 60
 
             # Check if decision window expired
             if now - self.state["decision_window_start"] >= decision_window:
                 # Auto-continue into bonus time
-                self.state["session_state"] = SessionState.RUNNING_BONUS
-                self._save_state()
+                self._start_bonus(auto=True)
 
         elif self.state["session_state"] == SessionState.RUNNING_BONUS:
             # Breaks stay in RUNNING_BONUS until user manually quits
@@ -339,42 +603,257 @@ class Engine:
             if self.state["session_type"] == SessionType.WORK:
                 overtime_max = self.config.work_overtime_max_minutes
                 if overtime_max > 0:
-                    now = time.time()
+                    now = self.clock.time()
                     overtime_minutes = (now - self.state["planned_end_time"]) / 60
                     if overtime_minutes >= overtime_max:
                         self.quit_session()
 
     def process_commands(self):
-        """Process pending commands from CLI."""
-        commands = self.db.get_pending_commands()
-
+        """Process pending commands from CLI.
+
+        Pending commands are claimed in one statement, handled in order,
+        and marked done in the same unit of work as their effects (one
+        commit for the whole burst). A command identical to the one just
+        before it (key mashing) is coalesced when that one changed nothing:
+        from the same state it would fail the same way, so it is given that
+        result. A repeat of a command that did change something runs for
+        its own outcome (the second of two quits has no session).
+
+        A command that raises (e.g. malformed arguments) is undone on its
+        own and finished with a failed result; the rest of the burst still
+        commits. Each result ({"ok", "message"}) is stored with its command
+        for clients waiting on it.
+        """
+        commands = self.claimed_commands + self.db.claim_commands()
+        if not commands:
+            return
+        self.claimed_commands = commands
+
+        coalesced = 0
+        results: List[Dict[str, Any]] = []
+        with self.transition():
+            previous = None  # The last command, if it changed nothing
+            for cmd in commands:
+                key = (cmd["command"], cmd["args"])
+                if key == previous:
+                    coalesced += 1
+                    results.append({**results[-1], "coalesced": True})
+                    continue
+                writes = len(self.store.writes)
+                ok, message = self._run_command(*key)
+                results.append({"ok": ok, "message": message})
+                previous = key if len(self.store.writes) == writes else None
+
+            self.store.mark_commands_processed([cmd["id"] for cmd in commands], results)
+
+        self.claimed_commands = []
+        self.coalesced_commands += coalesced
+        now = self.clock.time()
         for cmd in commands:
-            command = cmd["command"]
-            args = json.loads(cmd["args"]) if cmd["args"] else {}
-
+            self.metrics.command_latency.observe(max(0.0, now - cmd["created_at"]))
+
+    def _run_command(self, command: str, args_json: Optional[str]) -> tuple:
+        """Handle one claimed command inside process_commands' transition.
+
+        If it raises, its state changes and queued writes are taken back
+        and it fails alone. A locked database still propagates, so the
+        whole burst is retried.
+        """
+        state, saved_state, dirty = (
+            dict(self.state),
+            self.saved_state,
+            self.state_dirty,
+        )
+        marks = (
+            len(self.store.writes),
+            len(self.logged_sessions),
+            len(self.emitted_events),
+        )
+        try:
+            args = json.loads(args_json) if args_json else {}
             if command == "start_session":
-                self.start_session(args["session_type"], args["duration_minutes"])
+                return self.start_session(
+                    args["session_type"],
+                    args["duration_minutes"],
+                    args.get("tags"),
+                )
             elif command == "quit_session":
-                self.quit_session()
+                return self.quit_session()
             elif command == "continue_session":
-                self.continue_session()
+                return self.continue_session()
             elif command == "switch_break":
-                self.switch_break_type(args["break_type"])
-
-            self.db.mark_command_processed(cmd["id"])
+                return self.switch_break_type(args["break_type"])
+            elif command == "tag_session":
+                return self.tag_session(args["tags"])
+            return False, f"Unknown command: {command}"
+        except Exception as e:
+            if is_busy_error(e):
+                raise
+            self.state.clear()
+            self.state.update(state)
+            self.saved_state, self.state_dirty = saved_state, dirty
+            del self.store.writes[marks[0] :]
+            del self.logged_sessions[marks[1] :]
+            del self.emitted_events[marks[2] :]
+            print(f"Engine error: {command} failed: {e!r}")
+            return False, f"Command failed: {e!r}"
 
     def run(self):
-        """Main engine loop."""
+        """Main engine loop.
+
+        Each iteration's writes are committed together by a writer thread
+        while the loop sleeps (see persistence.py), and the next iteration
+        waits for that commit before it reads commands again.
+        """
         print("Lockin engine started")
+        self.writer = PersistenceWriter(self.db)
+        self.writer.start()
+        self.store = self.writer
+        self.hooks = HookRunner(
+            self.db.db_path.parent / "hooks",
+            workers=self.config.hook_workers,
+            timeout=self.config.hook_timeout_seconds,
+        )
+        api = self._start_api()
 
-        while True:
+        try:
+            while True:
+                try:
+                    self.writer.wait()
+                    if self.resync:
+                        self._resync()
+                    started = time.perf_counter()
+                    self.tick()
+                    self.process_commands()
+                    self.metrics.tick_seconds.observe(time.perf_counter() - started)
+                    self.writer.commit()
+                    self._write_metrics_textfile()
+                    self.clock.sleep(1)  # Tick every second
+                except KeyboardInterrupt:
+                    print("\nLockin engine stopped")
+                    break
+                except BatchFailed as e:
+                    print(f"Engine error: {e}")
+                    self.resync = True
+                    self.clock.sleep(5)  # Back off on errors
+                except sqlite3.OperationalError as e:
+                    if not is_busy_error(e):
+                        print(f"Engine error: {e}")
+                        self.clock.sleep(5)  # Back off on errors
+                        continue
+                    # Still locked after retries: keep the 1s cadence and
+                    # pick up where we left off (the writer retries its
+                    # batch, unprocessed commands are retried next tick)
+                    self.busy_ticks += 1
+                    self.clock.sleep(1)
+                except Exception as e:
+                    print(f"Engine error: {e}")
+                    self.clock.sleep(5)  # Back off on errors
+        finally:
+            if api:
+                api.stop()
+            self.store = self.db
             try:
-                self.tick()
-                self.process_commands()
-                time.sleep(1)  # Tick every second
-            except KeyboardInterrupt:
-                print("\nLockin engine stopped")
-                break
+                # Hooks stay up until the last batch's callbacks have run
+                self.writer.close(timeout=10)
             except Exception as e:
-                print(f"Engine error: {e}")
-                time.sleep(5)  # Back off on errors
+                print(f"Engine error: unsaved writes on shutdown: {e}")
+            self.hooks.close()
+            self.hooks = None
+
+    def _resync(self):
+        """Roll memory back to the database after the writer dropped a batch.
+
+        The state is reloaded as last committed and the commands the batch
+        would have finished go back to pending, so they run again against
+        the state they first saw and redo the lost writes.
+        """
+        self.db.release_claimed_commands()
+        self.state.clear()
+        self.state.update(self._load_state())
+        self.saved_state = None  # The next save writes every field
+        self.state_dirty = False
+        self.resync = False
+
+    def _start_api(self) -> Optional[ApiServer]:
+        """Start the local HTTP API if api_port is set (it runs on its own
+        threads, so requests never delay a tick)."""
+        port = self.config.api_port
+        if not port:
+            return None
+        try:
+            api = ApiServer(
+                self.db.db_path, port, clock=self.clock, metrics=self.render_metrics
+            )
+        except OSError as e:
+            print(f"API disabled: cannot listen on 127.0.0.1:{port}: {e}")
+            return None
+        api.start()
+        print(f"API listening on http://127.0.0.1:{api.port}")
+        return api
+
+    def render_metrics(self) -> str:
+        """OpenMetrics exposition of the engine, from memory only."""
+        return self.metrics.render(dict(self.state), self.clock.time(), self.db)
+
+    def _write_metrics_textfile(self):
+        """Rewrite metrics_textfile every METRICS_TEXTFILE_INTERVAL seconds."""
+        now = self.clock.time()
+        if (
+            self.metrics_written_at is not None
+            and now - self.metrics_written_at < METRICS_TEXTFILE_INTERVAL
+        ):
+            return
+        self.metrics_written_at = now
+        path = self.config.metrics_textfile
+        if path is None:
+            return
+        try:
+            write_textfile(path, self.render_metrics())
+        except OSError as e:
+            print(f"Engine error: cannot write metrics to {path}: {e}")
+
+    def next_deadline(self) -> Optional[float]:
+        """When tick() will next change state on its own, or None if it won't."""
+        session_state = self.state["session_state"]
+        if session_state == SessionState.RUNNING:
+            return self.state["planned_end_time"]
+        if session_state == SessionState.AWAITING_DECISION:
+            window = self.config.work_decision_minutes * 60
+            return self.state["decision_window_start"] + window
+        if (
+            session_state == SessionState.RUNNING_BONUS
+            and self.state["session_type"] == SessionType.WORK
+            and self.config.work_overtime_max_minutes > 0
+        ):
+            overtime_max = self.config.work_overtime_max_minutes * 60
+            return self.state["planned_end_time"] + overtime_max
+        return None
+
+    def run_for(
+        self, seconds: float, interval: float = 1.0, fast_forward: bool = False
+    ) -> int:
+        """Run the engine loop for `seconds` of clock time; returns ticks run.
+
+        With a SimulatedClock the sleeps just advance the clock, so hours
+        of sessions play out as fast as the loop body runs. fast_forward
+        also skips the ticks where nothing can happen, sleeping straight to
+        the first tick at or after next_deadline(). The resulting states and
+        timestamps are the same as ticking every interval, provided nothing
+        else queues commands during the run.
+        """
+        end = self.clock.time() + seconds
+        ticks = 0
+        while self.clock.time() < end:
+            self.tick()
+            self.process_commands()
+            ticks += 1
+
+            wait = interval
+            if fast_forward:
+                now = self.clock.time()
+                deadline = self.next_deadline()
+                target = end if deadline is None else min(deadline, end)
+                wait = max(1, math.ceil((target - now) / interval)) * interval
+            self.clock.sleep(wait)
+        return ticks
@@ -0,0 +1,19 @@
+"""Plain-text formatting helpers shared by the Rich UI and the status line."""
+
+
+def format_duration(minutes: float) -> str:
+    """Format duration in minutes to human readable."""
+    if minutes < 60:
+        return f"{int(minutes)}m"
+    hours = int(minutes // 60)
+    mins = int(minutes % 60)
+    if mins == 0:
+        return f"{hours}h"
+    return f"{hours}h {mins}m"
+
+
+def format_time_remaining(seconds: float) -> str:
+    """Format seconds remaining as MM:SS."""
+    minutes = int(seconds // 60)
+    secs = int(seconds % 60)
+    return f"{minutes:02d}:{secs:02d}"
@@ -0,0 +1,194 @@
+"""User hooks, run by the engine when something happens.
+
+Two kinds of hook, both optional:
+
+- **Executables** in ``~/.lockin/hooks/`` named after the event, alone or
+  with a suffix (``session_completed``, ``session_completed.sh``). Each gets
+  the event as JSON on stdin and its type in ``$LOCKIN_EVENT``.
+- **Python callables** registered under the ``lockin.hooks`` entry point
+  group, named after the event (or ``*`` for every event), and called with
+  the event dict.
+
+Events are the engine's change feed events (see watch.py) plus
+``session_completed``, ``break_over`` and ``streak_milestone`` (a long
+break earned). An event is ``{"type", "time", "data"}``.
+
+The engine only queues hooks (microseconds); they run on a small thread
+pool (``hook_workers``), each on its own, after the change has been made.
+A hook that fails is reported and doesn't affect the others. One that
+runs past ``hook_timeout_seconds`` is killed (executables) or abandoned
+to finish on its own thread (callables), so the pool stays available.
+If too many hooks are already waiting, new ones are dropped.
+macOS notifications go through the same pool.
+"""
+
+import json
+import os
+import signal
+import subprocess
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .database import EVENT_TYPES
+
+ENTRY_POINT_GROUP = "lockin.hooks"
+HOOK_EVENTS = EVENT_TYPES + ("session_completed", "break_over", "streak_milestone")
+MAX_PENDING = 64  # Hooks waiting or running before new ones are dropped
+
+HookCallables = Dict[str, List[Tuple[str, Callable[[Dict[str, Any]], Any]]]]
+
+
+class HookTimeout(Exception):
+    """A Python hook ran past the timeout."""
+
+
+def load_entry_point_hooks() -> HookCallables:
+    """Callables registered under ENTRY_POINT_GROUP, by event name."""
+    from importlib.metadata import entry_points
+
+    try:
+        found = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:  # Python 3.9
+        found = entry_points().get(ENTRY_POINT_GROUP, [])
+
+    hooks: HookCallables = {}
+    for entry_point in found:
+        try:
+            hook = entry_point.load()
+        except Exception as e:
+            print(f"Hook {entry_point.value} not loaded: {type(e).__name__}: {e}")
+            continue
+        hooks.setdefault(entry_point.name, []).append((entry_point.value, hook))
+    return hooks
+
+
+class HookRunner:
+    """Runs hooks on a bounded worker pool, off the engine loop.
+
+    `callables` defaults to the installed entry points. `outcomes` counts
+    hook runs by outcome: ok, failed, timed_out and dropped.
+    """
+
+    def __init__(
+        self,
+        hooks_dir: Path,
+        workers: int = 2,
+        timeout: float = 10.0,
+        callables: Optional[HookCallables] = None,
+        max_pending: int = MAX_PENDING,
+    ):
+        self.hooks_dir = hooks_dir
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.callables = load_entry_point_hooks() if callables is None else callables
+        self.pending = 0
+        self.outcomes: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="lockin-hook")
+
+    def close(self):
+        """Wait for the hooks already queued (each is bounded by the timeout)."""
+        self._executor.shutdown(wait=True)
+
+    def scripts(self, event_type: str) -> List[Path]:
+        """Executables in hooks_dir for an event."""
+        try:
+            entries = sorted(os.scandir(self.hooks_dir), key=lambda e: e.name)
+        except FileNotFoundError:
+            return []
+        return [
+            Path(entry.path)
+            for entry in entries
+            if entry.name.split(".", 1)[0] == event_type
+            and entry.is_file()
+            and os.access(entry.path, os.X_OK)
+        ]
+
+    def dispatch(self, event_type: str, data: Dict[str, Any], time: float):
+        """Queue every hook for an event."""
+        event = {"type": event_type, "time": time, "data": data}
+        scripts = self.scripts(event_type)
+        if scripts:
+            stdin = json.dumps(event)
+            env = {**os.environ, "LOCKIN_EVENT": event_type}
+        for script in scripts:
+            self.submit(script.name, self.run_command, [str(script)], stdin, env)
+        for name in (event_type, "*"):
+            for label, hook in self.callables.get(name, []):
+                self.submit(label, self.call, hook, event)
+
+    def submit(self, name: str, fn: Callable[..., Any], *args: Any) -> bool:
+        """Queue fn(*args) on the pool; False if dropped (pool backed up)."""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.outcomes["dropped"] += 1
+                print(f"Hook {name} dropped: {self.pending} hooks already queued")
+                return False
+            self.pending += 1
+        self._executor.submit(self._run, name, fn, args)
+        return True
+
+    def _run(self, name: str, fn: Callable[..., Any], args: tuple):
+        outcome = "failed"
+        try:
+            fn(*args)
+            outcome = "ok"
+        except (subprocess.TimeoutExpired, HookTimeout):
+            outcome = "timed_out"
+            print(f"Hook {name} timed out after {self.timeout:g}s")
+        except subprocess.CalledProcessError as e:
+            detail = (e.stderr or "").strip().splitlines()[-1:] or [""]
+            print(f"Hook {name} failed (exit {e.returncode}) {detail[0]}".rstrip())
+        except Exception as e:
+            print(f"Hook {name} failed: {type(e).__name__}: {e}")
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.outcomes[outcome] += 1
+
+    def run_command(
+        self, argv: List[str], stdin: str = "", env: Optional[Dict[str, str]] = None
+    ):
+        """Run an external command, killed (with its children) after the timeout."""
+        with subprocess.Popen(
+            argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            env=env,
+            text=True,
+            start_new_session=True,  # Its own process group, to kill as one
+        ) as process:
+            try:
+                _, stderr = process.communicate(stdin, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.communicate()
+                raise
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, argv, stderr=stderr)
+
+    def call(self, hook: Callable[[Dict[str, Any]], Any], event: Dict[str, Any]):
+        """Call a Python hook, giving up on it after the timeout.
+
+        Threads can't be killed: an overrunning hook is left to finish on
+        its own daemon thread, and its worker moves on.
+        """
+        error: List[BaseException] = []
+
+        def target():
+            try:
+                hook(event)
+            except BaseException as e:
+                error.append(e)
+
+        thread = threading.Thread(target=target, name="lockin-hook-call", daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            raise HookTimeout
+        if error:
+            raise error[0]
@@ -0,0 +1,242 @@
+"""OpenMetrics exposition of the engine's state, today's focus and internals.
+
+Everything here is kept in engine memory: today's sessions are loaded
+once per day (when the engine starts and when the date changes) and then
+counted as the engine logs them, and the engine's own timings are counted
+as they happen. Rendering reads only memory, so a scrape every few seconds
+costs no queries, let alone a scan of ``sessions``.
+
+Sessions deleted with ``lockin delete`` drop out of today's numbers at the
+next engine restart or the next day.
+
+Served at ``/metrics`` by the local API (``api_port``) and/or written to a
+file for node_exporter's textfile collector (``metrics_textfile``).
+"""
+
+import bisect
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .database import (
+    Database,
+    STREAK_END_TIMES_SQL,
+    TODAYS_STATS_SQL,
+    streak_from_end_times,
+    today_start_timestamp,
+)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+SESSION_STATES = ("idle", "running", "awaiting_decision", "running_bonus", "ended")
+SESSION_TYPES = ("work", "break")
+
+# Bucket upper bounds, in seconds
+TICK_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COMMAND_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values."""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def samples(self, name: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{name}_count {self.count}")
+        lines.append(f"{name}_sum {self.sum!r}")
+        return lines
+
+
+class EngineMetrics:
+    """Counters the engine keeps for the OpenMetrics exposition."""
+
+    def __init__(self):
+        self.day_start = 0.0
+        # (session_type, state) -> [count, minutes], for sessions started today
+        self.today: Dict[Tuple[str, str], List[float]] = {}
+        self.work_end_times: List[float] = []  # Completed work today, ascending
+        self.tick_seconds = Histogram(TICK_BUCKETS)
+        self.command_latency = Histogram(COMMAND_LATENCY_BUCKETS)
+
+    def load_day(self, db: Database, now: float):
+        """Read today's sessions from the database (once per day)."""
+        day_start = today_start_timestamp(now)
+        with db.connection() as conn:
+            rows = conn.execute(TODAYS_STATS_SQL, (day_start,)).fetchall()
+            end_times = [
+                row["end_time"]
+                for row in conn.execute(STREAK_END_TIMES_SQL, (day_start,))
+            ]
+        self.day_start = day_start
+        self.today = {
+            (row["session_type"], row["state"]): [
+                row["count"],
+                row["total_minutes"] or 0,
+            ]
+            for row in rows
+        }
+        self.work_end_times = end_times
+
+    def session_logged(
+        self,
+        session_type: str,
+        state: str,
+        start_time: float,
+        end_time: float,
+        minutes: float,
+    ):
+        """Count a session the engine has just logged."""
+        if start_time < self.day_start:
+            return  # Started yesterday: not in today's stats
+        entry = self.today.setdefault((session_type, state), [0, 0.0])
+        entry[0] += 1
+        entry[1] += minutes
+        if session_type == "work" and state == "completed":
+            bisect.insort(self.work_end_times, end_time)
+
+    def render(self, state: Dict[str, Any], now: float, db: Database) -> str:
+        """The exposition text for an engine state at `now`.
+
+        `db` supplies its in-memory counters only.
+        """
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str, samples: List[str]):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"# HELP {name} {help_text}")
+            lines.extend(samples)
+
+        session_state = state.get("session_state") or "idle"
+        session_type = state.get("session_type")
+        family(
+            "lockin_session_state",
+            "stateset",
+            "Current session state.",
+            [
+                f'lockin_session_state{{lockin_session_state="{s}"}} '
+                f"{int(s == session_state)}"
+                for s in SESSION_STATES
+            ],
+        )
+        family(
+            "lockin_session_type",
+            "stateset",
+            "Type of the current session (none when idle).",
+            [
+                f'lockin_session_type{{lockin_session_type="{t}"}} '
+                f"{int(t == session_type)}"
+                for t in SESSION_TYPES
+            ],
+        )
+
+        remaining = elapsed = 0.0
+        if session_state != "idle" and state.get("start_time") is not None:
+            elapsed = now - state["start_time"]
+            remaining = max(0.0, state["planned_end_time"] - now)
+        family(
+            "lockin_session_remaining_seconds",
+            "gauge",
+            "Seconds until the current session's planned end.",
+            [f"lockin_session_remaining_seconds {remaining!r}"],
+        )
+        family(
+            "lockin_session_elapsed_seconds",
+            "gauge",
+            "Seconds since the current session started.",
+            [f"lockin_session_elapsed_seconds {elapsed!r}"],
+        )
+
+        today = sorted(self.today.items())
+        focused = sum(minutes for (kind, _), (_, minutes) in today if kind == "work")
+        family(
+            "lockin_today_focused_minutes",
+            "gauge",
+            "Minutes of logged work today.",
+            [f"lockin_today_focused_minutes {float(focused)!r}"],
+        )
+        family(
+            "lockin_today_sessions",
+            "gauge",
+            "Sessions logged today by type and state.",
+            [
+                f'lockin_today_sessions{{type="{kind}",state="{s}"}} {int(count)}'
+                for (kind, s), (count, _) in today
+            ],
+        )
+        family(
+            "lockin_streak",
+            "gauge",
+            "Completed work sessions in the current streak.",
+            [f"lockin_streak {streak_from_end_times(self.work_end_times, now)}"],
+        )
+
+        family(
+            "lockin_engine_tick_seconds",
+            "histogram",
+            "Time spent in each engine loop iteration (tick and commands).",
+            self.tick_seconds.samples("lockin_engine_tick_seconds"),
+        )
+        family(
+            "lockin_command_latency_seconds",
+            "histogram",
+            "Time from a command being queued to the engine handling it.",
+            self.command_latency.samples("lockin_command_latency_seconds"),
+        )
+
+        # Snapshots: the engine and writer threads update these mid-scrape
+        timings = sorted(db.get_timing_metrics().items())
+        family(
+            "lockin_db_op_seconds",
+            "summary",
+            "Time spent in database write operations, retries included.",
+            [
+                f'lockin_db_op_seconds_{suffix}{{op="{op}"}} {value!r}'
+                for op, stats in timings
+                for suffix, value in (
+                    ("count", stats["calls"]),
+                    ("sum", stats["seconds"]),
+                )
+            ],
+        )
+        family(
+            "lockin_db_retries",
+            "counter",
+            "Database write attempts retried on a locked database.",
+            [
+                f'lockin_db_retries_total{{op="{op}"}} {stats["retries"]}'
+                for op, stats in sorted(db.get_contention_metrics().items())
+            ],
+        )
+        family(
+            "lockin_db_commits",
+            "counter",
+            "Transactions committed by the engine.",
+            [f"lockin_db_commits_total {db.commits}"],
+        )
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: Path, text: str):
+    """Replace `path` with `text` atomically, so collectors never see half."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
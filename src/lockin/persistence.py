@@ -0,0 +1,163 @@
+"""Write-behind persistence for the engine loop.
+
+:class:`PersistenceWriter` stands in for the engine's :class:`Database`
+writes (same method names). Writes made during one loop iteration are
+collected in order, handed to a writer thread by :meth:`commit`, and
+applied there as a single transaction while the engine sleeps.
+
+Guarantees:
+
+- **Order.** Writes commit in the order they were made, within and across
+  iterations. A batch that hits a locked database is retried, ahead of
+  anything newer, until it commits.
+- **Atomicity.** A batch commits entirely or not at all.
+- **Callbacks.** :meth:`after_commit` callbacks run on the writer thread
+  once their batch has committed, in order, before :meth:`wait` returns.
+  A dropped batch drops its callbacks too.
+- **Durability.** A write is in the database once the :meth:`wait` that
+  follows its :meth:`commit` returns (``synchronous=NORMAL`` in WAL mode:
+  an OS crash may still lose the last commits, never corrupt the file).
+  Until then, readers (including the engine's own reads) don't see it,
+  so the engine waits before each iteration reads commands again.
+- **Errors.** Any error from the writer thread is re-raised by the next
+  :meth:`wait`. A batch that fails for any reason other than a locked
+  database can never succeed and is dropped; :meth:`wait` then raises
+  :class:`BatchFailed` so the engine can reload its state as last
+  committed and re-run the commands the batch would have finished.
+"""
+
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, List, Optional, Tuple
+
+from .database import Database, UnitOfWork, is_busy_error
+
+
+class BatchFailed(Exception):
+    """A batch failed for a reason other than a lock and was dropped.
+
+    None of its writes reached the database; `error` is what failed.
+    """
+
+    def __init__(self, error: Exception):
+        super().__init__(f"Writes dropped: {error}")
+        self.error = error
+
+
+class PersistenceWriter(UnitOfWork):
+    """Group-commits the engine's writes on a background thread.
+
+    The inherited write methods add to the current iteration's batch.
+    """
+
+    def __init__(self, db: Database):
+        super().__init__()
+        self.db = db
+        self.commits = 0  # Transactions committed by the writer thread
+        self.written = 0  # Writes those transactions contained
+        self.callbacks: List[Callable[[], None]] = []  # Run once committed
+        # (writes, callbacks) batches waiting for the thread
+        self._handed: Deque[Tuple[List[tuple], List[Callable[[], None]]]] = deque()
+        self._error: Optional[Exception] = None
+        self._stalled = False  # Head batch hit a lock; retry on next wait()
+        self._closing = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="lockin-writer", daemon=True
+        )
+
+    @contextmanager
+    def unit_of_work(self):
+        """Like Database.unit_of_work, but the writes join the current batch."""
+        uow = UnitOfWork()
+        yield uow
+        self.writes.extend(uow.writes)
+
+    def after_commit(self, callback: Callable[[], None]):
+        """Call `callback` once the current iteration's batch has committed."""
+        self.callbacks.append(callback)
+
+    # Lifecycle
+
+    def start(self):
+        self._thread.start()
+
+    def commit(self):
+        """Hand this iteration's writes to the writer thread as one batch."""
+        if not self.writes and not self.callbacks:
+            return
+        with self._cond:
+            self._handed.append((self.writes, self.callbacks))
+            self._cond.notify_all()
+        self.writes, self.callbacks = [], []
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything handed over has committed.
+
+        Returns False on timeout, and re-raises the writer thread's last
+        error (a stalled batch is then retried in the background).
+        """
+        with self._cond:
+            if self._stalled:
+                self._stalled = False
+                self._cond.notify_all()
+            done = self._cond.wait_for(
+                lambda: not self._handed or self._error is not None, timeout
+            )
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+            return done
+
+    def close(self, timeout: Optional[float] = None):
+        """Commit what's left, then stop the thread."""
+        self.commit()
+        try:
+            self.wait(timeout)
+        finally:
+            with self._cond:
+                self._closing = True
+                self._cond.notify_all()
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: (self._handed and not self._stalled) or self._closing
+                )
+                if self._closing and (self._stalled or not self._handed):
+                    return
+                # Everything handed over so far goes in one transaction
+                count = len(self._handed)
+                writes = [write for batch, _ in self._handed for write in batch]
+                callbacks = [fn for _, fns in self._handed for fn in fns]
+
+            try:
+                if writes:
+                    self.db.write_batch(writes)
+            except Exception as e:
+                with self._cond:
+                    self._error = e
+                    if is_busy_error(e):
+                        self._stalled = True
+                    else:
+                        self._error = BatchFailed(e)
+                        for _ in range(count):
+                            self._handed.popleft()
+                    self._cond.notify_all()
+                continue
+
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"After-commit callback failed: {e}")
+
+            with self._cond:
+                for _ in range(count):
+                    self._handed.popleft()
+                self.commits += 1
+                self.written += len(writes)
+                self._cond.notify_all()
@@ -0,0 +1,196 @@
+"""Machine-readable status line for shell prompts and status bars.
+
+``lockin status`` is polled every second by tmux, polybar, starship and
+friends, so this module deliberately stays off the normal CLI path: it never
+imports Rich, never constructs a :class:`~lockin.database.Database` (which
+would run schema initialisation), and never shells out to ``launchctl``. It
+opens the database read-only, runs two indexed queries and exits.
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .database import (
+    ENGINE_STATE_SQL,
+    STREAK_END_TIMES_SQL,
+    TODAYS_STATS_SQL,
+    engine_state_from_row,
+    streak_from_end_times,
+    summarize_todays_stats,
+    today_start_timestamp,
+)
+from .formatting import format_duration, format_time_remaining
+
+DEFAULT_DECISION_MINUTES = 3
+
+TEMPLATE_FIELDS = (
+    "state",
+    "type",
+    "timer",
+    "remaining",
+    "elapsed",
+    "focused",
+    "focused_minutes",
+    "sessions",
+    "streak",
+)
+
+
+def _connect_readonly(db_path: Path) -> Optional[sqlite3.Connection]:
+    """Open the database read-only, or return None if it does not exist yet."""
+    if not db_path.exists():
+        return None
+    return sqlite3.connect(f"{db_path.as_uri()}?mode=ro", uri=True)
+
+
+def _timer(state: Dict[str, Any], decision_minutes: float, now: float):
+    """Return (remaining_seconds, label) the same way the session view does."""
+    session_state = state.get("session_state")
+    if session_state == "running":
+        return max(0, state["planned_end_time"] - now), "remaining"
+    if session_state == "awaiting_decision":
+        window = decision_minutes * 60
+        return max(0, window - (now - state["decision_window_start"])), "to decide"
+    # running_bonus counts up past the planned end
+    return now - state["planned_end_time"], "bonus time"
+
+
+def _read_engine_state(conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+    """Engine state from its columns, or the JSON blob of an older schema.
+
+    status never migrates the database, so until the engine or the CLI has
+    opened it once after an upgrade, engine_state still has current_state.
+    """
+    try:
+        return engine_state_from_row(conn.execute(ENGINE_STATE_SQL).fetchone())
+    except sqlite3.OperationalError as e:
+        if "no such column" not in str(e):
+            raise
+    row = conn.execute("SELECT current_state FROM engine_state WHERE id = 1").fetchone()
+    return json.loads(row[0]) if row and row[0] else None
+
+
+def read_status(db_path: Path, now: Optional[float] = None) -> Dict[str, Any]:
+    """Read engine state and today's totals without touching the schema."""
+    now = time.time() if now is None else now
+    status = {
+        "state": "idle",
+        "type": None,
+        "remaining_seconds": None,
+        "elapsed_seconds": None,
+        "timer": "",
+        "timer_label": None,
+        "planned_minutes": None,
+        "today_focused_minutes": 0,
+        "today_break_minutes": 0,
+        "today_sessions": 0,
+        "streak": 0,
+    }
+
+    conn = _connect_readonly(db_path)
+    if conn is None:
+        return status
+
+    try:
+        state = _read_engine_state(conn)
+
+        if state and state.get("session_state") not in (None, "idle", "ended"):
+            row = conn.execute(
+                "SELECT value FROM config WHERE key = 'work_decision_minutes'"
+            ).fetchone()
+            decision_minutes = float(row[0]) if row else DEFAULT_DECISION_MINUTES
+            remaining, label = _timer(state, decision_minutes, now)
+            timer = format_time_remaining(remaining)
+            status.update(
+                {
+                    "state": state["session_state"],
+                    "type": state.get("session_type"),
+                    "remaining_seconds": round(remaining, 1),
+                    "elapsed_seconds": round(now - state["start_time"], 1),
+                    "timer": f"+{timer}" if label == "bonus time" else timer,
+                    "timer_label": label,
+                    "planned_minutes": state.get("planned_duration_minutes"),
+                }
+            )
+
+        today_start = today_start_timestamp(now)
+        stats = summarize_todays_stats(
+            conn.execute(TODAYS_STATS_SQL, (today_start,)).fetchall()
+        )
+        end_times = [r[0] for r in conn.execute(STREAK_END_TIMES_SQL, (today_start,))]
+    except sqlite3.OperationalError:
+        # Tables not created yet (engine never ran) - report idle.
+        return status
+    finally:
+        conn.close()
+
+    status.update(
+        {
+            "today_focused_minutes": round(stats["total_work_minutes"], 1),
+            "today_break_minutes": round(stats["total_break_minutes"], 1),
+            "today_sessions": stats["session_count"],
+            "streak": streak_from_end_times(end_times, now),
+        }
+    )
+    return status
+
+
+def format_status(
+    status: Dict[str, Any], fmt: str = "plain", template: Optional[str] = None
+) -> str:
+    """Render a status dict as json, a short plain line, or a user template."""
+    if fmt == "json":
+        return json.dumps(status, separators=(",", ":"))
+
+    if fmt == "template":
+        fields = {
+            "state": status["state"],
+            "type": status["type"] or "",
+            "timer": status["timer"],
+            "remaining": status["remaining_seconds"] or 0,
+            "elapsed": status["elapsed_seconds"] or 0,
+            "focused": format_duration(status["today_focused_minutes"]),
+            "focused_minutes": status["today_focused_minutes"],
+            "sessions": status["today_sessions"],
+            "streak": status["streak"],
+        }
+        return (template or "{type} {timer}").format(**fields)
+
+    if status["state"] == "idle":
+        return f"idle {format_duration(status['today_focused_minutes'])}"
+    return f"{status['type']} {status['timer']}"
+
+
+def main(argv: List[str], db_path: Path) -> int:
+    """Entry point for ``lockin status``."""
+    parser = argparse.ArgumentParser(
+        prog="lockin status",
+        description="Print the current session and today's totals for status bars",
+    )
+    parser.add_argument(
+        "--format",
+        dest="fmt",
+        choices=["json", "plain", "template"],
+        default="plain",
+        help="Output format (default: plain)",
+    )
+    parser.add_argument(
+        "--template",
+        help="str.format template used with --format template; fields: "
+        + ", ".join(TEMPLATE_FIELDS),
+    )
+    args = parser.parse_args(argv)
+
+    if args.template and args.fmt != "template":
+        args.fmt = "template"
+
+    try:
+        print(format_status(read_status(db_path), args.fmt, args.template))
+    except (KeyError, IndexError, ValueError) as e:
+        print(f"Invalid template: {e}")
+        return 2
+    return 0
@@ -0,0 +1,183 @@
+"""``lockin watch``: follow the engine's change feed.
+
+Every change (a session starting, the decision window opening, bonus time,
+a session being logged, discarded or deleted, a config change) is appended
+to the ``events`` table in the same transaction as the change itself, so
+the feed never shows something that didn't commit and never misses
+something that did. Event IDs only grow: the last ID a consumer has seen
+is a cursor it can resume from (``--since`` or ``--cursor-file``), for as
+long as the engine keeps the events (``EVENT_RETENTION_DAYS``).
+
+Following costs one ``PRAGMA data_version`` per poll on a kept-open
+connection; the events table is only queried when another connection has
+committed something.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional
+
+from .database import Database
+from .formatting import format_duration
+
+POLL_INTERVAL = 0.25  # Seconds between checks for new commits
+BATCH_SIZE = 500  # Events read per query
+
+
+def describe(event: Dict[str, Any]) -> str:
+    """One human-readable line for an event."""
+    data = event["data"]
+    kind = data.get("session_type", "")
+    when = datetime.fromtimestamp(event["time"]).strftime("%H:%M:%S")
+    event_type = event["type"]
+
+    tags = data.get("tags")
+    tagged = f" [{', '.join(tags)}]" if tags else ""
+
+    if event_type == "session_started":
+        text = f"{kind} session started ({data['planned_duration_minutes']}m){tagged}"
+    elif event_type == "decision_window":
+        text = f"{kind} session reached its planned end: continue or take a break"
+    elif event_type == "bonus_started":
+        text = f"{kind} bonus time started" + (" (auto)" if data["auto"] else "")
+    elif event_type == "break_switched":
+        text = (
+            f"switched to {data['break_type']} break "
+            f"({data['planned_duration_minutes']}m)"
+        )
+    elif event_type == "session_logged":
+        minutes = format_duration(data["actual_duration_minutes"])
+        text = (
+            f"{kind} session {data['state']} ({minutes}), "
+            f"logged as #{data['id']}{tagged}"
+        )
+    elif event_type == "session_discarded":
+        minutes = format_duration(data["actual_duration_minutes"])
+        text = f"{kind} session scrapped after {minutes} (not logged)"
+    elif event_type == "session_tagged":
+        text = f"{kind} session tagged {', '.join(tags)}" if tags else "tags cleared"
+    elif event_type == "session_deleted":
+        text = f"session #{data['id']} deleted ({kind}, {data['state']})"
+    elif event_type == "config_changed":
+        if data.get("reset"):
+            text = "config reset to defaults"
+        else:
+            text = f"config {data['key']} = {data['value']}"
+    else:
+        text = json.dumps(data)
+    return f"{when}  #{event['id']}  {text}"
+
+
+def read_cursor(path: Path) -> Optional[int]:
+    """The event ID saved in a cursor file, or None if there isn't one."""
+    try:
+        return int(path.read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_cursor(path: Path, event_id: int):
+    """Save a cursor atomically, so a crash never leaves half an ID."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(f"{event_id}\n")
+    os.replace(tmp, path)
+
+
+def follow_events(
+    db: Database,
+    after_id: int,
+    follow: bool = True,
+    poll_interval: float = POLL_INTERVAL,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield batches of events after `after_id`, in ID order.
+
+    Without `follow`, stops once caught up; otherwise waits for more,
+    querying only after something else has committed to the database.
+    """
+    data_version = None
+    while True:
+        with db.connection() as conn:
+            current = conn.execute("PRAGMA data_version").fetchone()[0]
+        if current != data_version:
+            data_version = current
+            while True:
+                events = db.get_events(after_id, BATCH_SIZE)
+                if not events:
+                    break
+                after_id = events[-1]["id"]
+                yield events
+                if len(events) < BATCH_SIZE:
+                    break
+        if not follow:
+            return
+        sleep(poll_interval)
+
+
+def write_events(events: List[Dict[str, Any]], out: IO[str], as_json: bool):
+    for event in events:
+        out.write(json.dumps(event) if as_json else describe(event))
+        out.write("\n")
+    out.flush()
+
+
+def main(argv: List[str], db_path: Path) -> int:
+    """Entry point for ``lockin watch``."""
+    parser = argparse.ArgumentParser(
+        prog="lockin watch", description="Stream session and config changes"
+    )
+    parser.add_argument(
+        "--json",
+        dest="as_json",
+        action="store_true",
+        help='One JSON object per line: {"id", "type", "time", "data"}',
+    )
+    parser.add_argument(
+        "--since",
+        type=int,
+        metavar="ID",
+        help="Start after this event ID (0 for every event kept)",
+    )
+    parser.add_argument(
+        "--cursor-file",
+        type=Path,
+        metavar="PATH",
+        help="Resume from the ID saved here, and save the last ID seen",
+    )
+    parser.add_argument(
+        "--no-follow",
+        dest="follow",
+        action="store_false",
+        help="Exit once caught up instead of waiting for more",
+    )
+    args = parser.parse_args(argv)
+
+    db = Database(db_path, keep_open=True)
+    first, last = db.get_event_range()
+    after_id = args.since
+    if after_id is None and args.cursor_file:
+        after_id = read_cursor(args.cursor_file)
+    if after_id is None:
+        after_id = last  # Only what happens from now on
+    elif after_id < first - 1:
+        print(
+            f"lockin watch: events {after_id + 1}-{first - 1} were pruned "
+            "and are missing from the stream",
+            file=sys.stderr,
+        )
+
+    try:
+        for events in follow_events(db, after_id, follow=args.follow):
+            write_events(events, sys.stdout, args.as_json)
+            if args.cursor_file:
+                write_cursor(args.cursor_file, events[-1]["id"])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+    return 0
@@ -0,0 +1,152 @@
+"""Tests for the engine's local HTTP API."""
+
+import json
+from datetime import datetime
+from http.client import HTTPConnection
+
+import pytest
+
+from lockin.api import ApiServer
+from lockin.clock import SimulatedClock
+from lockin.engine import Engine, SessionState
+
+
+@pytest.fixture
+def engine(tmp_path):
+    clock = SimulatedClock(datetime(2024, 3, 4, 9, 0).timestamp())
+    return Engine(tmp_path / "lockin.db", clock=clock, notifications=False)
+
+
+@pytest.fixture
+def conn(engine):
+    """One keep-alive connection to an API on a free port."""
+    server = ApiServer(engine.db.db_path, 0, clock=engine.clock)
+    server.start()
+    conn = HTTPConnection("127.0.0.1", server.port, timeout=5)
+    yield conn
+    conn.close()
+    server.stop()
+
+
+def request(conn, method, path, body=None, headers=None):
+    headers = dict(headers or {})
+    if body is not None:
+        headers.setdefault("Content-Type", "application/json")
+        body = json.dumps(body)
+    conn.request(method, path, body, headers)
+    response = conn.getresponse()
+    payload = response.read()
+    return response, json.loads(payload) if payload else None
+
+
+def test_state_is_tagged_by_version(engine, conn):
+    """Test /state answers 304 until the engine's state version changes."""
+    response, body = request(conn, "GET", "/state")
+    assert response.status == 200
+    assert body["state"] is None
+    etag = response.getheader("ETag")
+
+    response, body = request(conn, "GET", "/state", headers={"If-None-Match": etag})
+    assert response.status == 304 and body is None
+
+    engine.start_session("work", 25)
+    response, body = request(conn, "GET", "/state", headers={"If-None-Match": etag})
+    assert response.status == 200
+    assert body["state"]["session_state"] == SessionState.RUNNING
+    assert response.getheader("ETag") == f'"state-{body["version"]}"'
+
+
+def test_posted_commands_reach_the_engine(engine, conn):
+    """Test POST /commands queues a command the engine then processes."""
+    response, body = request(
+        conn,
+        "POST",
+        "/commands",
+        {
+            "command": "start_session",
+            "args": {"session_type": "work", "duration_minutes": 25},
+        },
+    )
+    assert response.status == 202
+    assert isinstance(body["id"], int)
+
+    engine.process_commands()
+    assert engine.state["session_state"] == SessionState.RUNNING
+
+    engine.clock.advance(30 * 60)
+    request(conn, "POST", "/commands", {"command": "quit_session"})
+    engine.process_commands()
+
+    response, body = request(conn, "GET", "/sessions?from=2024-03-04&type=work")
+    assert [s["state"] for s in body["sessions"]] == ["completed"]
+    response, body = request(conn, "GET", "/stats/today")
+    assert body["today"]["work_completed"] == 1
+    assert body["streak"] == 1
+
+
+@pytest.mark.parametrize(
+    "method, path, body, headers, status",
+    [
+        ("GET", "/nope", None, {}, 404),
+        ("GET", "/metrics", None, {}, 404),  # Only the engine's API has them
+        ("GET", "/commands", None, {}, 405),
+        ("POST", "/commands", {"command": "rm -rf"}, {}, 400),
+        ("POST", "/commands", {"command": "switch_break"}, {}, 400),
+        (
+            "POST",
+            "/commands",
+            {"command": "quit_session"},
+            {"Content-Type": "text/plain"},
+            415,
+        ),
+        ("GET", "/state", None, {"Host": "evil.example:80"}, 403),
+        ("GET", "/sessions?from=yesterday", None, {}, 400),
+    ],
+)
+def test_bad_requests_are_rejected(engine, conn, method, path, body, headers, status):
+    """Test bad requests get an error and queue nothing."""
+    response, payload = request(conn, method, path, body, headers)
+    assert response.status == status
+    assert "error" in payload
+    assert engine.db.get_pending_commands() == []
+
+
+@pytest.mark.parametrize(
+    "headers, body, status",
+    [
+        ({"Content-Type": "text/plain"}, b'{"command": "quit_session"}', 415),
+        ({"Content-Type": "application/json"}, b"x" * 70_000, 413),
+        ({"Content-Type": "application/json", "Content-Length": "abc"}, None, 400),
+        ({"Content-Type": "application/json", "Content-Length": "-5"}, None, 400),
+    ],
+)
+def test_rejected_body_does_not_leak_into_the_next_request(conn, headers, body, status):
+    """Test an error sent before reading the body closes the connection."""
+    conn.request("POST", "/commands", body, headers)
+    response = conn.getresponse()
+    assert response.status == status
+    assert response.getheader("Connection") == "close"
+    assert "error" in json.loads(response.read())
+
+    # The client reconnects; nothing of the old body is read as a request
+    response, body = request(conn, "GET", "/state")
+    assert response.status == 200
+    assert body["state"] is None
+
+
+def test_metrics_come_from_the_engine(engine):
+    """Test /metrics serves the engine's exposition as OpenMetrics text."""
+    server = ApiServer(engine.db.db_path, 0, metrics=engine.render_metrics)
+    server.start()
+    try:
+        conn = HTTPConnection("127.0.0.1", server.port, timeout=5)
+        conn.request("GET", "/metrics")
+        response = conn.getresponse()
+        text = response.read().decode()
+        conn.close()
+    finally:
+        server.stop()
+    assert response.status == 200
+    assert response.getheader("Content-Type").startswith("application/openmetrics-text")
+    assert 'lockin_session_state{lockin_session_state="idle"} 1' in text
+    assert text.endswith("# EOF\n")
@@ -0,0 +1,117 @@
+"""Tests for the attach view's asyncio loop."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from lockin.attach import AttachSession
+from lockin.cli import LockinUI
+from lockin.client import AsyncLockinClient
+from lockin.engine import Engine
+
+
+class Screen:
+    """Stands in for Rich Live: records when each frame was drawn."""
+
+    def __init__(self):
+        self.frames = []
+
+    def update(self, renderable, refresh=False):
+        self.frames.append(time.monotonic())
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return Engine(tmp_path / "lockin.db", notifications=False)
+
+
+def serve(engine, interval):
+    """Handle commands every `interval` seconds on a thread; returns a stopper."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            engine.process_commands()
+
+    thread = threading.Thread(target=loop)
+    thread.start()
+
+    def stopper():
+        stop.set()
+        thread.join()
+
+    return stopper
+
+
+def attach(engine, keys, timeout=5.0):
+    """Attach with keys fed in at the given delays; returns (result, screen)."""
+    screen = Screen()
+
+    async def main():
+        queue = asyncio.Queue()
+        async with AsyncLockinClient(
+            engine.db.db_path, timeout=timeout, poll_interval=0.01
+        ) as client:
+            session = AttachSession(LockinUI(engine.db.db_path), client, screen, queue)
+
+            async def press():
+                for delay, key in keys:
+                    await asyncio.sleep(delay)
+                    queue.put_nowait(key)
+
+            presser = asyncio.ensure_future(press())
+            result = await session.run(await client.status())
+            presser.cancel()
+            return result
+
+    return asyncio.run(main()), screen
+
+
+def test_keys_and_redraws_continue_while_a_command_is_pending(engine):
+    """Test a slow round trip stalls neither the screen nor other keys."""
+    engine.start_session("break", 5)
+    started = time.monotonic()
+    # No engine is handling commands: "l" stays pending until detaching
+    (message, request), screen = attach(engine, [(0.05, "l"), (0.6, "d")])
+
+    assert message.startswith("[dim]Detached")
+    assert time.monotonic() - started < 2  # Not the 5s command timeout
+    gaps = [b - a for a, b in zip(screen.frames, screen.frames[1:])]
+    assert len(screen.frames) >= 3 and max(gaps) < 0.4
+
+
+def test_switch_then_quit_round_trips(engine):
+    """Test commands are acknowledged in order and quitting ends the view."""
+    engine.start_session("break", 5)
+    stop = serve(engine, 0.05)
+    try:
+        (message, _), _ = attach(engine, [(0.05, "l"), (0.3, "q")])
+    finally:
+        stop()
+
+    assert message == "[yellow]Break scrapped (not logged)[/yellow]"
+    assert engine.state["session_state"] == "idle"
+    with engine.db.connection() as conn:
+        results = [r[0] for r in conn.execute("SELECT result FROM commands")]
+    assert results == [
+        '{"ok": true, "message": "Switched to long break"}',
+        '{"ok": true, "message": "Session ended"}',
+    ]
+
+
+def test_break_key_waits_for_quit_before_starting_break(engine):
+    """Test "b" starts the break once the work session is logged, staying attached."""
+    engine.start_session("work", 25)
+    engine.state.update(session_state="running_bonus", start_time=time.time() - 1800)
+    engine._save_state()
+    stop = serve(engine, 0.05)
+    try:
+        (message, _), _ = attach(engine, [(0.05, "b"), (0.5, "d")])
+    finally:
+        stop()
+
+    assert message.startswith("[dim]Detached")
+    assert engine.db.get_last_session()["state"] == "completed"
+    assert engine.state["session_type"] == "break"
@@ -0,0 +1,105 @@
+"""Tests for the year view of ``lockin stats``."""
+
+from datetime import datetime
+
+import pytest
+from rich.text import Text
+
+from lockin.cli import LockinUI
+
+
+@pytest.fixture
+def ui(tmp_path):
+    return LockinUI(tmp_path / "lockin.db")
+
+
+def log_work(db, when, minutes):
+    db.log_session(
+        session_type="work",
+        state="completed",
+        start_time=when.timestamp(),
+        end_time=when.timestamp() + minutes * 60,
+        planned_duration_minutes=minutes,
+        actual_duration_minutes=minutes,
+    )
+
+
+def calendar_rows(ui, year, daily_stats):
+    """The calendar's weekday rows as plain text, without the row labels."""
+    lines = ui._make_year_calendar(
+        datetime(year, 1, 1), datetime(year + 1, 1, 1), daily_stats
+    )
+    plain = [Text.from_markup(line).plain for line in lines]
+    return plain[0], [row[4:] for row in plain[1:8]]
+
+
+def test_calendar_has_a_cell_per_day_of_a_leap_year(ui):
+    """Test 2024 (starting on a Monday) gets 366 cells, Feb 29 included."""
+    header, rows = calendar_rows(ui, 2024, {"2024-02-29": {"work": 30}})
+
+    assert sum(row.count("·") for row in rows) == 365
+    # Feb 29 2024 is the Thursday of the 9th week
+    assert rows[3][8] == "█"
+    assert rows[0][0] == "·"  # Jan 1 fills the first cell
+    assert header.split() == [
+        "Jan",
+        "Feb",
+        "Mar",
+        "Apr",
+        "May",
+        "Jun",
+        "Jul",
+        "Aug",
+        "Sep",
+        "Oct",
+        "Nov",
+        "Dec",
+    ]
+
+
+def test_calendar_leaves_days_outside_the_year_blank(ui):
+    """Test a year starting on a Wednesday pads the first and last weeks."""
+    _, rows = calendar_rows(ui, 2025, {})
+
+    assert [row[0] for row in rows] == [" ", " ", "·", "·", "·", "·", "·"]
+    # Dec 31 2025 is a Wednesday: the rest of that week is blank
+    assert [row[-1] for row in rows] == ["·", "·", "·", " ", " ", " ", " "]
+    assert sum(row.count("·") for row in rows) == 365
+
+
+def test_calendar_shades_relative_to_the_busiest_day(ui):
+    """Test empty months stay dots and only logged days are shaded."""
+    daily = {"2023-03-06": {"work": 240}, "2023-11-13": {"work": 30}}
+    _, rows = calendar_rows(ui, 2023, daily)
+
+    shaded = [c for row in rows for c in row if c not in " ·"]
+    assert sorted(shaded) == sorted("░█")
+    assert sum(row.count("·") for row in rows) == 363
+
+
+def test_monthly_breakdown_matches_month_stats(ui):
+    """Test the year's per-month totals agree with each month's own stats."""
+    for when, minutes in [
+        (datetime(2023, 1, 31, 22, 0), 50),
+        (datetime(2023, 2, 1, 9, 0), 25),
+        (datetime(2023, 2, 28, 9, 0), 25),
+        (datetime(2023, 12, 31, 20, 0), 90),
+    ]:
+        log_work(ui.db, when, minutes)
+
+    start, end = datetime(2023, 1, 1), datetime(2024, 1, 1)
+    year = ui.db.get_period_stats("year", start, end)
+    monthly = ui._monthly_totals(start, end, year["buckets"])
+
+    assert len(monthly) == 12
+    for month in range(1, 13):
+        next_month = datetime(2023 + month // 12, month % 12 + 1, 1)
+        month_stats = ui.db.get_period_stats(
+            "month", datetime(2023, month, 1), next_month
+        )
+        summary = month_stats["summary"]
+        totals = monthly[f"2023-{month:02d}"]
+        assert totals["work"] == summary["work_completed_minutes"]
+        assert totals["sessions"] == summary["completed_sessions"]
+    assert monthly["2023-02"] == {"work": 50, "sessions": 2}
+    assert monthly["2023-06"] == {"work": 0, "sessions": 0}
@@ -0,0 +1,114 @@
+"""Tests for the programmatic Lockin client."""
+
+import asyncio
+import threading
+
+import pytest
+
+from lockin.client import AsyncLockinClient, CommandTimeout, LockinClient
+from lockin.engine import Engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """An engine handling commands every 10ms on a background thread."""
+    engine = Engine(tmp_path / "lockin.db", notifications=False)
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(0.01):
+            engine.process_commands()
+
+    thread = threading.Thread(target=loop)
+    thread.start()
+    yield engine
+    stop.set()
+    thread.join()
+
+
+def test_commands_wait_for_the_engine(engine):
+    """Test each command returns once handled, with the engine's answer."""
+    with LockinClient(engine.db.db_path, poll_interval=0.005) as lockin:
+        result = lockin.start("work", 50)
+        assert result["ok"] and "50 minutes" in result["message"]
+        assert lockin.status()["session_state"] == "running"
+        assert lockin.status()["planned_duration_minutes"] == 50
+
+        refused = lockin.start("work")
+        assert refused == {
+            "id": refused["id"],
+            "ok": False,
+            "message": "Session already in progress",
+        }
+        assert lockin.continue_session()["ok"] is False
+        assert lockin.quit()["ok"]
+        assert lockin.status()["session_state"] == "idle"
+        assert lockin.stats()["today"]["session_count"] == 0
+
+        # Every call went over the one connection
+        assert lockin.db._conn is not None
+
+
+def test_repeated_commands_get_their_own_results(engine):
+    """Test a repeat is only coalesced when its result can't differ."""
+    engine.start_session("work", 25)
+    ids = [engine.db.queue_command("quit_session") for _ in range(3)]
+    engine.process_commands()
+
+    results = engine.db.get_command_results(ids)
+    assert results[ids[0]] == {"ok": True, "message": "Session ended"}
+    assert results[ids[1]] == {"ok": False, "message": "No active session"}
+    assert results[ids[2]] == {**results[ids[1]], "coalesced": True}
+
+
+def test_tags_are_checked_before_queuing(tmp_path):
+    """Test bad tags raise at once and good ones are queued normalized."""
+    with LockinClient(tmp_path / "lockin.db", timeout=0.01) as lockin:
+        for call in (
+            lambda: lockin.start("work", 25, tags=[5]),
+            lambda: lockin.tag(["has space"]),
+            lambda: asyncio.run(async_tag(lockin.db.db_path, "thesis")),
+        ):
+            with pytest.raises(ValueError):
+                call()
+        assert lockin.db.get_pending_commands() == []
+
+        assert lockin._start_args("work", 25, ["Thesis, reading", "thesis"]) == (
+            "start_session",
+            {
+                "session_type": "work",
+                "duration_minutes": 25,
+                "tags": ["thesis", "reading"],
+            },
+        )
+
+
+async def async_tag(db_path, tags):
+    async with AsyncLockinClient(db_path, timeout=0.01) as lockin:
+        return await lockin.tag(tags)
+
+
+def test_timeout_withdraws_the_command(tmp_path):
+    """Test a command nobody handles raises and doesn't run later."""
+    with LockinClient(tmp_path / "lockin.db", timeout=0.05) as lockin:
+        with pytest.raises(CommandTimeout) as raised:
+            lockin.quit()
+        assert raised.value.withdrawn
+        assert lockin.db.get_pending_commands() == []
+
+
+def test_async_client_runs_commands_concurrently(engine):
+    """Test the asyncio client's commands and queries interleave."""
+
+    async def main():
+        async with AsyncLockinClient(engine.db.db_path, poll_interval=0.005) as lockin:
+            started = await lockin.start("break", 5)
+            switched, status = await asyncio.gather(
+                lockin.switch_break("long"), lockin.status()
+            )
+            return started, switched, status, await lockin.status()
+
+    started, switched, status, after = asyncio.run(main())
+    assert started["ok"] and switched["ok"]
+    assert status["session_type"] == "break"
+    assert after["planned_duration_minutes"] == 15
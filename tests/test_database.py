@@ -1,11 +1,20 @@
 """Tests for Lockin database layer."""
 
+import json
+import os
+import sqlite3
 import pytest
+import time
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import tempfile
 
-from lockin.database import Database
+from lockin.database import (
+    SESSION_COLUMNS,
+    Database,
+    SessionRecord,
+    split_by_local_hour,
+)
 from lockin.config import Config
 
 
@@ -107,5 +116,466 @@ def test_config_management(temp_db):
     assert config.short_break_minutes == 5
 
 
+@pytest.fixture
+def dst_timezone():
+    """Run a test in a timezone with DST transitions."""
+    old_tz = os.environ.get("TZ")
+    os.environ["TZ"] = "America/New_York"
+    time.tzset()
+    yield
+    if old_tz is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = old_tz
+    time.tzset()
+
+
+def test_sql_bucketing_matches_python(temp_db, dst_timezone):
+    """Day/week totals grouped in SQLite match Python's local-time bucketing."""
+    # Every 5h across the 2024 spring-forward and fall-back transitions
+    starts = []
+    for first in (datetime(2024, 3, 4), datetime(2024, 10, 28)):
+        starts += [(first + timedelta(hours=5 * i)).timestamp() for i in range(60)]
+
+    for i, start in enumerate(starts):
+        temp_db.log_session(
+            session_type="work",
+            state="abandoned" if i % 7 == 0 else "completed",
+            start_time=start,
+            end_time=start + 1500,
+            planned_duration_minutes=25,
+            actual_duration_minutes=25 + i % 3,
+        )
+
+    range_start, range_end = datetime(2024, 1, 1), datetime(2025, 1, 1)
+    expected_days, expected_weeks = {}, {}
+    for i, start in enumerate(starts):
+        if i % 7 == 0:
+            continue
+        local = datetime.fromtimestamp(start)
+        week = local - timedelta(days=local.weekday())
+        for buckets, key in (
+            (expected_days, local.strftime("%Y-%m-%d")),
+            (expected_weeks, week.strftime("%Y-%m-%d")),
+        ):
+            bucket = buckets.setdefault(key, {"work": 0, "sessions": 0})
+            bucket["work"] += 25 + i % 3
+            bucket["sessions"] += 1
+
+    assert temp_db.get_work_totals_by_day(range_start, range_end) == expected_days
+    assert temp_db.get_work_totals_by_week(range_start, range_end) == expected_weeks
+
+    summary = temp_db.get_period_summary(range_start, range_end)
+    assert summary["session_count"] == len(starts)
+    assert summary["abandoned_sessions"] == len(starts[::7])
+
+
+def test_split_by_local_hour_apportions_minutes(dst_timezone):
+    """Sessions crossing hour boundaries (and DST) are split by wall time."""
+    start = datetime(2024, 5, 6, 9, 40).timestamp()
+    pieces = split_by_local_hour(start, start + 50 * 60, 50)
+    assert [(p[1], p[2], round(p[3], 6)) for p in pieces] == [
+        (0, 9, 20),
+        (0, 10, 30),
+    ]
+
+    # 01:30 -> 03:30 on spring-forward day is one real hour
+    start = datetime(2024, 3, 10, 1, 30).timestamp()
+    pieces = split_by_local_hour(start, start + 3600, 60)
+    assert [(p[2], round(p[3], 6)) for p in pieces] == [(1, 30), (3, 30)]
+
+
+def test_focus_heatmap_rollup(temp_db):
+    """The hourly rollup follows logged and deleted work sessions."""
+    start = datetime(2024, 5, 6, 9, 30).timestamp()  # a Monday
+    for offset in (0, 86400):
+        temp_db.log_session(
+            session_type="work",
+            state="completed",
+            start_time=start + offset,
+            end_time=start + offset + 3600,
+            planned_duration_minutes=60,
+            actual_duration_minutes=60,
+        )
+    temp_db.log_session(
+        session_type="break",
+        state="completed",
+        start_time=start + 3600,
+        end_time=start + 3900,
+        planned_duration_minutes=5,
+        actual_duration_minutes=5,
+    )
+
+    heatmap = temp_db.get_focus_heatmap()
+    assert heatmap == pytest.approx({(0, 9): 30, (0, 10): 30, (1, 9): 30, (1, 10): 30})
+
+    tuesday = temp_db.get_last_session()
+    temp_db.delete_session(tuesday["id"])
+    assert temp_db.get_focus_heatmap() == pytest.approx({(0, 9): 30, (0, 10): 30})
+
+    # Range filters on the hour, not the session
+    assert temp_db.get_focus_heatmap(
+        datetime(2024, 5, 6, 10), datetime(2024, 5, 7)
+    ) == pytest.approx({(0, 10): 30})
+
+
+def test_focus_hours_backfilled_on_upgrade(temp_db):
+    """Databases from before the rollup existed get it rebuilt on open."""
+    start = datetime(2024, 5, 6, 9, 30).timestamp()
+    temp_db.log_session(
+        session_type="work",
+        state="completed",
+        start_time=start,
+        end_time=start + 1800,
+        planned_duration_minutes=30,
+        actual_duration_minutes=30,
+    )
+    with temp_db.connection() as conn:
+        conn.execute("DELETE FROM focus_hours")
+        conn.execute("PRAGMA user_version = 0")
+
+    reopened = Database(temp_db.db_path)
+    assert reopened.get_focus_heatmap() == pytest.approx({(0, 9): 30})
+
+
+def test_engine_state_versions_and_partial_updates(temp_db):
+    """Test every state write bumps the version and polls skip unchanged state."""
+    assert temp_db.get_engine_state() is None
+    start = temp_db.get_engine_state_version()
+    version, state = temp_db.poll_engine_state(-1)
+    assert (version, state) == (start, None)
+
+    temp_db.set_engine_state({"session_state": "running", "start_time": 100.0})
+    temp_db.update_engine_state({"session_state": "awaiting_decision"})
+    state = temp_db.get_engine_state()
+    assert state["session_state"] == "awaiting_decision"
+    assert state["start_time"] == 100.0
+    assert state["planned_end_time"] is None
+
+    version = temp_db.get_engine_state_version()
+    assert version == start + 2
+    assert temp_db.poll_engine_state(version) is None
+    assert temp_db.poll_engine_state(start) == (version, state)
+
+    with pytest.raises(ValueError):
+        temp_db.update_engine_state({"current_state": "{}"})
+
+    temp_db.clear_engine_state()
+    assert temp_db.get_engine_state() is None
+    assert temp_db.get_engine_state_version() == version + 1
+
+
+def test_engine_state_migrated_from_json(temp_db):
+    """Databases with the old JSON engine_state get typed columns on open."""
+    saved = {"session_state": "running", "session_type": "work", "start_time": 5.0}
+    with temp_db.connection() as conn:
+        conn.execute("DROP TABLE engine_state")
+        conn.execute("""
+            CREATE TABLE engine_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                current_state TEXT,
+                updated_at REAL
+            )
+        """)
+        conn.execute("INSERT INTO engine_state VALUES (1, ?, 0)", (json.dumps(saved),))
+        conn.execute("PRAGMA user_version = 1")
+
+    reopened = Database(temp_db.db_path)
+    state = reopened.get_engine_state()
+    assert {k: state[k] for k in saved} == saved
+    assert reopened.get_engine_state_version() == 1
+    with reopened.connection() as conn:
+        row = conn.execute("SELECT current_state FROM engine_state").fetchone()
+    assert row[0] is None
+
+
+def test_command_results_column_added(temp_db):
+    """Databases from before command results gain the column on open."""
+    with temp_db.connection() as conn:
+        conn.execute("DROP TABLE commands")
+        conn.execute("""
+            CREATE TABLE commands (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                command TEXT NOT NULL,
+                args TEXT,
+                created_at REAL,
+                processed INTEGER DEFAULT 0
+            )
+        """)
+        conn.execute("PRAGMA user_version = 2")
+
+    reopened = Database(temp_db.db_path)
+    command_id = reopened.queue_command("quit_session")
+    assert reopened.get_command_results([command_id]) == {}
+    reopened.mark_commands_processed([command_id], [{"ok": False, "message": "x"}])
+    assert reopened.get_command_results([command_id]) == {
+        command_id: {"ok": False, "message": "x"}
+    }
+
+
+def test_trend_window_functions(temp_db):
+    """Rolling averages and weekly deltas treat idle days as zero."""
+    monday = datetime(2024, 5, 6)
+    for day, minutes, state in [
+        (0, 60, "completed"),
+        (1, 30, "abandoned"),
+        (7, 120, "completed"),
+        (8, 60, "completed"),
+    ]:
+        start = (monday + timedelta(days=day, hours=9)).timestamp()
+        temp_db.log_session(
+            session_type="work",
+            state=state,
+            start_time=start,
+            end_time=start + minutes * 60,
+            planned_duration_minutes=minutes,
+            actual_duration_minutes=minutes,
+        )
+
+    daily = temp_db.get_daily_trend(monday, monday + timedelta(days=14))
+    assert len(daily) == 14
+    assert daily[0]["focused"] == 60
+    assert daily[6]["avg_7d"] == pytest.approx(90 / 7)
+    assert daily[8]["avg_7d"] == pytest.approx(180 / 7)
+    assert daily[13]["avg_28d"] == pytest.approx(270 / 28)
+
+    weekly = temp_db.get_weekly_trend(monday, monday + timedelta(days=14))
+    assert [w["week"] for w in weekly] == ["2024-05-06", "2024-05-13"]
+    assert weekly[0]["delta"] == 90  # vs the empty week before
+    assert weekly[1]["delta"] == 90
+    assert weekly[0]["completion_ratio"] == 0.5
+    assert weekly[1]["completion_ratio"] == 1.0
+
+
+def test_sessions_keyset_pagination(temp_db):
+    """Test paging through the log and resolving delete positions."""
+    base = datetime(2024, 3, 1, 9, 0).timestamp()
+
+    # Two sessions share a start time to exercise the id tiebreak
+    starts = [base, base + 3600, base + 3600, base + 7200, base + 10800]
+    for i, start in enumerate(starts):
+        temp_db.log_session(
+            session_type="work" if i % 2 == 0 else "break",
+            state="completed",
+            start_time=start,
+            end_time=start + 1500,
+            planned_duration_minutes=25,
+            actual_duration_minutes=25,
+        )
+
+    everything = temp_db.get_recent_sessions(limit=10)
+    assert len(everything) == 5
+    assert temp_db.count_sessions() == 5
+
+    # Walking pages of two covers every session exactly once, in order
+    pages = []
+    page = temp_db.get_sessions_page(2)
+    while page:
+        pages.extend(page)
+        last = page[-1]
+        page = temp_db.get_sessions_page(2, before=(last["start_time"], last["id"]))
+    assert [s["id"] for s in pages] == [s["id"] for s in everything]
+
+    # Type filter applies to every page
+    work = temp_db.get_sessions_page(1, "work")
+    more = temp_db.get_sessions_page(
+        10, "work", before=(work[0]["start_time"], work[0]["id"])
+    )
+    assert [s["session_type"] for s in work + more] == ["work"] * 3
+
+    # Positions match the unfiltered log
+    for position, session in enumerate(everything, 1):
+        assert temp_db.get_session_at_position(position)["id"] == session["id"]
+    assert temp_db.get_session_at_position(0) is None
+    assert temp_db.get_session_at_position(6) is None
+
+    assert temp_db.get_session(everything[0]["id"])["start_time"] == starts[-1]
+    assert temp_db.get_session(9999) is None
+
+
+def test_session_records_and_column_selection(temp_db):
+    """Test session queries return slotted records with only selected columns."""
+    start = datetime(2024, 3, 4, 9, 0).timestamp()
+    temp_db.log_session("work", "completed", start, start + 1500, 25, 25)
+
+    session = temp_db.get_last_session()
+    assert isinstance(session, SessionRecord)
+    assert not hasattr(session, "__dict__")
+    assert session["state"] == session.state == "completed"
+    assert list(session) == list(SESSION_COLUMNS)
+    assert dict(session) == session.to_dict() == session
+    assert session.get("missing", 1) == 1
+
+    day = temp_db.get_sessions_by_date_range(
+        datetime(2024, 3, 4),
+        datetime(2024, 3, 5),
+        columns=("start_time", "actual_duration_minutes"),
+    )
+    assert day == [{"start_time": start, "actual_duration_minutes": 25}]
+    assert "state" not in day[0]
+    with pytest.raises(KeyError):
+        day[0]["state"]
+
+    assert temp_db.get_session(session.id, columns=["id"]).to_dict() == {
+        "id": session.id
+    }
+    with pytest.raises(ValueError):
+        temp_db.get_recent_sessions(columns=("id; DROP TABLE sessions",))
+
+
+def test_iter_sessions_streams_in_batches(temp_db):
+    """Test iter_sessions yields a range oldest first across fetch batches."""
+    base = datetime(2024, 3, 4, 9, 0).timestamp()
+    for i in range(7):
+        temp_db.log_session(
+            "work" if i % 2 == 0 else "break",
+            "completed",
+            base + i * 3600,
+            base + i * 3600 + 1500,
+            25,
+            25,
+        )
+
+    sessions = temp_db.iter_sessions(columns=("id", "start_time"), batch_size=3)
+    assert iter(sessions) is sessions
+    assert [s.start_time for s in sessions] == [base + i * 3600 for i in range(7)]
+
+    window = temp_db.iter_sessions(
+        datetime(2024, 3, 4, 10, 0),
+        datetime(2024, 3, 4, 14, 0),
+        session_type="work",
+        batch_size=1,
+    )
+    assert [s["start_time"] for s in window] == [base + 2 * 3600, base + 4 * 3600]
+
+    # Stopping early releases the connection
+    partial = temp_db.iter_sessions(batch_size=2)
+    next(partial)
+    partial.close()
+    temp_db.delete_session(1)
+    assert temp_db.count_sessions() == 6
+
+
+def test_period_stats_cache(temp_db):
+    """Test closed periods are cached and invalidated by session changes."""
+    start = datetime(2023, 1, 1)
+    end = datetime(2024, 1, 1)
+
+    def log(when):
+        temp_db.log_session(
+            session_type="work",
+            state="completed",
+            start_time=when.timestamp(),
+            end_time=when.timestamp() + 1500,
+            planned_duration_minutes=25,
+            actual_duration_minutes=25,
+        )
+
+    def cached_periods():
+        with temp_db.connection() as conn:
+            return [r[0] for r in conn.execute("SELECT period FROM stats_cache")]
+
+    log(datetime(2023, 5, 2, 10, 0))
+    stats = temp_db.get_period_stats("year", start, end)
+    assert stats["summary"]["completed_sessions"] == 1
+    assert stats["buckets"] == {"2023-05-02": {"work": 25, "sessions": 1}}
+    assert cached_periods() == ["year"]
+
+    # Served from the cache on the next call
+    assert temp_db.get_period_stats("year", start, end) == stats
+
+    # A session in another period leaves the entry alone...
+    log(datetime(2022, 5, 2, 10, 0))
+    assert cached_periods() == ["year"]
+
+    # ...one inside the range drops it
+    log(datetime(2023, 12, 31, 23, 0))
+    assert cached_periods() == []
+    stats = temp_db.get_period_stats("year", start, end)
+    assert stats["summary"]["completed_sessions"] == 2
+
+    # Month buckets are weeks
+    month = temp_db.get_period_stats(
+        "month", datetime(2023, 5, 1), datetime(2023, 6, 1)
+    )
+    assert month["buckets"] == {"2023-05-01": {"work": 25, "sessions": 1}}
+
+    # Deleting drops every cached period containing the session
+    session = temp_db.get_sessions_page(
+        1, before=(datetime(2023, 6, 1).timestamp(), 0)
+    )[0]
+    temp_db.delete_session(session["id"])
+    assert cached_periods() == []
+    assert temp_db.get_period_stats("year", start, end)["summary"]["session_count"] == 1
+
+    # The open current period is never cached
+    now = datetime.now()
+    temp_db.get_period_stats(
+        "year", datetime(now.year, 1, 1), datetime(now.year + 1, 1, 1)
+    )
+    assert cached_periods() == ["year"]  # only 2023
+
+
+@pytest.mark.parametrize("sqlite_version", [sqlite3.sqlite_version_info, (3, 31, 1)])
+def test_claimed_commands_are_hidden_until_released(
+    temp_db, monkeypatch, sqlite_version
+):
+    """Test claiming takes pending commands once, and release puts them back."""
+    # SQLite before 3.35 has no RETURNING; claim_commands falls back
+    monkeypatch.setattr(sqlite3, "sqlite_version_info", sqlite_version)
+    temp_db.queue_command("quit_session")
+    temp_db.queue_command("switch_break", {"break_type": "long"})
+
+    claimed = temp_db.claim_commands()
+    assert [c["command"] for c in claimed] == ["quit_session", "switch_break"]
+    assert temp_db.get_pending_commands() == []
+    assert temp_db.claim_commands() == []
+
+    temp_db.mark_commands_processed([claimed[0]["id"]])
+    assert temp_db.release_claimed_commands() == 1
+    assert [c["id"] for c in temp_db.claim_commands()] == [claimed[1]["id"]]
+
+
+def test_busy_writes_retry_then_give_up(temp_db):
+    """Test writes retry briefly on a locked database and count contention."""
+    db = Database(temp_db.db_path, busy_timeout=0.001, max_retries=2)
+    assert temp_db.get_contention_metrics() == {}
+
+    blocker = sqlite3.connect(str(temp_db.db_path))
+    blocker.execute("BEGIN IMMEDIATE")  # Hold the write lock
+    try:
+        started = time.perf_counter()
+        with pytest.raises(sqlite3.OperationalError):
+            db.queue_command("continue_session")
+        assert time.perf_counter() - started < 0.5
+
+        # Reads aren't blocked by a writer (WAL)
+        assert db.get_pending_commands() == []
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+    stats = db.get_contention_metrics()["queue_command"]
+    assert stats["retries"] == 2
+    assert stats["failures"] == 1
+    assert stats["wait_seconds"] > 0
+
+    db.queue_command("continue_session")
+    assert len(db.get_pending_commands()) == 1
+
+
+def test_opening_an_up_to_date_database_takes_no_write_lock(temp_db):
+    """Test a Database can be opened while another process holds the writer."""
+    blocker = sqlite3.connect(str(temp_db.db_path))
+    blocker.execute("BEGIN IMMEDIATE")  # Hold the write lock
+    try:
+        db = Database(temp_db.db_path, busy_timeout=0.001)
+        assert db.get_engine_state_version() == 0
+        assert db.get_pending_commands() == []
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
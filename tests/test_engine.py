@@ -0,0 +1,277 @@
+"""Tests for the engine state machine, driven by a simulated clock."""
+
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from lockin.clock import Clock, SimulatedClock
+from lockin.engine import Engine, SessionState
+
+
+@pytest.fixture
+def temp_db_path():
+    """Create a temporary database path for testing."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as f:
+        db_path = Path(f.name)
+
+    yield db_path
+
+    # Cleanup
+    db_path.unlink()
+
+
+@pytest.fixture
+def engine(temp_db_path):
+    """Engine on a simulated clock starting at 9am on a fixed day."""
+    clock = SimulatedClock(datetime(2024, 3, 4, 9, 0).timestamp())
+    return Engine(temp_db_path, clock=clock, notifications=False)
+
+
+def test_work_session_through_decision_window_and_overtime_cap(engine):
+    """Test a 90 minute session auto-continues and stops at the overtime cap."""
+    engine.db.queue_command(
+        "start_session", {"session_type": "work", "duration_minutes": 90}
+    )
+
+    engine.run_for(90 * 60 - 1, fast_forward=True)
+    assert engine.state["session_state"] == SessionState.RUNNING
+
+    engine.run_for(2, fast_forward=True)
+    assert engine.state["session_state"] == SessionState.AWAITING_DECISION
+
+    # Decision window (3 min) runs out: bonus time starts on its own
+    engine.run_for(3 * 60, fast_forward=True)
+    assert engine.state["session_state"] == SessionState.RUNNING_BONUS
+
+    # Overtime is capped at 60 minutes past the planned end
+    engine.run_for(60 * 60, fast_forward=True)
+    assert engine.state["session_state"] == SessionState.IDLE
+
+    session = engine.db.get_last_session()
+    assert session["state"] == "completed"
+    assert session["actual_duration_minutes"] == pytest.approx(150, abs=1 / 30)
+    assert session["overtime_minutes"] == pytest.approx(60, abs=1 / 30)
+    assert session["created_at"] == session["end_time"]
+
+
+def test_simulated_day_uses_clock_for_stats(engine):
+    """Test today's stats and the streak follow the simulated clock."""
+    for _ in range(4):
+        engine.start_session("work", 25)
+        engine.run_for(25 * 60, fast_forward=True)
+        engine.quit_session()
+        engine.start_session("break", 5)
+        engine.run_for(5 * 60, fast_forward=True)
+        engine.quit_session()
+
+    assert engine.db.get_todays_stats()["work_completed"] == 4
+    assert engine.db.calculate_current_streak() == 4
+    assert engine.get_recommended_break_type() == "long"
+
+    # An hour later the streak has expired; the next day starts fresh
+    engine.clock.advance(60 * 60)
+    assert engine.db.calculate_current_streak() == 0
+    engine.clock.advance(24 * 60 * 60)
+    assert engine.db.get_todays_stats()["work_completed"] == 0
+
+
+def test_clock_requires_time_and_sleep():
+    """Test a clock missing sleep() fails when built, not mid-session."""
+
+    class Frozen(Clock):
+        def time(self) -> float:
+            return 0.0
+
+    with pytest.raises(TypeError):
+        Frozen()
+
+
+def test_fast_forward_matches_ticking(tmp_path):
+    """Test skipping idle ticks ends in the same state as ticking every second."""
+    sessions = []
+    for fast_forward in (False, True):
+        clock = SimulatedClock(datetime(2024, 3, 4, 9, 0).timestamp())
+        engine = Engine(
+            tmp_path / f"{fast_forward}.db", clock=clock, notifications=False
+        )
+        engine.config.set("work_overtime_max_minutes", 2)
+        engine.start_session("work", 2)
+
+        ticks = engine.run_for(10 * 60, fast_forward=fast_forward)
+        assert engine.state["session_state"] == SessionState.IDLE
+        assert clock.time() == datetime(2024, 3, 4, 9, 10).timestamp()
+
+        session = engine.db.get_last_session().to_dict()
+        del session["id"]
+        sessions.append((session, ticks))
+
+    (ticked, all_ticks), (skipped, few_ticks) = sessions
+    assert skipped == ticked
+    assert all_ticks == 600
+    assert few_ticks < 10
+
+
+def test_start_lost_to_lock_is_retried_with_its_event(engine, temp_db_path):
+    """Test a start that hits a locked database leaves no trace until retried."""
+    engine.db.queue_command(
+        "start_session", {"session_type": "work", "duration_minutes": 25}
+    )
+    engine.claimed_commands = engine.db.claim_commands()  # Before the lock
+    blocker = sqlite3.connect(str(temp_db_path))
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            engine.process_commands()
+        assert engine.state["session_state"] == SessionState.IDLE
+        assert not engine.state_dirty
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+    # The claimed command is retried: state and event commit together
+    engine.process_commands()
+    assert engine.db.get_engine_state()["session_state"] == SessionState.RUNNING
+    assert [e["type"] for e in engine.db.get_events()] == ["session_started"]
+
+
+def test_saves_write_only_changed_fields(engine):
+    """Test each transition bumps the state version once, writing what changed."""
+    engine.start_session("work", 25)
+    version = engine.db.get_engine_state_version()
+
+    engine.run_for(25 * 60 + 1, fast_forward=True)
+    assert engine.state["session_state"] == SessionState.AWAITING_DECISION
+    assert engine.db.get_engine_state_version() == version + 1
+
+    # Nothing changed: no write at all
+    engine._save_state()
+    assert engine.db.get_engine_state_version() == version + 1
+
+    # Writes from elsewhere to untouched fields survive a partial save
+    engine.db.update_engine_state({"last_notification": 1.0})
+    engine.continue_session()
+    saved = engine.db.get_engine_state()
+    assert saved["session_state"] == SessionState.RUNNING_BONUS
+    assert saved["last_notification"] == 1.0
+
+
+class SimulatedCrash(Exception):
+    """Stands in for the process dying partway through a transaction."""
+
+
+def crash(*args, **kwargs):
+    raise SimulatedCrash
+
+
+def test_crash_mid_quit_neither_loses_nor_duplicates_session(
+    engine, temp_db_path, monkeypatch
+):
+    """Test a crash between the session row and the state write rolls back both."""
+    engine.start_session("work", 25)
+    engine.run_for(30 * 60, fast_forward=True)
+    engine.db.queue_command("quit_session")
+
+    # Dies after inserting the session, before writing the idle state
+    monkeypatch.setattr(engine.db, "_update_engine_state", crash)
+    with pytest.raises(SimulatedCrash):
+        engine.process_commands()
+    assert engine.db.count_sessions() == 0
+    assert engine.state["session_state"] == SessionState.RUNNING_BONUS
+
+    # On restart the quit command is still pending and logs exactly once
+    restarted = Engine(temp_db_path, clock=engine.clock, notifications=False)
+    assert restarted.state["session_state"] == SessionState.RUNNING_BONUS
+    restarted.process_commands()
+    restarted.process_commands()
+    assert restarted.db.count_sessions() == 1
+    assert restarted.state["session_state"] == SessionState.IDLE
+    assert restarted.db.get_pending_commands() == []
+
+
+def test_crash_before_command_marked_keeps_command_and_state(
+    engine, temp_db_path, monkeypatch
+):
+    """Test a command's effects don't commit without its processed flag."""
+    engine.db.queue_command(
+        "start_session", {"session_type": "work", "duration_minutes": 25}
+    )
+    monkeypatch.setattr(engine.db, "_mark_commands_processed", crash)
+    with pytest.raises(SimulatedCrash):
+        engine.process_commands()
+    assert engine.db.get_engine_state() is None
+    assert engine.state["session_state"] == SessionState.IDLE
+
+    restarted = Engine(temp_db_path, clock=engine.clock, notifications=False)
+    restarted.process_commands()
+    assert restarted.state["session_state"] == SessionState.RUNNING
+    assert restarted.db.get_engine_state()["session_state"] == SessionState.RUNNING
+    assert restarted.db.get_pending_commands() == []
+
+
+def test_quit_commits_session_and_state_together(engine):
+    """Test ending a session is one commit."""
+    engine.start_session("work", 25)
+    engine.clock.advance(30 * 60)
+    before = engine.db.commits
+    engine.quit_session()
+    assert engine.db.commits == before + 1
+    assert engine.db.count_sessions() == 1
+
+
+def test_malformed_command_fails_alone(engine):
+    """Test a command that raises is finished as failed, not retried forever."""
+    ids = [
+        engine.db.queue_command(
+            "start_session",
+            {"session_type": "work", "duration_minutes": 25, "tags": [5]},
+        ),
+        engine.db.queue_command("start_session", {"session_type": "work"}),
+        engine.db.queue_command(
+            "start_session", {"session_type": "work", "duration_minutes": 50}
+        ),
+    ]
+
+    before = engine.db.commits
+    engine.process_commands()
+    assert engine.db.commits == before + 2
+    assert engine.claimed_commands == []
+
+    results = engine.db.get_command_results(ids)
+    assert [results[i]["ok"] for i in ids] == [False, False, True]
+    assert results[ids[1]]["message"].startswith("Command failed: KeyError")
+    state = engine.db.get_engine_state()
+    assert state["planned_duration_minutes"] == 50
+    assert state["tags"] is None
+    assert [e["type"] for e in engine.db.get_events()] == ["session_started"]
+
+
+def test_command_burst_is_claimed_coalesced_and_finished_together(engine):
+    """Test a burst costs two commits and repeats of a no-op are skipped."""
+    start_work = {"session_type": "work", "duration_minutes": 25}
+    start_break = {"session_type": "break", "duration_minutes": 5}
+    for command, args in [
+        ("start_session", start_work),
+        ("quit_session", None),
+        ("quit_session", None),
+        ("quit_session", None),
+        ("start_session", start_break),
+        ("start_session", start_break),
+    ]:
+        engine.db.queue_command(command, args)
+
+    before = engine.db.commits
+    engine.process_commands()
+    assert engine.db.commits == before + 2  # claim, then effects and marks
+    # Only the third quit: the second already found no session to end
+    assert engine.coalesced_commands == 1
+    assert engine.state["session_type"] == "break"
+    with engine.db.connection() as conn:
+        states = [r[0] for r in conn.execute("SELECT processed FROM commands")]
+    assert states == [1] * 6
+
+    # Nothing pending: no write at all
+    engine.process_commands()
+    assert engine.db.commits == before + 2
@@ -0,0 +1,48 @@
+"""Tests for `lockin export`."""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from lockin.database import Database
+from lockin.export import export_sessions, main
+
+
+def test_export_csv_and_ndjson(tmp_path):
+    """Test both formats stream the selected range, type and columns."""
+    db = Database(tmp_path / "lockin.db")
+    for day in (3, 4, 5):
+        start = datetime(2024, 3, day, 9, 0).timestamp()
+        db.log_session("work", "completed", start, start + 1500, 25, 25)
+        db.log_session("break", "completed", start + 1500, start + 1800, 5, 5)
+
+    out = io.StringIO()
+    count = export_sessions(
+        db,
+        out,
+        "csv",
+        datetime(2024, 3, 4),
+        datetime(2024, 3, 6),
+        columns=("session_type", "actual_duration_minutes"),
+    )
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert count == 4
+    assert rows[0] == ["session_type", "actual_duration_minutes"]
+    assert rows[1:] == [["work", "25.0"], ["break", "5.0"]] * 2
+
+    target = tmp_path / "work.ndjson"
+    assert (
+        main(
+            ["--format", "ndjson", "--to", "2024-03-04", "--work", "-o", str(target)],
+            db.db_path,
+        )
+        == 0
+    )
+    lines = [json.loads(line) for line in target.read_text().splitlines()]
+    assert [line["start_time"] for line in lines] == [
+        datetime(2024, 3, day, 9, 0).timestamp() for day in (3, 4)
+    ]
+    assert set(lines[0]) == set(db.get_last_session())
+
+    assert main(["--columns", "id,nope"], db.db_path) == 2
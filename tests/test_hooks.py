@@ -0,0 +1,75 @@
+"""Tests for user hooks run on engine events."""
+
+import json
+import time
+from datetime import datetime
+
+from lockin.clock import SimulatedClock
+from lockin.engine import Engine
+from lockin.hooks import HookRunner
+
+
+def write_hook(hooks_dir, name, body):
+    hooks_dir.mkdir(exist_ok=True)
+    path = hooks_dir / name
+    path.write_text(f"#!/bin/sh\n{body}\n")
+    path.chmod(0o755)
+    return path
+
+
+def test_engine_events_run_scripts_and_callables(tmp_path):
+    """Test a day of sessions reaches the hooks, derived events included."""
+    hooks_dir = tmp_path / "hooks"
+    out = tmp_path / "completed.ndjson"
+    write_hook(hooks_dir, "session_completed.sh", f"cat >> {out}; echo >> {out}")
+    write_hook(hooks_dir, "break_over", "exit 3")  # Fails on its own
+    (hooks_dir / "decision_window").write_text("not executable")
+
+    seen = []
+    clock = SimulatedClock(datetime(2024, 3, 4, 9, 0).timestamp())
+    engine = Engine(tmp_path / "lockin.db", clock=clock, notifications=False)
+    engine.config.set("long_break_every", 2)
+    engine.hooks = HookRunner(hooks_dir, callables={"*": [("seen", seen.append)]})
+
+    for _ in range(2):
+        engine.start_session("work", 25)
+        engine.run_for(25 * 60 + 1, fast_forward=True)
+        engine.quit_session()
+        engine.start_session("break", 5)
+        engine.run_for(5 * 60 + 1, fast_forward=True)
+        engine.quit_session()
+    engine.hooks.close()
+
+    types = [event["type"] for event in seen]
+    assert types.count("session_completed") == 4
+    assert types.count("break_over") == 2
+    milestones = [e["data"] for e in seen if e["type"] == "streak_milestone"]
+    assert milestones == [{"streak": 2}]
+
+    completed = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [e["data"]["session_type"] for e in completed] == ["work", "break"] * 2
+    assert engine.hooks.outcomes["failed"] == 2  # break_over, twice
+
+
+def test_slow_hooks_time_out_without_delaying_the_engine(tmp_path):
+    """Test hooks run off the engine thread and are cut off at the timeout."""
+    hooks_dir = tmp_path / "hooks"
+    write_hook(hooks_dir, "session_started", "sleep 5; echo late")
+    engine = Engine(tmp_path / "lockin.db", notifications=False)
+    engine.hooks = HookRunner(
+        hooks_dir,
+        workers=2,
+        timeout=0.2,
+        callables={"session_started": [("stuck", lambda event: time.sleep(5))]},
+        max_pending=2,
+    )
+
+    started = time.perf_counter()
+    engine.start_session("work", 25)
+    engine.quit_session()
+    engine.start_session("work", 25)  # Both hooks still waiting: dropped
+    assert time.perf_counter() - started < 0.1
+
+    engine.hooks.close()
+    assert time.perf_counter() - started < 1
+    assert dict(engine.hooks.outcomes) == {"timed_out": 2, "dropped": 2}
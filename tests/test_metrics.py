@@ -0,0 +1,134 @@
+"""Tests for the engine's OpenMetrics exposition."""
+
+import threading
+from datetime import datetime
+
+import pytest
+
+from lockin.clock import SimulatedClock
+from lockin.engine import Engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    clock = SimulatedClock(datetime(2024, 3, 4, 9, 0).timestamp())
+    return Engine(tmp_path / "lockin.db", clock=clock, notifications=False)
+
+
+def samples(text):
+    """{sample name with labels: value} from an exposition."""
+    assert text.endswith("# EOF\n")
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if not line.startswith("#")
+    }
+
+
+def test_scrape_reads_memory_only(engine, monkeypatch):
+    """Test today's focus, streak and state render without any query."""
+    for _ in range(2):
+        engine.start_session("work", 25)
+        engine.run_for(25 * 60 + 1, fast_forward=True)
+        engine.quit_session()
+    engine.start_session("work", 25)
+    engine.clock.advance(10 * 60)
+    engine.quit_session()  # Abandoned
+    engine.start_session("break", 5)
+    engine.clock.advance(60)
+    engine.db.queue_command("quit_session")
+    engine.clock.advance(2)
+    engine.process_commands()  # Too short to log
+    engine.start_session("work", 25)
+    engine.clock.advance(5 * 60)
+
+    def no_queries(*args, **kwargs):
+        raise AssertionError("scrape ran a query")
+
+    monkeypatch.setattr(engine.db, "connection", no_queries)
+    values = samples(engine.render_metrics())
+
+    assert values['lockin_session_state{lockin_session_state="running"}'] == 1
+    assert values['lockin_session_state{lockin_session_state="idle"}'] == 0
+    assert values['lockin_session_type{lockin_session_type="work"}'] == 1
+    assert values["lockin_session_remaining_seconds"] == 20 * 60
+    assert values["lockin_session_elapsed_seconds"] == 5 * 60
+    assert values['lockin_today_sessions{type="work",state="completed"}'] == 2
+    assert values['lockin_today_sessions{type="work",state="abandoned"}'] == 1
+    assert values["lockin_today_focused_minutes"] == pytest.approx(60, abs=0.1)
+    assert values["lockin_streak"] == 2
+    assert values["lockin_command_latency_seconds_count"] == 1
+    assert values["lockin_command_latency_seconds_sum"] == 2
+    assert values['lockin_db_op_seconds_count{op="write_batch"}'] >= 3
+    assert values["lockin_db_commits_total"] == engine.db.commits
+
+
+def test_scrapes_copy_counters_other_threads_update(engine):
+    """Test scrapes render snapshots while another thread writes."""
+    stop = threading.Event()
+
+    def write():
+        while not stop.is_set():
+            with engine.db.stats_lock:
+                engine.db.timings.clear()  # Each write adds its op again
+            engine.db.queue_command("quit_session")
+            engine.db.log_event("tick")
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(200):
+            samples(engine.render_metrics())
+    finally:
+        stop.set()
+        writer.join()
+
+    snapshot = engine.db.get_timing_metrics()
+    assert set(snapshot) == {"queue_command", "log_event"}
+    snapshot.clear()
+    assert engine.db.get_timing_metrics()
+
+
+def test_counts_match_database_and_reset_at_midnight(engine):
+    """Test the in-memory day agrees with the database, and a new day starts empty."""
+    engine.start_session("work", 25)
+    engine.run_for(25 * 60 + 1, fast_forward=True)
+    engine.quit_session()
+
+    stats = engine.db.get_todays_stats()
+    values = samples(engine.render_metrics())
+    assert values["lockin_today_focused_minutes"] == stats["total_work_minutes"]
+    assert values["lockin_streak"] == engine.db.calculate_current_streak()
+
+    # A restarted engine loads the same day from the database
+    restarted = Engine(engine.db.db_path, clock=engine.clock, notifications=False)
+    reloaded = samples(restarted.render_metrics())
+    for name in ("lockin_today_focused_minutes", "lockin_streak"):
+        assert reloaded[name] == values[name]
+
+    engine.clock.advance(24 * 60 * 60)
+    engine.tick()
+    values = samples(engine.render_metrics())
+    assert values["lockin_today_focused_minutes"] == 0
+    assert not any(name.startswith("lockin_today_sessions{") for name in values)
+
+
+def test_textfile_is_rewritten_on_an_interval(engine, tmp_path):
+    """Test metrics_textfile is written atomically, at most every 15 seconds."""
+    path = tmp_path / "lockin.prom"
+    engine.config.set("metrics_textfile", str(path))
+    engine._write_metrics_textfile()
+    assert samples(path.read_text())["lockin_streak"] == 0
+    assert not path.with_name("lockin.prom.tmp").exists()
+
+    running = 'lockin_session_state{lockin_session_state="running"}'
+    engine.start_session("work", 25)
+    engine.clock.advance(10)
+    engine._write_metrics_textfile()
+    assert samples(path.read_text())[running] == 0
+    engine.clock.advance(5)
+    engine._write_metrics_textfile()
+    assert samples(path.read_text())[running] == 1
+
+    engine.config.set("metrics_textfile", "off")
+    assert engine.config.metrics_textfile is None
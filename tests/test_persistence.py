@@ -0,0 +1,176 @@
+"""Tests for the engine's group-committing writer thread."""
+
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from lockin.clock import SimulatedClock
+from lockin.database import Database
+from lockin.engine import Engine, SessionState
+from lockin.persistence import BatchFailed, PersistenceWriter
+
+
+class StopAfter(SimulatedClock):
+    """Simulated clock that stops Engine.run after a number of sleeps."""
+
+    def __init__(self, start: float, sleeps: int):
+        super().__init__(start)
+        self.sleeps = sleeps
+
+    def sleep(self, seconds: float):
+        if self.sleeps == 0:
+            raise KeyboardInterrupt
+        self.sleeps -= 1
+        super().sleep(seconds)
+
+
+@pytest.fixture
+def writer(tmp_path):
+    db = Database(tmp_path / "lockin.db", busy_timeout=0.01, max_retries=1)
+    writer = PersistenceWriter(db)
+    writer.start()
+    yield writer
+    writer.close(timeout=5)
+
+
+def test_batch_commits_once_in_order(writer):
+    """Test an iteration's writes land together, in order, after wait()."""
+    db = writer.db
+    db.queue_command("quit_session")
+    command_id = db.get_pending_commands()[0]["id"]
+
+    writer.update_engine_state({"session_state": "running", "start_time": 1.0})
+    writer.update_engine_state({"session_state": "awaiting_decision"})
+    writer.log_session("work", "completed", 1.0, 1501.0, 25, 25)
+    writer.mark_command_processed(command_id)
+    assert db.get_engine_state() is None  # Nothing handed over yet
+
+    before = db.commits
+    writer.commit()
+    assert writer.wait(timeout=5)
+
+    assert writer.commits == 1 and writer.written == 4
+    assert db.commits == before + 1
+    assert db.get_engine_state()["session_state"] == "awaiting_decision"
+    assert db.count_sessions() == 1
+    assert db.get_pending_commands() == []
+
+
+def test_locked_batch_is_retried_ahead_of_newer_writes(writer):
+    """Test a batch that hits a lock raises from wait() and commits later."""
+    blocker = sqlite3.connect(str(writer.db.db_path))
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        writer.update_engine_state({"session_state": "running"})
+        writer.commit()
+        with pytest.raises(sqlite3.OperationalError):
+            writer.wait(timeout=30)
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+    writer.update_engine_state({"session_state": "running_bonus"})
+    writer.commit()
+    assert writer.wait(timeout=5)
+    assert writer.db.get_engine_state()["session_state"] == "running_bonus"
+    assert writer.db.get_engine_state_version() == 2
+
+
+def test_failed_batch_is_dropped_and_reported(writer):
+    """Test a batch failing for a reason other than a lock raises BatchFailed."""
+    writer.update_engine_state({"session_state": "running"})
+    writer.mark_command_processed(1)
+    writer.writes.append(("no_such_write", ()))
+    writer.commit()
+    with pytest.raises(BatchFailed):
+        writer.wait(timeout=5)
+    assert writer.db.get_engine_state() is None
+
+    writer.update_engine_state({"session_state": "running_bonus"})
+    writer.commit()
+    assert writer.wait(timeout=5)
+    assert writer.db.get_engine_state()["session_state"] == "running_bonus"
+
+
+def test_run_recovers_from_a_dropped_batch(tmp_path):
+    """Test Engine.run rolls back to the database and redoes a lost batch."""
+    clock = StopAfter(datetime(2024, 3, 4, 9, 0).timestamp(), sleeps=3)
+    engine = Engine(tmp_path / "lockin.db", clock=clock, notifications=False)
+    engine.start_session("work", 25)
+    clock.advance(26 * 60)  # Past the planned end
+    command_id = engine.db.queue_command("quit_session")
+    write_batch = engine.db.write_batch
+    failures = []
+
+    def fail_once(writes):
+        if not failures:
+            failures.append(writes)
+            raise sqlite3.DatabaseError("disk I/O error")
+        write_batch(writes)
+
+    engine.db.write_batch = fail_once
+    engine.run()
+
+    # The first iteration's batch ended the session and was lost
+    assert any(method == "log_session" for method, _ in failures[0])
+    # The quit went back to pending and ended the session on a later tick
+    assert engine.db.get_command_results([command_id]) == {
+        command_id: {"ok": True, "message": "Session ended"}
+    }
+    assert engine.db.count_sessions() == 1
+    assert engine.db.get_last_session()["session_type"] == "work"
+    assert engine.db.get_engine_state()["session_state"] == SessionState.IDLE
+    assert engine.db.release_claimed_commands() == 0
+
+
+def test_run_group_commits_a_command_burst(tmp_path):
+    """Test Engine.run commits a whole command burst in one transaction."""
+    clock = StopAfter(datetime(2024, 3, 4, 9, 0).timestamp(), sleeps=1)
+    engine = Engine(tmp_path / "lockin.db", clock=clock, notifications=False)
+    for _ in range(10):
+        engine.db.queue_command(
+            "start_session", {"session_type": "work", "duration_minutes": 25}
+        )
+        engine.db.queue_command("quit_session")
+    engine.db.queue_command(
+        "start_session", {"session_type": "work", "duration_minutes": 25}
+    )
+
+    engine.run()
+
+    assert engine.writer.commits == 1
+    # 21 state saves and their 21 events, 1 batch of marks
+    assert engine.writer.written == 43
+    assert engine.store is engine.db
+    assert engine.db.get_pending_commands() == []
+    assert engine.db.get_engine_state()["session_state"] == SessionState.RUNNING
+
+
+def test_run_counts_sessions_and_runs_hooks_after_the_commit(tmp_path):
+    """Test metrics and hooks see a transition only once the writer commits."""
+    clock = StopAfter(datetime(2024, 3, 4, 9, 0).timestamp(), sleeps=1)
+    engine = Engine(tmp_path / "lockin.db", clock=clock, notifications=False)
+    engine.start_session("work", 25)
+    clock.advance(10 * 60)
+    engine.db.queue_command("quit_session")
+
+    seen = []
+    session_logged = engine.metrics.session_logged
+
+    def count_session(*session):
+        seen.append(("metrics", engine.db.count_sessions()))
+        session_logged(*session)
+
+    def dispatch(events):
+        stored = [event["type"] for event in engine.db.get_events()]
+        seen.append(("hooks", [event for event, _ in events], stored))
+
+    engine.metrics.session_logged = count_session
+    engine._dispatch_hooks = dispatch
+    engine.run()
+
+    assert seen == [
+        ("metrics", 1),
+        ("hooks", ["session_logged"], ["session_started", "session_logged"]),
+    ]
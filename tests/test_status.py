@@ -0,0 +1,125 @@
+"""Tests for the Rich-free `lockin status` line."""
+
+import json
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from lockin.database import Database
+from lockin.status import format_status, read_status
+
+
+@pytest.fixture
+def temp_db():
+    """Create a temporary database for testing."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as f:
+        db_path = Path(f.name)
+
+    db = Database(db_path)
+    yield db
+
+    # Cleanup
+    db_path.unlink()
+
+
+def test_missing_database_is_idle(tmp_path):
+    """A fresh install with no database reports idle."""
+    status = read_status(tmp_path / "missing.db")
+    assert status["state"] == "idle"
+    assert format_status(status) == "idle 0m"
+
+
+def test_running_session_status(temp_db):
+    """Running sessions report remaining time and today's totals."""
+    now = time.time()
+    temp_db.log_session(
+        session_type="work",
+        state="completed",
+        start_time=now - 3600,
+        end_time=now - 1800,
+        planned_duration_minutes=30,
+        actual_duration_minutes=30,
+    )
+    temp_db.set_engine_state(
+        {
+            "session_state": "running",
+            "session_type": "work",
+            "start_time": now - 60,
+            "planned_end_time": now + 1440,
+            "planned_duration_minutes": 25,
+            "decision_window_start": None,
+        }
+    )
+
+    status = read_status(temp_db.db_path, now=now)
+    assert status["state"] == "running"
+    assert status["timer"] == "24:00"
+    assert status["today_sessions"] == 1
+    assert status["streak"] == 1
+
+    assert format_status(status) == "work 24:00"
+    assert json.loads(format_status(status, "json"))["today_focused_minutes"] == 30
+    assert format_status(status, "template", "{focused}|{streak}") == "30m|1"
+
+
+def test_bonus_time_counts_up(temp_db):
+    """Bonus time is shown with a leading plus like the session view."""
+    now = time.time()
+    temp_db.set_engine_state(
+        {
+            "session_state": "running_bonus",
+            "session_type": "work",
+            "start_time": now - 1800,
+            "planned_end_time": now - 90,
+            "planned_duration_minutes": 28,
+        }
+    )
+    assert read_status(temp_db.db_path, now=now)["timer"] == "+01:30"
+
+
+def test_status_does_not_import_rich(temp_db):
+    """The status path must stay off Rich and the CLI module."""
+    code = (
+        "import sys; from pathlib import Path; from lockin import status; "
+        f"status.main(['--format', 'json'], Path({str(temp_db.db_path)!r})); "
+        "assert 'rich' not in sys.modules and 'lockin.cli' not in sys.modules"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=False
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout)["state"] == "idle"
+
+
+def test_unmigrated_engine_state_is_read_from_json(tmp_path):
+    """Status reads the old JSON state until the database has been migrated."""
+    now = time.time()
+    db_path = tmp_path / "old.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript("""
+        CREATE TABLE sessions (
+            id INTEGER PRIMARY KEY, session_type TEXT, state TEXT,
+            start_time REAL, end_time REAL, planned_duration_minutes INTEGER,
+            actual_duration_minutes REAL, overtime_minutes REAL, created_at REAL
+        );
+        CREATE TABLE config (key TEXT PRIMARY KEY, value TEXT, updated_at REAL);
+        CREATE TABLE engine_state (id INTEGER PRIMARY KEY, current_state TEXT,
+                                   updated_at REAL);
+    """)
+    state = {
+        "session_state": "running",
+        "session_type": "break",
+        "start_time": now - 60,
+        "planned_end_time": now + 240,
+        "planned_duration_minutes": 5,
+    }
+    conn.execute("INSERT INTO engine_state VALUES (1, ?, ?)", (json.dumps(state), now))
+    conn.commit()
+    conn.close()
+
+    assert format_status(read_status(db_path, now=now)) == "break 04:00"
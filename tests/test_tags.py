@@ -0,0 +1,201 @@
+"""Tests for session tags and their per-tag rollup."""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from lockin.api import ApiError, validate_command
+from lockin.clock import SimulatedClock
+from lockin.database import Database, normalize_tags
+from lockin.engine import Engine
+
+
+def log(db, when, minutes=25, session_type="work", state="completed", tags=()):
+    db.log_session(
+        session_type=session_type,
+        state=state,
+        start_time=when.timestamp(),
+        end_time=when.timestamp() + minutes * 60,
+        planned_duration_minutes=minutes,
+        actual_duration_minutes=minutes,
+        tags=tags,
+    )
+
+
+def test_normalize_tags():
+    """Test tags are split on commas, lowercased and deduplicated."""
+    assert normalize_tags(["Thesis, reading", "thesis", " ", "ops/oncall"]) == [
+        "thesis",
+        "reading",
+        "ops/oncall",
+    ]
+    for bad in ["-leading", "has space", "x" * 41, "emoji✨", 5, None]:
+        with pytest.raises(ValueError):
+            normalize_tags([bad])
+    with pytest.raises(ValueError):
+        normalize_tags("thesis")  # A string, not a list of them
+
+
+def test_engine_logs_tags_set_at_start_and_while_running(tmp_path):
+    """Test --tag and the tag command both end up on the logged session."""
+    clock = SimulatedClock(datetime(2024, 3, 4, 9, 0).timestamp())
+    engine = Engine(tmp_path / "lockin.db", clock=clock, notifications=False)
+
+    assert engine.start_session("work", 25, ["Thesis"]) == (
+        True,
+        "Started work session for 25 minutes",
+    )
+    assert engine.state["tags"] == "thesis"
+    engine.db.queue_command("tag_session", {"tags": ["thesis", "writing"]})
+    engine.process_commands()
+    assert engine.db.get_engine_state()["tags"] == "thesis,writing"
+    engine.run_for(25 * 60 + 1, fast_forward=True)
+    engine.quit_session()
+    assert engine.state["tags"] is None
+
+    session_id = engine.db.get_last_session()["id"]
+    assert engine.db.get_session_tags([session_id]) == {
+        session_id: ["thesis", "writing"]
+    }
+    events = engine.db.get_events()
+    assert [e["data"]["tags"] for e in events if "tags" in e["data"]] == [
+        ["thesis"],
+        ["thesis", "writing"],
+        ["thesis", "writing"],
+    ]
+
+    # Untagged sessions stay untagged; bad tags are refused
+    assert engine.start_session("work", 25, ["no spaces"])[0] is False
+    engine.start_session("break", 5)
+    engine.run_for(5 * 60 + 1, fast_forward=True)
+    engine.quit_session()
+    assert engine.db.get_session_tags([engine.db.get_last_session()["id"]]) == {}
+    assert engine.tag_session(["x"]) == (False, "No active session")
+
+
+def test_tag_rollup_matches_sessions_and_follows_deletes(tmp_path):
+    """Test tag_days stays equal to aggregating session_tags directly."""
+    db = Database(tmp_path / "lockin.db")
+    monday = datetime(2024, 5, 6, 9, 0)
+    log(db, monday, 50, tags=["thesis", "reading"])
+    log(db, monday + timedelta(hours=2), 25, tags=["thesis"])
+    log(db, monday + timedelta(hours=3), 10, state="abandoned", tags=["thesis"])
+    log(db, monday + timedelta(hours=4), 5, session_type="break", tags=["thesis"])
+    log(db, monday + timedelta(days=1), 30, tags=["reading"])
+    log(db, monday + timedelta(days=1, hours=1), 45)
+
+    def from_sessions():
+        with db.connection() as conn:
+            rows = conn.execute("""
+                SELECT t.name, date(s.start_time, 'unixepoch', 'localtime'),
+                       s.session_type, s.state,
+                       SUM(s.actual_duration_minutes), COUNT(*)
+                FROM sessions s
+                JOIN session_tags st ON st.session_id = s.id
+                JOIN tags t ON t.id = st.tag_id
+                GROUP BY 1, 2, 3, 4
+            """)
+            return sorted(tuple(row) for row in rows)
+
+    def rollup():
+        with db.connection() as conn:
+            rows = conn.execute("""
+                SELECT t.name, d.day, d.session_type, d.state, d.minutes, d.sessions
+                FROM tag_days d JOIN tags t ON t.id = d.tag_id
+            """)
+            return sorted(tuple(row) for row in rows)
+
+    assert rollup() == from_sessions()
+    assert db.get_tag_totals() == [
+        {
+            "tag": "thesis",
+            "work_minutes": 85,
+            "completed_sessions": 2,
+            "abandoned_sessions": 1,
+            "break_minutes": 5,
+        },
+        {
+            "tag": "reading",
+            "work_minutes": 80,
+            "completed_sessions": 2,
+            "abandoned_sessions": 0,
+            "break_minutes": 0,
+        },
+    ]
+
+    # Deleting takes the session out of the rollup and drops emptied rows
+    db.delete_session(1)
+    assert rollup() == from_sessions()
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM session_tags").fetchone()[0] == 4
+    tuesday = (monday + timedelta(days=1)).replace(hour=0)
+    assert [t["tag"] for t in db.get_tag_totals(tuesday)] == ["reading"]
+
+
+def test_tagged_period_stats_are_cached_per_tag(tmp_path):
+    """Test stats --tag reads the rollup and caches closed periods per tag."""
+    db = Database(tmp_path / "lockin.db")
+    log(db, datetime(2023, 5, 2, 10, 0), 50, tags=["thesis"])
+    log(db, datetime(2023, 5, 3, 10, 0), 25, tags=["ops"])
+    log(db, datetime(2023, 5, 9, 10, 0), 25, tags=["thesis", "ops"])
+    start, end = datetime(2023, 5, 1), datetime(2023, 6, 1)
+
+    month = db.get_period_stats("month", start, end, tag="thesis")
+    assert month["summary"]["work_completed_minutes"] == 75
+    assert month["summary"]["completed_sessions"] == 2
+    assert month["buckets"] == {
+        "2023-05-01": {"work": 50, "sessions": 1},
+        "2023-05-08": {"work": 25, "sessions": 1},
+    }
+    # Same shape as the untagged stats, which count every session once
+    untagged = db.get_period_stats("month", start, end)
+    assert untagged["summary"].keys() == month["summary"].keys()
+    assert untagged["summary"]["completed_sessions"] == 3
+
+    with db.connection() as conn:
+        periods = sorted(r[0] for r in conn.execute("SELECT period FROM stats_cache"))
+    assert periods == ["month", "month:thesis"]
+
+    # A new tagged session invalidates the tagged entry like any other
+    log(db, datetime(2023, 5, 20, 10, 0), 25, tags=["thesis"])
+    week = db.get_period_stats("week", datetime(2023, 5, 15), datetime(2023, 5, 22))
+    assert week["summary"]["completed_sessions"] == 1
+    month = db.get_period_stats("month", start, end, tag="thesis")
+    assert month["summary"]["completed_sessions"] == 3
+    assert db.get_period_stats("month", start, end, tag="nope")["buckets"] == {}
+
+
+def test_v3_database_gains_tags(tmp_path):
+    """Test a database from before tags migrates in place."""
+    path = tmp_path / "lockin.db"
+    Database(path)
+    with sqlite3.connect(path) as conn:
+        for table in ("tags", "session_tags", "tag_days"):
+            conn.execute(f"DROP TABLE {table}")
+        conn.execute("ALTER TABLE engine_state DROP COLUMN tags")
+        conn.execute("PRAGMA user_version = 3")
+    conn.close()
+
+    engine = Engine(path, notifications=False)
+    engine.start_session("work", 25, ["thesis"])
+    assert Database(path).get_engine_state()["tags"] == "thesis"
+
+
+def test_api_accepts_tags():
+    """Test tags are optional on start_session and required by tag_session."""
+    assert validate_command(
+        {
+            "command": "start_session",
+            "args": {"session_type": "work", "duration_minutes": 25, "tags": ["a"]},
+        }
+    ) == (
+        "start_session",
+        {"session_type": "work", "duration_minutes": 25, "tags": ["a"]},
+    )
+    assert validate_command({"command": "tag_session", "args": {"tags": []}}) == (
+        "tag_session",
+        {"tags": []},
+    )
+    with pytest.raises(ApiError):
+        validate_command({"command": "tag_session", "args": {"tags": "a"}})
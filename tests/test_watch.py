@@ -0,0 +1,150 @@
+"""Tests for the change feed and ``lockin watch``."""
+
+import json
+from datetime import datetime, timedelta
+
+from lockin.clock import SimulatedClock
+from lockin.config import Config
+from lockin.database import Database
+from lockin.engine import Engine
+from lockin.watch import follow_events, main
+
+
+def event_types(db, after_id=0):
+    return [event["type"] for event in db.get_events(after_id)]
+
+
+def test_engine_writes_each_change_with_its_event(tmp_path):
+    """Test a day of sessions produces the feed in the order things happened."""
+    clock = SimulatedClock(datetime(2024, 3, 4, 9, 0).timestamp())
+    engine = Engine(tmp_path / "lockin.db", clock=clock, notifications=False)
+
+    engine.start_session("work", 25)
+    engine.run_for(25 * 60 + 1, fast_forward=True)  # Decision window
+    engine.run_for(3 * 60, fast_forward=True)  # Runs out: bonus time
+    engine.quit_session()
+    engine.start_session("break", 5)
+    engine.switch_break_type("long")
+    engine.run_for(15 * 60 + 1, fast_forward=True)  # Break over: bonus time
+    engine.quit_session()
+    engine.start_session("work", 25)
+    engine.quit_session()  # Too short to log
+
+    assert event_types(engine.db) == [
+        "session_started",
+        "decision_window",
+        "bonus_started",
+        "session_logged",
+        "session_started",
+        "break_switched",
+        "bonus_started",
+        "session_logged",
+        "session_started",
+        "session_discarded",
+    ]
+    events = engine.db.get_events()
+    assert events[2]["data"] == {"session_type": "work", "auto": True}
+    logged = events[3]["data"]
+    assert logged["id"] == engine.db.get_recent_sessions(2)[1]["id"]
+    assert logged["state"] == "completed"
+    assert [e["id"] for e in events] == sorted(e["id"] for e in events)
+
+
+def test_deletes_and_config_changes_are_in_the_feed(tmp_path):
+    """Test CLI-side writes record their events in the same transaction."""
+    clock = SimulatedClock(datetime(2024, 3, 4, 9, 0).timestamp())
+    engine = Engine(tmp_path / "lockin.db", clock=clock, notifications=False)
+    engine.start_session("work", 25)
+    engine.run_for(30 * 60, fast_forward=True)
+    engine.quit_session()
+    session_id = engine.db.get_last_session()["id"]
+    _, last = engine.db.get_event_range()
+
+    # Filling in defaults isn't a change anyone made
+    config = Config(engine.db)
+    config.set("work_default_minutes", "45")
+    assert engine.db.delete_session(session_id)
+    config.reset()
+
+    events = engine.db.get_events(last)
+    assert [(e["type"], e["data"].get("id")) for e in events] == [
+        ("config_changed", None),
+        ("session_deleted", session_id),
+        ("config_changed", None),
+    ]
+    assert events[0]["data"] == {"key": "work_default_minutes", "value": 45}
+    assert events[1]["data"]["state"] == "completed"
+    assert events[2]["data"] == {"reset": True}
+
+
+def test_pruning_keeps_ids_growing(tmp_path):
+    """Test the engine prunes old events at midnight without reusing IDs."""
+    clock = SimulatedClock(datetime(2024, 3, 4, 9, 0).timestamp())
+    engine = Engine(tmp_path / "lockin.db", clock=clock, notifications=False)
+    engine.start_session("work", 25)
+    engine.quit_session()
+    assert engine.db.get_event_range() == (1, 2)
+
+    clock.advance(timedelta(days=31).total_seconds())
+    engine.tick()
+    assert engine.db.get_events() == []
+    assert engine.db.get_event_range() == (3, 2)
+
+    engine.start_session("work", 25)
+    assert [e["id"] for e in engine.db.get_events()] == [3]
+
+
+def test_follow_reads_only_after_other_commits(tmp_path):
+    """Test following skips the events query until another connection commits."""
+    engine = Engine(tmp_path / "lockin.db", notifications=False)
+    engine.start_session("work", 25)
+
+    db = Database(engine.db.db_path, keep_open=True)
+    get_events = db.get_events
+    queries = []
+    db.get_events = lambda *args: queries.append(args) or get_events(*args)
+
+    polls = []
+
+    def sleep(seconds):
+        polls.append(seconds)
+        if len(polls) == 2:
+            engine.quit_session()
+        elif len(polls) == 4:
+            raise KeyboardInterrupt
+
+    batches = []
+    try:
+        for batch in follow_events(db, 0, sleep=sleep):
+            batches.append([event["type"] for event in batch])
+    except KeyboardInterrupt:
+        pass
+    db.close()
+
+    assert batches == [["session_started"], ["session_discarded"]]
+    assert len(queries) == 2  # At the start and after the quit, not per poll
+
+
+def test_watch_json_resumes_from_cursor_file(tmp_path, capsys):
+    """Test the cursor file picks up where the last run stopped."""
+    db_path = tmp_path / "lockin.db"
+    cursor = tmp_path / "cursor"
+    engine = Engine(db_path, notifications=False)
+    engine.start_session("work", 25)
+
+    argv = ["--json", "--no-follow", "--cursor-file", str(cursor)]
+    assert main(argv + ["--since", "0"], db_path) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["type"] for line in lines] == ["session_started"]
+    assert cursor.read_text().strip() == str(json.loads(lines[-1])["id"])
+
+    engine.quit_session()
+    engine.start_session("break", 5)
+    main(argv, db_path)
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [e["type"] for e in events] == ["session_discarded", "session_started"]
+    assert set(events[0]) == {"id", "type", "time", "data"}
+
+    # Without a cursor, only what happens from now on
+    main(["--no-follow"], db_path)
+    assert capsys.readouterr().out == ""